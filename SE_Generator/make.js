@@ -1,102 +1,334 @@
 useLibrary('threads');
+importClass(java.io.BufferedReader);
+importClass(java.io.ByteArrayInputStream);
+importClass(java.io.ByteArrayOutputStream);
 importClass(java.io.File);
+importClass(java.io.InputStreamReader);
+importClass(java.io.OutputStreamWriter);
+importClass(java.io.PrintWriter);
+importClass(java.io.StringReader);
+importClass(java.math.BigInteger);
+importClass(java.net.InetAddress);
+importClass(java.net.ServerSocket);
+importClass(java.nio.file.Files);
+importClass(java.nio.file.StandardCopyOption);
+importClass(java.security.MessageDigest);
+importClass(java.util.Properties);
 importClass(java.util.UUID);
 importClass(arkham.project.ProjectUtilities);
 importClass(arkham.sheet.RenderTarget);
 importClass(ca.cgjennings.apps.arkham.project.Project);
-importClass(ca.cgjennings.seplugins.csv.CsvFactory);
 importClass(ca.cgjennings.imageio.SimpleImageWriter);
+importClass(ca.cgjennings.io.SEObjectInputStream);
+importClass(ca.cgjennings.io.SEObjectOutputStream);
+
+// NOTE: When rendering a shard, the data and images folders are inside the shard folder of the project.
+const SHARD_FOLDER = java.lang.System.getenv('SE_GENERATOR_SHARD');
+const SHARD_PREFIX = SHARD_FOLDER ? SHARD_FOLDER + '/' : '';
+// NOTE: A fixed resolution for archival quality images, otherwise each card is rendered just large enough for its deck slot.
+const FIXED_PPI = java.lang.System.getenv('SE_GENERATOR_PPI');
+// NOTE: When set, keep Strange Eons running and render the jobs sent to this port on the loopback address.
+const SERVE_PORT = java.lang.System.getenv('SE_GENERATOR_SERVE');
 
 const PROJECT_FOLDER = 'SE_Generator';
 const TEMPLATE_FOLDER = 'template';
-const DATA_FOLDER = 'data';
-const CARD_FOLDER = 'cards';
-const IMAGE_FOLDER = 'images';
+const DATA_FOLDER = SHARD_PREFIX + 'data';
+const IMAGE_FOLDER = SHARD_PREFIX + 'images';
+const DEFAULT_PPI = 300;
 
 let headless = Eons.getScriptRunner() !== null;
 let project = headless ? Project.open(new File(PROJECT_FOLDER)) : Eons.getOpenProject();
 
-let types = [];
-let dataFolder = new File(project.getFile(), DATA_FOLDER);
-let dataFiles = dataFolder.listFiles();
-for (let i = 0; i < dataFiles.length; i++) {
-    let dataFilename = dataFiles[i].getName();
-    if (dataFilename.endsWith('.csv')) {
-        let type = dataFilename.replace('.csv', '');
-        types.push(type);
+function listTypes(dataFolder) {
+    let types = [];
+    let dataFiles = dataFolder.listFiles();
+    for (let i = 0; dataFiles !== null && i < dataFiles.length; i++) {
+        let dataFilename = dataFiles[i].getName();
+        if (dataFilename.endsWith('.csv')) {
+            let type = dataFilename.replace('.csv', '');
+            types.push(type);
+        }
     }
+    return types;
 }
 
-function process(progress) {
-    function syncProject() {
-        if (!headless) {
-            project.synchronizeAll();
+function syncProject() {
+    if (!headless) {
+        project.synchronizeAll();
+    }
+}
+
+function reportStatus(progress, status) {
+    if (headless) {
+        println(status);
+    } else {
+        progress.status = status;
+    }
+}
+
+// NOTE: Parse the CSV data written by Python's csv module, with quoted cells that may contain commas, quotes and newlines.
+function parseCsv(text) {
+    let rows = [];
+    let row = [];
+    let cell = '';
+    let quoted = false;
+    for (let i = 0; i < text.length; i++) {
+        let c = text.charAt(i);
+        if (quoted) {
+            if (c !== '"') {
+                cell += c;
+            } else if (text.charAt(i + 1) === '"') {
+                cell += '"';
+                i++;
+            } else {
+                quoted = false;
+            }
+        } else if (c === '"') {
+            quoted = true;
+        } else if (c === ',') {
+            row.push(cell);
+            cell = '';
+        } else if (c === '\r' || c === '\n') {
+            if (c === '\r' && text.charAt(i + 1) === '\n') {
+                i++;
+            }
+            row.push(cell);
+            rows.push(row);
+            row = [];
+            cell = '';
+        } else {
+            cell += c;
         }
     }
+    if (cell !== '' || row.length > 0) {
+        row.push(cell);
+        rows.push(row);
+    }
+    return rows;
+}
 
-    function reportStatus(progress, status) {
-        if (headless) {
-            println(status);
+// NOTE: Map the cells of a data row to the columns of the header, so that every value is looked up by its column name.
+function toRecord(header, row) {
+    let record = {};
+    for (let i = 0; i < header.length; i++) {
+        record[header[i]] = i < row.length ? row[i] : '';
+    }
+    return record;
+}
+
+// NOTE: Apply a data row the same way CsvFactory does, '$' columns are settings and the rest are the name and portraits.
+function applyRow(component, record) {
+    let settings = component.getSettings();
+    for (let column in record) {
+        let value = record[column];
+        if (column.charAt(0) === '$') {
+            // NOTE: Keys the component doesn't know are skipped, as CsvFactory does when ignoring unknown keys.
+            let key = column.substring(1);
+            if (settings.get(key) !== null) {
+                settings.set(key, value);
+            }
+        } else if (column === 'name') {
+            component.setName(value);
         } else {
-            progress.status = status;
+            let match = /^port(\d+)(Src|X|Y|Scale|Rot)$/.exec(column);
+            let port = match ? parseInt(match[1]) : -1;
+            if (port < 0 || port >= component.getPortraitCount()) {
+                continue;
+            }
+            // NOTE: Setting the source resets the portrait adjustments, so it comes first in the data columns.
+            let portrait = component.getPortrait(port);
+            if (match[2] === 'Src') {
+                portrait.setSource(value);
+            } else if (match[2] === 'X') {
+                portrait.setPanX(parseFloat(value));
+            } else if (match[2] === 'Y') {
+                portrait.setPanY(parseFloat(value));
+            } else if (match[2] === 'Scale') {
+                portrait.setScale(parseFloat(value));
+            } else {
+                portrait.setRotation(parseFloat(value));
+            }
         }
     }
+}
 
-    let cardFolder = new File(project.getFile(), CARD_FOLDER);
-    ProjectUtilities.deleteAll(cardFolder);
-    cardFolder.mkdirs();
-    syncProject();
+// NOTE: Read each template once and keep it serialized, so that every row gets a fresh copy of the template without reading
+// the template file again, as CsvFactory does when clearing the template for each row. A template file changed since it was
+// read is read again.
+function getTemplate(templates, type) {
+    let templateFile = new File(project.getFile(), TEMPLATE_FOLDER + '/' + type + '.eon');
+    let modified = templateFile.lastModified();
+    if (!(type in templates) || templates[type].modified !== modified) {
+        let bytes = new ByteArrayOutputStream();
+        let output = new SEObjectOutputStream(bytes);
+        try {
+            output.writeObject(ResourceKit.getGameComponentFromFile(templateFile, true));
+        } finally {
+            output.close();
+        }
+        templates[type] = {modified: modified, bytes: bytes.toByteArray()};
+    }
+    let input = new SEObjectInputStream(new ByteArrayInputStream(templates[type].bytes));
+    try {
+        return input.readObject();
+    } finally {
+        input.close();
+    }
+}
+
+// NOTE: Get the smallest whole resolution at which the sheet is at least as large as the card's slot in the deck image.
+function getSheetPpi(sheet, renderWidth, renderHeight, fixedPpi) {
+    if (fixedPpi) {
+        return parseInt(fixedPpi);
+    }
+    let templatePpi = sheet.getTemplateResolution();
+    let ppi = Math.max(
+        renderWidth * templatePpi / sheet.getTemplateWidth(),
+        renderHeight * templatePpi / sheet.getTemplateHeight()
+    );
+    return isNaN(ppi) ? DEFAULT_PPI : Math.max(1, Math.ceil(ppi));
+}
+
+// NOTE: Render every data row in the data folder into the image folder, calling back with each image file written. The
+// templates read so far are kept in 'templates' by type, which a server shares between its jobs.
+function render(progress, dataFolder, imageFolder, fixedPpi, templates, onImage) {
+    let types = listTypes(dataFolder);
+    imageFolder.mkdirs();
+    let synthesizeBleedMargin = false;
+    let imageWriter = new SimpleImageWriter('png');
+    try {
+        for (let i = 0; !progress.cancelled && i < types.length; i++) {
+            let csvFile = new File(dataFolder, types[i] + '.csv');
+            reportStatus(progress, 'Processing ' + csvFile.getName() + '...');
+            let rows = parseCsv('' + ProjectUtilities.getFileText(csvFile, 'utf-8'));
+            let header = rows[0];
+            for (let j = 1; !progress.cancelled && j < rows.length; j++) {
+                let record = toRecord(header, rows[j]);
+                let fields = record.file.split('-');
+                let index = parseInt(fields[fields.length - 1]);
+                // NOTE: The card is rendered straight from the component, instead of being written to a card file and read back.
+                let card = getTemplate(templates, types[i]);
+                applyRow(card, record);
+                let imageFile = new File(imageFolder, record.file + '.png');
+                reportStatus(progress, 'Generating ' + imageFile.getName() + '...');
+                // NOTE: Sheets only paint on demand, so only the sheet of this card's face is rendered.
+                let sheet = card.createDefaultSheets()[index];
+                let ppi = getSheetPpi(sheet, parseInt(record.renderWidth), parseInt(record.renderHeight), fixedPpi);
+                let image = sheet.paint(RenderTarget.EXPORT, ppi, synthesizeBleedMargin);
+                // NOTE: Write to a temporary file first, so an interrupted render never leaves a truncated image behind.
+                let tempFile = new File(imageFolder, record.file + '.png.tmp');
+                imageWriter.write(image, tempFile);
+                Files.move(tempFile.toPath(), imageFile.toPath(), StandardCopyOption.REPLACE_EXISTING);
+                onImage(imageFile);
+            }
+        }
+    } finally {
+        imageWriter.dispose();
+    }
+}
 
-    let factory = new CsvFactory();
-    factory.setDelimiter(',');
-    factory.setQuote('"');
-    factory.setExtraSpaceIgnored(false);
-    factory.setIgnoreUnknownKeys(true);
-    factory.setTemplateClearedForEachRow(true);
-    factory.setOutputFolder(cardFolder);
-
-    for (let i = 0; !progress.cancelled && i < types.length; i++) {
-        let templateFile = new File(project.getFile(), TEMPLATE_FOLDER + '/' + types[i] + '.eon');
-        let template = ResourceKit.getGameComponentFromFile(templateFile, true);
-        let csvFile = new File(project.getFile(), DATA_FOLDER + '/' + types[i] + '.csv');
-        reportStatus(progress, 'Processing ' + csvFile.getName() + '...');
-        let csv = ProjectUtilities.getFileText(csvFile, 'utf-8');
-        factory.process(template, csv);
-        syncProject();
-    }
-
-    let cardFiles = cardFolder.listFiles();
+function process(progress) {
     let imageFolder = new File(project.getFile(), IMAGE_FOLDER);
     if (imageFolder.exists()) {
         imageFolder.renameTo(new File(project.getFile(), IMAGE_FOLDER + '-' + UUID.randomUUID().toString()))
         imageFolder = new File(project.getFile(), IMAGE_FOLDER);
     }
-    imageFolder.mkdirs();
     syncProject();
+    render(progress, new File(project.getFile(), DATA_FOLDER), imageFolder, FIXED_PPI, {}, function (imageFile) {});
+    syncProject();
+}
+
+// NOTE: Get the SHA-256 of a file as hex, the same as get_file_hash of the Python side.
+function getFileHash(file) {
+    let digest = MessageDigest.getInstance('SHA-256').digest(Files.readAllBytes(file.toPath()));
+    return '' + java.lang.String.format('%064x', new BigInteger(1, digest));
+}
 
-    for (let i = 0; !progress.cancelled && i < cardFiles.length; i++) {
-        let cardFile = cardFiles[i];
-        let card = ResourceKit.getGameComponentFromFile(cardFile, true);
-        let cardFilename = cardFile.getName();
-        let fields = cardFilename.replace('.eon', '').split('-');
-        let index = parseInt(fields[fields.length - 1]);
-        let ppi = 300;
-        let synthesizeBleedMargin = false;
-        let imageWriter = new SimpleImageWriter('png');
-        let imageFile = new File(imageFolder, cardFilename.replace('.eon', '.png'));
-        reportStatus(progress, 'Generating ' + imageFile.getName() + '...');
-        let sheets = card.createDefaultSheets();
-        let sheet = sheets[index];
-        let image = sheet.paint(RenderTarget.EXPORT, ppi, synthesizeBleedMargin);
-        imageWriter.write(image, imageFile);
-        syncProject();
+// NOTE: A server keeps the language, preferences and script it started with, so a job for anything else is rejected rather
+// than rendered and cached with the wrong fonts or layout. Return why the job doesn't match, or null if it does.
+function checkContext(job, scriptHash) {
+    let lang = '' + Language.getGameLocale();
+    if (job.lang !== undefined && job.lang !== lang) {
+        return 'Server renders ' + lang + ', not ' + job.lang;
     }
+    if (job.script !== undefined && job.script !== scriptHash) {
+        return 'Server runs another version of make.js';
+    }
+    if (job.preferences !== undefined) {
+        let preferences = new Properties();
+        preferences.load(new StringReader(job.preferences));
+        let keys = preferences.stringPropertyNames().toArray();
+        for (let i = 0; i < keys.length; i++) {
+            if ('' + Settings.getUser().get(keys[i]) !== '' + preferences.getProperty(keys[i])) {
+                return 'Server started with another value of ' + keys[i];
+            }
+        }
+    }
+    return null;
 }
 
-if (headless) {
+function getFolder(path) {
+    let folder = new File(path);
+    return folder.isAbsolute() ? folder : new File(project.getFile(), path);
+}
+
+// NOTE: Serve render jobs one connection at a time. Each job is a JSON line with the data and images folders, an optional
+// fixed ppi, and the language, preferences and script hash it expects the server to run with. Every rendered image is
+// streamed back as a JSON line with its path, followed by a line with the image count, or with the error that stopped the
+// job. A job with 'stop' shuts the server down.
+function serve(port) {
+    let scriptHash = getFileHash(new File(project.getFile(), 'make.js'));
+    let templates = {};
+    let server = new ServerSocket(port, 50, InetAddress.getLoopbackAddress());
+    println('Serving render jobs on port ' + port + '...');
+    try {
+        let stopped = false;
+        while (!stopped) {
+            let socket = server.accept();
+            try {
+                let reader = new BufferedReader(new InputStreamReader(socket.getInputStream(), 'UTF-8'));
+                let writer = new PrintWriter(new OutputStreamWriter(socket.getOutputStream(), 'UTF-8'), true);
+                let line;
+                while (!stopped && (line = reader.readLine()) !== null) {
+                    let job = JSON.parse('' + line);
+                    if (job.stop) {
+                        stopped = true;
+                        writer.println(JSON.stringify({stopped: true}));
+                        continue;
+                    }
+                    let mismatch = checkContext(job, scriptHash);
+                    if (mismatch !== null) {
+                        writer.println(JSON.stringify({error: mismatch}));
+                        continue;
+                    }
+                    let count = 0;
+                    try {
+                        render({cancelled: false}, getFolder(job.data), getFolder(job.images), job.ppi || FIXED_PPI, templates, function (imageFile) {
+                            writer.println(JSON.stringify({image: '' + imageFile.getAbsolutePath()}));
+                            count++;
+                        });
+                        writer.println(JSON.stringify({done: count}));
+                    } catch (e) {
+                        writer.println(JSON.stringify({error: '' + e}));
+                    }
+                }
+            } catch (e) {
+                println('Error: ' + e);
+            } finally {
+                socket.close();
+            }
+        }
+    } finally {
+        server.close();
+    }
+}
+
+if (headless && SERVE_PORT) {
+    serve(parseInt(SERVE_PORT));
+    project.close();
+} else if (headless) {
     process({cancelled: false});
     project.close();
 } else {
     Thread.busyWindow(process, 'Building...', true);
 }
-
@@ -1,31 +1,26 @@
-import importlib
-import inspect
+from lang_transforms import LangTransforms
 
 
 class Card:
-    def __init__(self, card_dict):
+    def __init__(self, card_dict, transforms: LangTransforms | None = None):
         self.card_dict = card_dict
+        self.transforms = transforms or LangTransforms(None)
 
+    # NOTE: The hooks keep the names the caller lookup used to resolve, i.e. 'transform_get_name'
+    # and 'transform_get_description'.
     def get_name(self):
         name = self.card_dict.get("name", "")
-        return self.transform_lang(name)
+        return self.transform_lang("get_name", name)
 
     def get_description(self):
         description = self.card_dict.get("description", "")
-        return self.transform_lang(description)
+        return self.transform_lang("get_description", description)
 
     def get_type(self):
         return self.card_dict.get("type", "")
 
-    def transform_lang(self, value):
-        module = self.import_lang_module()
-        attr = inspect.stack()[1].function.replace("get_se_", "")
-        func_name = f"transform_{attr}"
-        func = getattr(module, func_name, None)
-        return func(value) if func else value
-
-    def import_lang_module(self):
-        return importlib.import_module("lang_module")
+    def transform_lang(self, field, value):
+        return self.transforms.transform(field, value)
 
     def print_card_details(self):
         print(f"Name: {self.get_name()}")
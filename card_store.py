@@ -0,0 +1,428 @@
+import json
+import sqlite3
+from collections import ChainMap
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from file_hash import get_file_hash
+
+CARD_STORE_VERSION = "3"
+
+CARD_STORE_SCHEMA = [
+    "CREATE TABLE cards (code TEXT PRIMARY KEY, data TEXT NOT NULL)",
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    (
+        "CREATE TABLE pack_files (path TEXT PRIMARY KEY, kind TEXT NOT NULL, mtime REAL NOT NULL, "
+        "size INTEGER NOT NULL, hash TEXT NOT NULL)"
+    ),
+    (
+        "CREATE TABLE pack_cards (path TEXT NOT NULL, kind TEXT NOT NULL, code TEXT NOT NULL, "
+        "data TEXT NOT NULL)"
+    ),
+    # NOTE: One row per link key of a raw card, since a card can both link to a back and duplicate
+    # another card.
+    "CREATE TABLE pack_links (path TEXT NOT NULL, code TEXT NOT NULL, link TEXT NOT NULL)",
+    "CREATE INDEX pack_cards_path ON pack_cards (path)",
+    "CREATE INDEX pack_cards_code ON pack_cards (code)",
+    "CREATE INDEX pack_links_path ON pack_links (path)",
+    "CREATE INDEX pack_links_link ON pack_links (link)",
+]
+
+# NOTE: Card properties that make a card depend on the content of another card while merging.
+CARD_LINK_KEYS = ["back_link", "duplicate_of"]
+
+# NOTE: Card properties linking to the cards that need to be merged together with a card, in
+# addition to the link keys.
+CARD_MERGE_KEYS = [*CARD_LINK_KEYS, "alternate_of"]
+
+# NOTE: Key marking a stored card as an overlay on top of another stored card.
+CARD_REF_KEY = "$ref"
+
+
+def card_view(base: Mapping[str, Any], **fields: object) -> ChainMap:
+    """Create a copy-on-write view of a card, where writes only go to the view itself."""
+    return ChainMap(fields, base)
+
+
+def update_encounter_code(translation: dict[str, Any]) -> None:
+    for card in translation.values():
+        if "linked_card" in card:
+            linked_card = card["linked_card"]
+            card_encounter = card.get("encounter_code")
+            linked_encounter = linked_card.get("encounter_code")
+
+            if card_encounter and not linked_encounter:
+                linked_card["encounter_code"] = card_encounter
+            elif not card_encounter and linked_encounter:
+                card["encounter_code"] = linked_encounter
+
+
+def merge_ahdb_cards(english: dict[str, Any], translation: dict[str, Any]) -> dict[str, Any]:
+    # NOTE: Patch translation data while maintain the original properties as 'real_*' to match the
+    # API result.
+    for ecid, english_card in english.items():
+        if ecid in translation:
+            translation_card = translation[ecid]
+            for key, value in translation_card.items():
+                if key in english_card and key != "code":
+                    english_card[f"real_{key}"] = english_card[key]
+                english_card[key] = value
+    translation = english
+
+    # NOTE: Patch 'back_link' property to match the API result. Linked and duplicate cards are views
+    # on the card they are based on, so they are stored as references instead of copies.
+    for card in translation.values():
+        if card.get("back_link"):
+            card["linked_card"] = card_view(translation[card["back_link"]])
+
+    # NOTE: Patch 'duplicate_of' property to match the API result.
+    for cid, card in translation.items():
+        if card.get("duplicate_of"):
+            base = translation[card["duplicate_of"]]
+            fields = dict(card)
+            # NOTE: The duplicate gets its own view on the linked card, so patching the encounter
+            # code of one doesn't leak into the other.
+            if "linked_card" in base and "linked_card" not in fields:
+                fields["linked_card"] = card_view(translation[base["back_link"]])
+            translation[cid] = card_view(base, **fields)
+
+    # NOTE: Patch linked cards missing encounter set.
+    update_encounter_code(translation)
+    return translation
+
+
+def encode_card(card: object, resolve: Callable[[str], Mapping[str, Any] | None]) -> object:
+    """Encode a card for storing.
+
+    Views are replaced with a reference to their base card and the fields that differ.
+    """
+    if not isinstance(card, Mapping):
+        return card
+    if isinstance(card, ChainMap):
+        ref = card.maps[-1].get("code")
+        base = resolve(ref) if ref else None
+        # NOTE: A view can only be stored as a reference if it doesn't need to hide any field of its
+        # base card.
+        if base is not None and all(key in card for key in base):
+            # NOTE: Keep every field the view sets itself, even one equal to its base card, so it
+            # doesn't follow later changes of the base card.
+            own_keys = {key for fields in card.maps[:-1] for key in fields}
+            overlay = {key: encode_card(card[key], resolve) for key in card if key in own_keys}
+            return {CARD_REF_KEY: ref, **overlay}
+    return {key: encode_card(value, resolve) for key, value in card.items()}
+
+
+class PackFile(NamedTuple):
+    kind: str
+    mtime: float
+    size: int
+    hash: str
+
+
+class CardStore:
+    """SQLite backed ArkhamDB card store keyed by card code.
+
+    Cards are stored fully patched and only deserialized on lookup, so a filtered run only pays for
+    the cards it touches. Linked, duplicate and parallel cards are stored as references to the card
+    they are based on, and resolved as copy-on-write views on lookup. The raw cards of every pack
+    file are kept alongside together with the file hash, so that a pack file change only requires
+    re-merging the cards it affects.
+    """
+
+    def __init__(self, filename: str | Path) -> None:
+        self.filename = Path(filename)
+        self.connection: sqlite3.Connection | None = None
+        self.cards: dict[str, Mapping[str, Any]] = {}
+        self.caches: dict[str, dict[Any, Any]] = {}
+
+    def exists(self) -> bool:
+        return self.filename.is_file()
+
+    def open(self) -> None:
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.filename)
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.clear_caches()
+
+    def clear_caches(self) -> None:
+        self.cards.clear()
+        for cache in self.caches.values():
+            cache.clear()
+
+    def get_cache(self, name: str) -> dict[Any, Any]:
+        """Get a named cache for data derived from the cards, cleared whenever the cards change."""
+        return self.caches.setdefault(name, {})
+
+    def get_meta(self, key: str) -> str | None:
+        self.open()
+        try:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+    def is_valid(self, **meta: str) -> bool:
+        """Check the store exists and was built from the same inputs."""
+        if not self.exists():
+            return False
+        if self.get_meta("version") != CARD_STORE_VERSION:
+            return False
+        return all(self.get_meta(key) == value for key, value in meta.items())
+
+    def build(
+        self,
+        cards: Iterable[Mapping[str, Any]],
+        packs: dict[str, tuple[PackFile, list[dict[str, Any]]]] | None = None,
+        **meta: str,
+    ) -> None:
+        """Write all cards into a fresh store, replacing the old one atomically."""
+        self.close()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        temp_filename = self.filename.with_suffix(f"{self.filename.suffix}.tmp")
+        temp_filename.unlink(missing_ok=True)
+        self.connection = sqlite3.connect(temp_filename)
+        try:
+            with self.connection:
+                for statement in CARD_STORE_SCHEMA:
+                    self.connection.execute(statement)
+                self.connection.execute(
+                    "INSERT INTO meta VALUES (?, ?)", ("version", CARD_STORE_VERSION)
+                )
+            self.update(cards, packs=packs, **meta)
+        finally:
+            self.close()
+        temp_filename.replace(self.filename)
+
+    def update(
+        self,
+        cards: Iterable[Mapping[str, Any]],
+        removed_codes: Iterable[str] = (),
+        packs: dict[str, tuple[PackFile, list[dict[str, Any]]]] | None = None,
+        removed_packs: Iterable[str] = (),
+        **meta: str,
+    ) -> None:
+        """Write the changed cards and pack files into the store in a single transaction."""
+        self.open()
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM cards WHERE code = ?", ((code,) for code in removed_codes)
+            )
+            cards = {card["code"]: card for card in cards}
+
+            def resolve(code: str) -> Mapping[str, Any] | None:
+                return cards[code] if code in cards else self.get(code)
+
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO cards VALUES (?, ?)",
+                (
+                    (code, json.dumps(encode_card(card, resolve), ensure_ascii=False))
+                    for code, card in cards.items()
+                ),
+            )
+            for path in [*removed_packs, *(packs or {})]:
+                self.connection.execute("DELETE FROM pack_files WHERE path = ?", (path,))
+                self.connection.execute("DELETE FROM pack_cards WHERE path = ?", (path,))
+                self.connection.execute("DELETE FROM pack_links WHERE path = ?", (path,))
+            for path, (pack_file, pack_cards) in (packs or {}).items():
+                self.connection.execute(
+                    "INSERT INTO pack_files VALUES (?, ?, ?, ?, ?)", (path, *pack_file)
+                )
+                self.connection.executemany(
+                    "INSERT INTO pack_cards VALUES (?, ?, ?, ?)",
+                    (
+                        (path, pack_file.kind, card["code"], json.dumps(card, ensure_ascii=False))
+                        for card in pack_cards
+                    ),
+                )
+                self.connection.executemany(
+                    "INSERT INTO pack_links VALUES (?, ?, ?)",
+                    (
+                        (path, card["code"], card[key])
+                        for card in pack_cards
+                        for key in CARD_LINK_KEYS
+                        if card.get(key)
+                    ),
+                )
+            self.connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", meta.items())
+        self.clear_caches()
+
+    def get_pack_files(self) -> dict[str, PackFile]:
+        self.open()
+        return {
+            row[0]: PackFile(*row[1:])
+            for row in self.connection.execute("SELECT * FROM pack_files")
+        }
+
+    def get_pack_codes(self, paths: Iterable[str]) -> set[str]:
+        """Get the codes of all cards recorded for the given pack files."""
+        self.open()
+        codes = set()
+        for path in paths:
+            codes.update(
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT code FROM pack_cards WHERE path = ?", (path,)
+                )
+            )
+        return codes
+
+    def get_pack_cards(self, codes: Iterable[str]) -> list[tuple[str, str, dict[str, Any]]]:
+        """Get the raw (path, kind, card) pack entries of the given codes, in pack file order."""
+        self.open()
+        rows = []
+        for code in codes:
+            rows.extend(
+                self.connection.execute(
+                    "SELECT path, kind, data FROM pack_cards WHERE code = ?", (code,)
+                )
+            )
+        rows.sort(key=lambda row: row[0])
+        return [(path, kind, json.loads(data)) for path, kind, data in rows]
+
+    def get_dependent_codes(self, codes: Iterable[str]) -> set[str]:
+        """Get the codes of all raw cards linking to any of the given codes by any link key."""
+        self.open()
+        dependent_codes = set()
+        for code in codes:
+            dependent_codes.update(
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT code FROM pack_links WHERE link = ?", (code,)
+                )
+            )
+        return dependent_codes
+
+    def decode_card(self, data: object) -> object:
+        if not isinstance(data, dict):
+            return data
+        card = {key: self.decode_card(value) for key, value in data.items() if key != CARD_REF_KEY}
+        if CARD_REF_KEY in data:
+            return card_view(self[data[CARD_REF_KEY]], **card)
+        return card
+
+    def get(self, code: str) -> Mapping[str, Any] | None:
+        if code in self.cards:
+            return self.cards[code]
+        self.open()
+        row = self.connection.execute("SELECT data FROM cards WHERE code = ?", (code,)).fetchone()
+        if row is None:
+            return None
+        card = self.decode_card(json.loads(row[0]))
+        self.cards[code] = card
+        return card
+
+    def __getitem__(self, code: str) -> Mapping[str, Any]:
+        card = self.get(code)
+        if card is None:
+            raise KeyError(code)
+        return card
+
+    def __contains__(self, code: object) -> bool:
+        if code in self.cards:
+            return True
+        self.open()
+        return (
+            self.connection.execute("SELECT 1 FROM cards WHERE code = ?", (code,)).fetchone()
+            is not None
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        self.open()
+        return (row[0] for row in self.connection.execute("SELECT code FROM cards"))
+
+    def __len__(self) -> int:
+        self.open()
+        return self.connection.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+
+RawCard = tuple[str, str, dict[str, Any]]
+
+
+def scan_pack_changes(
+    store: CardStore,
+    pack_files: dict[str, PackFile],
+    load_pack: Callable[[str], list[dict[str, Any]]],
+    *,
+    is_valid: bool = True,
+) -> tuple[dict[str, tuple[PackFile, list[dict[str, Any]]]], list[str], set[str]]:
+    """Find the pack files that changed since they were recorded in the store.
+
+    Only the pack files whose size or modification time changed are read again, and their cards only
+    count as changed if the content hash differs too. Return the re-read pack files to record, the
+    removed pack files and the changed codes.
+    """
+    recorded_files = store.get_pack_files() if is_valid else {}
+    removed_packs = [path for path in recorded_files if path not in pack_files]
+    changed_codes = store.get_pack_codes(removed_packs) if is_valid else set()
+    packs = {}
+    for path, pack_file in pack_files.items():
+        recorded_file = recorded_files.get(path)
+        if recorded_file and recorded_file[1:3] == pack_file[1:3]:
+            continue
+        pack_file = pack_file._replace(hash=get_file_hash(path))
+        pack_cards = load_pack(path)
+        packs[path] = (pack_file, pack_cards)
+        if not recorded_file or recorded_file.hash != pack_file.hash:
+            changed_codes.update(card["code"] for card in pack_cards)
+            if is_valid:
+                changed_codes.update(store.get_pack_codes([path]))
+    return packs, removed_packs, changed_codes
+
+
+def collect_raw_cards(
+    store: CardStore,
+    codes: Iterable[str],
+    packs: dict[str, tuple[PackFile, list[dict[str, Any]]]],
+    removed_packs: Iterable[str] = (),
+    *,
+    is_valid: bool = True,
+) -> tuple[set[str], list[RawCard]]:
+    """Collect the raw pack entries of the cards to merge and all cards linked to or from them.
+
+    Entries come from the recorded pack files that didn't change and from the re-read ones, sorted
+    in pack file order. Return all collected codes and the (path, kind, card) entries.
+    """
+    removed_packs = set(removed_packs)
+
+    def get_raw_cards(codes: set[str]) -> list[RawCard]:
+        raw_cards = []
+        if is_valid:
+            raw_cards.extend(
+                (path, kind, card)
+                for path, kind, card in store.get_pack_cards(codes)
+                if path not in packs and path not in removed_packs
+            )
+        # NOTE: Copy the new pack cards since merging modifies them while they are still to be
+        # recorded as raw cards.
+        raw_cards.extend(
+            (path, pack_file.kind, dict(card))
+            for path, (pack_file, pack_cards) in packs.items()
+            for card in pack_cards
+            if card["code"] in codes
+        )
+        return raw_cards
+
+    codes = set(codes)
+    pending = set(codes)
+    raw_cards = []
+    while pending:
+        pending_cards = get_raw_cards(pending)
+        raw_cards.extend(pending_cards)
+        linked_codes = {card.get(key) for _, _, card in pending_cards for key in CARD_MERGE_KEYS}
+        if is_valid:
+            linked_codes.update(store.get_dependent_codes(pending))
+        linked_codes.update(
+            card["code"]
+            for _, (_, pack_cards) in packs.items()
+            for card in pack_cards
+            if any(card.get(key) in pending for key in CARD_LINK_KEYS)
+        )
+        pending = linked_codes - codes - {None}
+        codes.update(pending)
+    raw_cards.sort(key=lambda raw_card: raw_card[0])
+    return codes, raw_cards
@@ -1,21 +1,7 @@
 import os
-from enum import Enum, auto, StrEnum
+from enum import StrEnum
 
 
-class SEProperties(Enum):
-    F_P_HEADER = auto()
-    F_P_FLAVOR = auto()
-    F_P_RULE = auto()
-    B_P_HEADER = auto()
-    B_P_RULE = auto()
-    F_CONNECTION = auto()
-    B_CONNECTION = auto()
-    SLOT = auto()
-    SKILL = auto()
-    DECK_HEADER = auto()
-    DECK_RULE = auto()
-    FACTION = auto()
-
 class LocationIcon(StrEnum):
     TILDE = "Slash"
     SQUARE = "Square"
@@ -37,20 +23,6 @@ class LocationIcon(StrEnum):
     T = "T",
     QUOTE = "Quote",
 
-SE_PROPERTY_COUNTS = {
-    SEProperties.F_P_HEADER: 8,
-    SEProperties.F_P_FLAVOR: 8,
-    SEProperties.F_P_RULE: 8,
-    SEProperties.B_P_HEADER: 7,
-    SEProperties.B_P_RULE: 6,
-    SEProperties.F_CONNECTION: 6,
-    SEProperties.B_CONNECTION: 6,
-    SEProperties.SLOT: 2,
-    SEProperties.SKILL: 6,
-    SEProperties.DECK_HEADER: 8,
-    SEProperties.DECK_RULE: 8,
-    SEProperties.FACTION: 3,
-}
 SLOT_MAP = {
     "Hand": "1 Hand",
     "Hand x2": "2 Hands",
@@ -142,12 +114,6 @@ PACK_YEAR_MAP = {
 SKILL_NAMES = ["willpower", "intellect", "combat", "agility", "wild"]
 
 
-class AssignmentType(Enum):
-    STATIC = auto()
-    DYNAMIC = auto()
-    RANGE = auto()
-
-
 PROCESS_STEPS = ["translate", "generate", "pack", "upload", "update"]
 SUPPORTED_LANGUAGES = ["es", "de", "it", "fr", "ko", "uk", "pl", "ru", "zh_TW", "zh_CN"]
 SCRIPT_ARGS = {
@@ -162,6 +128,18 @@ SCRIPT_ARGS = {
     "mod-dir-primary": {"default": "repos/SCED", "help": "The directory to the primary mod repository"},
     "mod-dir-secondary": {"default": "repos/loadable-objects", "help": "The directory to the secondary mod repository"},
     "url-file": {"default": "cache/urls.json", "help": "The file to keep the url mapping"},
+    "download-workers": {"default": 8, "type": int, "help": "The number of concurrent deck image downloads"},
+    "revalidate": {"action": "store_true", "help": "Whether to check cached deck images for upstream changes before translating"},
+    "crop-workers": {"default": 1, "type": int, "help": "The number of processes cropping card images"},
+    "portrait-format": {"default": "png", "choices": ["png", "png-fast", "png-raw", "bmp"], "help": "The image format of cropped card images"},
+    "pack-workers": {"default": 1, "type": int, "help": "The number of processes packing deck images"},
+    "upload-workers": {"default": 4, "type": int, "help": "The number of concurrent deck image uploads"},
+    "image-host": {"default": "dropbox", "choices": ["dropbox", "local", "http"], "help": "Where to upload translated deck images"},
+    "image-host-dir": {"default": "hosted", "help": "The directory to copy deck images into for the local and http image hosts"},
+    "image-host-url": {"default": "http://localhost:8000", "help": "The base URL of the directory served for the http image host"},
+    "render-shards": {"default": 1, "type": int, "help": "The number of concurrent Strange Eons processes generating card images"},
+    "render-ppi": {"default": None, "type": int, "help": "The resolution to generate card images at, instead of the smallest one filling their deck slots"},
+    "render-server": {"default": None, "help": "Comma separated host:port addresses of running render servers to generate card images on"},
     "dropbox-token": {"default": None, "help": "The dropbox token for uploading translated deck images"},
     "new-link": {"action": "store_true", "help": "Whether to create new URL while uploading deck images"},
     "step": {"default": None, "choices": PROCESS_STEPS, "help": "The particular automation step to run"}
@@ -1043,6 +1021,8 @@ SHELTER_POINT_CARDS = [
     "08514",
 ]
 
+PARALLEL_CARD_CODES = ["90001", "90008", "90017", "90024", "90037"]
+
 BLOB_POINT_CARDS = [
     "85039",
     "85040",
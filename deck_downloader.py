@@ -0,0 +1,184 @@
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from file_hash import get_file_hash
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# NOTE: HTTP status codes that are worth retrying, anything else fails the download immediately.
+RETRY_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUS_CODES
+    return isinstance(
+        error,
+        (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError),
+    )
+
+
+def get_sidecar_filename(filename: Path) -> Path:
+    return filename.with_name(f"{filename.name}.json")
+
+
+def read_sidecar(filename: Path) -> dict[str, Any] | None:
+    """Read the validators recorded for a downloaded file, or None if it has no valid record."""
+    try:
+        with get_sidecar_filename(filename).open(encoding="utf-8") as file:
+            sidecar = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return sidecar if isinstance(sidecar, dict) else None
+
+
+def is_downloaded(filename: Path) -> bool:
+    """Check a file was completely downloaded, i.e. it has a sidecar recording its current size."""
+    if not filename.is_file():
+        return False
+    sidecar = read_sidecar(filename)
+    return sidecar is not None and sidecar.get("size") == filename.stat().st_size
+
+
+def write_sidecar(filename: Path, sidecar: dict[str, Any]) -> None:
+    sidecar_filename = get_sidecar_filename(filename)
+    temp_filename = sidecar_filename.with_name(
+        f"{sidecar_filename.name}.{threading.get_ident()}.tmp"
+    )
+    with temp_filename.open("w", encoding="utf-8") as file:
+        json.dump(sidecar, file, indent=2)
+    temp_filename.replace(sidecar_filename)
+
+
+class DeckDownloader:
+    """Download deck images concurrently through a pooled HTTP session.
+
+    Each file is written to a temporary file first and renamed into place once complete, so an
+    interrupted download never leaves a truncated image behind. Connection errors, timeouts and
+    server errors are retried with exponential backoff. Next to each file, a sidecar keeps its ETag,
+    Last-Modified, size and content hash, which allows cheap conditional revalidation later on.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url: str, filename: Path, sidecar: dict[str, Any] | None = None) -> bool:
+        """Fetch a URL into a file, conditional on the sidecar. Return whether it changed."""
+        headers = {}
+        if sidecar and sidecar.get("url") == url:
+            if sidecar.get("etag"):
+                headers["If-None-Match"] = sidecar["etag"]
+            if sidecar.get("last_modified"):
+                headers["If-Modified-Since"] = sidecar["last_modified"]
+        temp_filename = filename.with_name(f"{filename.name}.{threading.get_ident()}.tmp")
+        try:
+            with self.session.get(
+                url, headers=headers, stream=True, timeout=self.timeout
+            ) as response:
+                if response.status_code == 304:
+                    return False
+                response.raise_for_status()
+                content_hash = hashlib.sha256()
+                size = 0
+                with temp_filename.open("wb") as file:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                        content_hash.update(chunk)
+                        size += len(chunk)
+                new_sidecar = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "size": size,
+                    "hash": content_hash.hexdigest(),
+                }
+            # NOTE: Servers without validators send the full content again, so compare the hashes.
+            changed = not (
+                sidecar and sidecar.get("hash") == new_sidecar["hash"] and filename.is_file()
+            )
+            if changed:
+                temp_filename.replace(filename)
+            write_sidecar(filename, new_sidecar)
+            return changed
+        finally:
+            temp_filename.unlink(missing_ok=True)
+
+    def fetch_with_retries(self, url: str, filename: Path, sidecar: dict[str, Any] | None) -> bool:
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        attempt = 0
+        while True:
+            try:
+                return self.fetch(url, filename, sidecar)
+            except requests.RequestException as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    raise
+                self.sleep(self.backoff * 2**attempt)
+                attempt += 1
+
+    def download(self, url: str, filename: str | Path) -> Path:
+        filename = Path(filename)
+        self.fetch_with_retries(url, filename, None)
+        return filename
+
+    def revalidate(self, url: str, filename: str | Path) -> bool:
+        """Download a file again if it changed on the server. Return whether it changed."""
+        filename = Path(filename)
+        sidecar = read_sidecar(filename) if is_downloaded(filename) else None
+        # NOTE: Files downloaded before sidecars existed, or left truncated, are fetched again and
+        # compared by content.
+        if sidecar is None and filename.is_file():
+            sidecar = {"url": url, "hash": get_file_hash(filename)}
+        return self.fetch_with_retries(url, filename, sidecar)
+
+    def run_all(
+        self, func: Callable[[str, Path], Any], items: dict[str, Path], action: str
+    ) -> tuple[dict[str, Any], dict[str, Exception]]:
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(func, url, filename): url for url, filename in items.items()}
+            for i, future in enumerate(as_completed(futures)):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                    print(f"{action} {Path(items[url]).name} ({i + 1}/{len(futures)})...")
+                except Exception as e:
+                    errors[url] = e
+        return results, errors
+
+    def download_all(self, downloads: dict[str, Path]) -> dict[str, Exception]:
+        """Download all URLs into their filenames, returning the errors of failed ones by URL."""
+        _, errors = self.run_all(self.download, downloads, "Downloaded")
+        return errors
+
+    def revalidate_all(self, downloads: dict[str, Path]) -> tuple[set[str], dict[str, Exception]]:
+        """Revalidate all URLs, returning the URLs whose files changed and the errors by URL."""
+        results, errors = self.run_all(self.revalidate, downloads, "Revalidated")
+        return {url for url, changed in results.items() if changed}, errors
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,237 @@
+import os
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from PIL import Image
+
+# NOTE: Default memory budget for decoded deck sheets, which are around 50MB each for a 10x7 deck.
+DECK_SHEET_CACHE_BUDGET = 512 * 1024 * 1024
+
+
+class PortraitFormat(NamedTuple):
+    extension: str
+    params: dict[str, Any]
+
+
+# NOTE: Formats of cropped card images, which Strange Eons only reads back as portrait sources. All
+# are lossless and readable by Java ImageIO, trading disk space for encoding and decoding time.
+PORTRAIT_FORMATS = {
+    "png": PortraitFormat("png", {"format": "PNG"}),
+    "png-fast": PortraitFormat("png", {"format": "PNG", "compress_level": 1}),
+    "png-raw": PortraitFormat("png", {"format": "PNG", "compress_level": 0}),
+    "bmp": PortraitFormat("bmp", {"format": "BMP"}),
+}
+
+
+def get_image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+def get_slot_box(
+    sheet_size: tuple[int, int], deck_w: int, deck_h: int, deck_x: int, deck_y: int
+) -> tuple[int, int, int, int]:
+    """Get the pixel box of a card slot in a deck sheet, rounded the same way as cropping does."""
+    width = sheet_size[0] / deck_w
+    height = sheet_size[1] / deck_h
+    left = deck_x * width
+    top = deck_y * height
+    return round(left), round(top), round(left + width), round(top + height)
+
+
+def get_slot_size(
+    sheet_size: tuple[int, int], deck_w: int, deck_h: int, *, rotate: bool = False
+) -> tuple[int, int]:
+    """Get the pixel size a card is packed into a deck sheet slot at, oriented like the card."""
+    width = sheet_size[0] // deck_w
+    height = sheet_size[1] // deck_h
+    return (height, width) if rotate else (width, height)
+
+
+def crop_slot(
+    sheet: Image.Image, deck_w: int, deck_h: int, deck_x: int, deck_y: int, *, rotate: bool
+) -> Image.Image:
+    card_image = sheet.crop(get_slot_box(sheet.size, deck_w, deck_h, deck_x, deck_y))
+    if rotate:
+        card_image = card_image.transpose(method=Image.Transpose.ROTATE_90)
+    return card_image
+
+
+class DeckSheetCache:
+    """Decoded deck sheets kept in memory up to a budget, evicting the least recently used ones.
+
+    Sheet sizes are kept separately, so that they can be looked up from the image header without
+    decoding the sheet.
+    """
+
+    def __init__(self, budget: int = DECK_SHEET_CACHE_BUDGET) -> None:
+        self.budget = budget
+        self.sheets: OrderedDict[Path, Image.Image] = OrderedDict()
+        self.sizes: dict[Path, tuple[int, int]] = {}
+        self.total = 0
+
+    def get(self, filename: str | Path) -> Image.Image:
+        filename = Path(filename)
+        sheet = self.sheets.get(filename)
+        if sheet is not None:
+            self.sheets.move_to_end(filename)
+            return sheet
+        sheet = Image.open(filename)
+        sheet.load()
+        self.sheets[filename] = sheet
+        self.sizes[filename] = sheet.size
+        self.total += get_image_bytes(sheet)
+        # NOTE: Always keep the sheet just decoded, even if it alone exceeds the budget.
+        while self.total > self.budget and len(self.sheets) > 1:
+            _, evicted = self.sheets.popitem(last=False)
+            self.total -= get_image_bytes(evicted)
+        return sheet
+
+    def get_size(self, filename: str | Path) -> tuple[int, int]:
+        filename = Path(filename)
+        if filename not in self.sizes:
+            with Image.open(filename) as image:
+                self.sizes[filename] = image.size
+        return self.sizes[filename]
+
+    def discard(self, filename: str | Path) -> None:
+        filename = Path(filename)
+        sheet = self.sheets.pop(filename, None)
+        if sheet is not None:
+            self.total -= get_image_bytes(sheet)
+        self.sizes.pop(filename, None)
+
+    def clear(self) -> None:
+        self.sheets.clear()
+        self.sizes.clear()
+        self.total = 0
+
+
+class CardCrop(NamedTuple):
+    filename: Path
+    deck_w: int
+    deck_h: int
+    deck_x: int
+    deck_y: int
+    rotate: bool
+
+
+def crop_deck(
+    deck_image_filename: Path,
+    crops: list[CardCrop],
+    cache: DeckSheetCache | None = None,
+    portrait_format: str = "png",
+) -> int:
+    """Crop card images from a deck image decoded only once. Return the number of images."""
+    if cache is not None:
+        sheet = cache.get(deck_image_filename)
+    else:
+        sheet = Image.open(deck_image_filename)
+        sheet.load()
+    for crop in crops:
+        card_image = crop_slot(
+            sheet, crop.deck_w, crop.deck_h, crop.deck_x, crop.deck_y, rotate=crop.rotate
+        )
+        # NOTE: Write to a temporary file first, so an interrupted run leaves no truncated image.
+        temp_filename = crop.filename.with_name(f"{crop.filename.name}.{os.getpid()}.tmp")
+        try:
+            card_image.save(temp_filename, **PORTRAIT_FORMATS[portrait_format].params)
+            temp_filename.replace(crop.filename)
+        finally:
+            temp_filename.unlink(missing_ok=True)
+    return len(crops)
+
+
+def run_deck_tasks(
+    func: Callable[..., Any], tasks: dict[Any, tuple], max_workers: int | None, action: str
+) -> dict[Any, Exception]:
+    """Run a function once per deck with the given arguments, returning the errors by deck.
+
+    With more than one worker, the decks are spread over a process pool, since image work is
+    CPU-bound. Tasks are submitted in order, so callers should put the largest decks first to avoid
+    them ending up alone at the tail.
+    """
+    errors = {}
+    done = 0
+    if max_workers is not None and max_workers <= 1:
+        for deck, task in tasks.items():
+            try:
+                func(*task)
+                done += 1
+                print(f"{action} {deck} ({done}/{len(tasks)})...")
+            except Exception as e:
+                errors[deck] = e
+        return errors
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, *task): deck for deck, task in tasks.items()}
+        for future in as_completed(futures):
+            deck = futures[future]
+            try:
+                future.result()
+                done += 1
+                print(f"{action} {deck} ({done}/{len(tasks)})...")
+            except Exception as e:
+                errors[deck] = e
+    return errors
+
+
+def crop_decks(
+    crops: dict[Path, list[CardCrop]],
+    max_workers: int | None = 1,
+    cache: DeckSheetCache | None = None,
+    portrait_format: str = "png",
+) -> dict[Path, Exception]:
+    """Crop card images with one task per deck image, returning the errors by deck image.
+
+    The cache of decoded deck images is only used when cropping in this process.
+    """
+    if max_workers is None or max_workers > 1:
+        cache = None
+    tasks = {
+        deck_image_filename: (deck_image_filename, deck_crops, cache, portrait_format)
+        for deck_image_filename, deck_crops in sorted(
+            crops.items(), key=lambda item: len(item[1]), reverse=True
+        )
+    }
+    return run_deck_tasks(crop_deck, tasks, max_workers, "Cropped card images of")
+
+
+class DeckSlot(NamedTuple):
+    filename: Path
+    deck_w: int
+    deck_h: int
+    deck_x: int
+    deck_y: int
+    rotate: bool
+
+
+def pack_deck(deck_image_filename: Path, slots: list[DeckSlot], filename: Path) -> None:
+    """Paste card images into their slots of a deck image and write it as JPEG."""
+    with Image.open(deck_image_filename) as deck_image:
+        deck_image.load()
+        for slot in slots:
+            with Image.open(slot.filename) as card_image:
+                if slot.rotate:
+                    card_image = card_image.transpose(method=Image.Transpose.ROTATE_270)
+                width, height = get_slot_size(deck_image.size, slot.deck_w, slot.deck_h)
+                left = slot.deck_x * width
+                top = slot.deck_y * height
+                card_image = card_image.resize((width, height))
+                deck_image.paste(card_image, box=(left, top))
+        deck_image = deck_image.convert("RGB")
+    temp_filename = filename.with_name(f"{filename.name}.{os.getpid()}.tmp")
+    try:
+        deck_image.save(temp_filename, format="JPEG", progressive=True, optimize=True)
+        temp_filename.replace(filename)
+    finally:
+        temp_filename.unlink(missing_ok=True)
+
+
+def pack_decks(
+    decks: dict[str, tuple[Path, list[DeckSlot], Path]], max_workers: int | None = 1
+) -> dict[str, Exception]:
+    """Pack (deck image, slots, output) tasks one deck at a time, returning the errors by deck."""
+    tasks = dict(sorted(decks.items(), key=lambda item: len(item[1][1]), reverse=True))
+    return run_deck_tasks(pack_deck, tasks, max_workers, "Packed")
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import dropbox
+from dropbox.exceptions import ApiError
+
+# NOTE: Dropbox content hashes are the SHA-256 of the concatenated SHA-256 of each 4MB file block.
+DROPBOX_HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+# NOTE: Files larger than the threshold are uploaded in chunks through an upload session, instead of
+# in a single request.
+DROPBOX_SESSION_THRESHOLD = 16 * 1024 * 1024
+DROPBOX_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def get_content_hash(filename: Path) -> str:
+    block_hashes = hashlib.sha256()
+    with filename.open("rb") as file:
+        for block in iter(lambda: file.read(DROPBOX_HASH_BLOCK_SIZE), b""):
+            block_hashes.update(hashlib.sha256(block).digest())
+    return block_hashes.hexdigest()
+
+
+def write_json(filename: Path, data: object) -> None:
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    temp_filename = filename.with_suffix(f"{filename.suffix}.tmp")
+    with temp_filename.open("w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2, sort_keys=True)
+    temp_filename.replace(filename)
+
+
+def get_direct_url(url: str) -> str:
+    # NOTE: Get direct download link from the dropbox sharing link.
+    return url.replace("?dl=0", "").replace("www.dropbox.com", "dl.dropboxusercontent.com")
+
+
+class DropboxUploader:
+    """Upload deck images to a Dropbox folder concurrently, skipping the ones already up to date.
+
+    The content hash and shared link of every uploaded file is kept in a local manifest. Files whose
+    content hash matches the manifest or the remote metadata are not uploaded again, and shared
+    links are looked up from the manifest or a single listing of all links before creating new ones.
+    Large files are streamed from disk in chunks through upload sessions. The offset of every open
+    session is kept in a journal next to the manifest, so that an interrupted upload continues from
+    its last chunk.
+    """
+
+    def __init__(
+        self,
+        dbx: dropbox.Dropbox,
+        folder: str,
+        manifest_filename: str | Path,
+        max_workers: int = 4,
+        session_threshold: int = DROPBOX_SESSION_THRESHOLD,
+        chunk_size: int = DROPBOX_CHUNK_SIZE,
+    ) -> None:
+        self.dbx = dbx
+        self.folder = folder
+        self.manifest_filename = Path(manifest_filename)
+        self.journal_filename = self.manifest_filename.with_suffix(
+            f"{self.manifest_filename.suffix}.journal"
+        )
+        self.max_workers = max_workers
+        self.session_threshold = session_threshold
+        self.chunk_size = chunk_size
+        self.files: dict[str, dict[str, Any]] = {}
+        self.sessions: dict[str, dict[str, Any]] = {}
+        self.links: dict[str, str] | None = None
+        self.lock = threading.Lock()
+        if self.manifest_filename.is_file():
+            with self.manifest_filename.open(encoding="utf-8") as file:
+                self.files = json.load(file)
+        if self.journal_filename.is_file():
+            with self.journal_filename.open(encoding="utf-8") as file:
+                self.sessions = json.load(file)
+
+    def get_links(self) -> dict[str, str]:
+        """Get the shared links of all files by their lower case path, listing them once."""
+        with self.lock:
+            if self.links is None:
+                links = {}
+                result = self.dbx.sharing_list_shared_links()
+                while True:
+                    for link in result.links:
+                        if link.path_lower:
+                            links[link.path_lower] = link.url
+                    if not result.has_more:
+                        break
+                    result = self.dbx.sharing_list_shared_links(cursor=result.cursor)
+                self.links = links
+            return self.links
+
+    def is_uploaded(self, path: str, content_hash: str) -> bool:
+        try:
+            metadata = self.dbx.files_get_metadata(path)
+        except ApiError:
+            return False
+        return getattr(metadata, "content_hash", None) == content_hash
+
+    def upload_file(self, filename: Path, path: str, content_hash: str) -> None:
+        if filename.stat().st_size > self.session_threshold:
+            self.upload_session(filename, path, content_hash)
+            return
+        with filename.open("rb") as file:
+            # NOTE: Setting overwrite to true so that the old deck image is replaced, and the
+            # sharing link still maintains.
+            self.dbx.files_upload(file.read(), path, mode=dropbox.files.WriteMode.overwrite)
+
+    def upload_session(self, filename: Path, path: str, content_hash: str) -> None:
+        with self.lock:
+            session = self.sessions.get(filename.name)
+        with filename.open("rb") as file:
+            # NOTE: Only resume a session of the same content, otherwise the chunks sent are stale.
+            if session is not None and session["content_hash"] == content_hash:
+                print(f"Resuming {filename.name} from {session['offset']} bytes...")
+                try:
+                    self.finish_session(file, path, filename.name, session)
+                    return
+                except ApiError as e:
+                    print(f"Warning: Failed to resume uploading {filename.name}, restarting: {e}")
+            file.seek(0)
+            result = self.dbx.files_upload_session_start(file.read(self.chunk_size))
+            session = {
+                "session_id": result.session_id,
+                "offset": file.tell(),
+                "content_hash": content_hash,
+            }
+            self.set_session(filename.name, session)
+            self.finish_session(file, path, filename.name, session)
+
+    def finish_session(self, file: BinaryIO, path: str, name: str, session: dict[str, Any]) -> None:
+        size = os.fstat(file.fileno()).st_size
+        file.seek(session["offset"])
+        cursor = dropbox.files.UploadSessionCursor(session["session_id"], session["offset"])
+        while size - cursor.offset > self.chunk_size:
+            self.dbx.files_upload_session_append_v2(file.read(self.chunk_size), cursor)
+            cursor.offset = file.tell()
+            self.set_session(name, {**session, "offset": cursor.offset})
+        commit = dropbox.files.CommitInfo(path=path, mode=dropbox.files.WriteMode.overwrite)
+        self.dbx.files_upload_session_finish(file.read(), cursor, commit)
+        self.set_session(name, None)
+
+    def set_session(self, name: str, session: dict[str, Any] | None) -> None:
+        """Record the progress of an upload session in the journal, or remove it once finished."""
+        with self.lock:
+            if session is None:
+                self.sessions.pop(name, None)
+            else:
+                self.sessions[name] = session
+            write_json(self.journal_filename, self.sessions)
+
+    def upload(self, filename: Path, *, new_link: bool = False) -> str:
+        """Upload a file unless it's unchanged, and return its direct download link."""
+        path = f"{self.folder}/{filename.name}"
+        content_hash = get_content_hash(filename)
+        with self.lock:
+            entry = self.files.get(filename.name)
+        is_current = entry is not None and entry["content_hash"] == content_hash
+        if not is_current and not self.is_uploaded(path, content_hash):
+            print(f"Uploading {filename.name}...")
+            self.upload_file(filename, path, content_hash)
+
+        url = None
+        if new_link:
+            # NOTE: Remove all existing shared links if we try to force creating new links.
+            for link in self.dbx.sharing_list_shared_links(path, direct_only=True).links:
+                self.dbx.sharing_revoke_shared_link(link.url)
+        elif entry is not None and entry.get("url"):
+            # NOTE: Overwriting a file keeps its shared link, so the link is still valid even if the
+            # content changed.
+            url = entry["url"]
+        else:
+            url = self.get_links().get(path.lower())
+        if url is None:
+            # NOTE: Dropbox will reuse the old sharing link if there's already one exist.
+            url = self.dbx.sharing_create_shared_link(path, short_url=True).url
+        url = get_direct_url(url)
+        with self.lock:
+            self.files[filename.name] = {"content_hash": content_hash, "url": url}
+        return url
+
+    def upload_all(
+        self, filenames: list[Path], *, new_link: bool = False
+    ) -> tuple[dict[Path, str], dict[Path, Exception]]:
+        """Upload files concurrently.
+
+        Return the links of the uploaded files and the errors of the failed ones.
+        """
+        # NOTE: Create a folder if not already exists.
+        with suppress(ApiError):
+            self.dbx.files_create_folder(self.folder)
+        urls = {}
+        errors = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self.upload, filename, new_link=new_link): filename
+                    for filename in filenames
+                }
+                for i, future in enumerate(as_completed(futures)):
+                    filename = futures[future]
+                    try:
+                        urls[filename] = future.result()
+                        print(f"Linked {filename.name} ({i + 1}/{len(futures)})...")
+                    except Exception as e:
+                        errors[filename] = e
+        finally:
+            self.save()
+        return urls, errors
+
+    def save(self) -> None:
+        with self.lock:
+            write_json(self.manifest_filename, self.files)
+            if not self.sessions:
+                self.journal_filename.unlink(missing_ok=True)
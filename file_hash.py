@@ -0,0 +1,13 @@
+import hashlib
+from pathlib import Path
+
+HASH_CHUNK_SIZE = 1 << 16
+
+
+def get_file_hash(filename: str | Path) -> str:
+    """Get the SHA-256 of a file as hex, reading it in chunks."""
+    content_hash = hashlib.sha256()
+    with Path(filename).open("rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
@@ -0,0 +1,86 @@
+import filecmp
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import dropbox
+
+from dropbox_uploader import DropboxUploader
+
+IMAGE_HOSTS = ["dropbox", "local", "http"]
+
+
+class ImageHost(ABC):
+    """A place deck images are uploaded to, which gives out the URLs the mod loads them from."""
+
+    @abstractmethod
+    def upload_all(
+        self, filenames: list[Path], *, new_link: bool = False
+    ) -> tuple[dict[Path, str], dict[Path, Exception]]:
+        """Upload files, returning the URLs of the uploaded ones and the errors of the others."""
+
+
+class DropboxHost(ImageHost):
+    def __init__(
+        self, token: str, folder: str, manifest_filename: str | Path, max_workers: int = 4
+    ) -> None:
+        self.uploader = DropboxUploader(
+            dropbox.Dropbox(token), folder, manifest_filename, max_workers
+        )
+
+    def upload_all(
+        self, filenames: list[Path], *, new_link: bool = False
+    ) -> tuple[dict[Path, str], dict[Path, Exception]]:
+        return self.uploader.upload_all(filenames, new_link=new_link)
+
+
+class LocalHost(ImageHost):
+    """Copy deck images into a local directory, and link them with file URLs.
+
+    Files that are already identical in the directory are not copied again. New links can't be
+    forced, since a file URL only depends on the file path.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def get_url(self, filename: Path) -> str:
+        return filename.resolve().as_uri()
+
+    def upload(self, filename: Path) -> str:
+        hosted_filename = self.directory / filename.name
+        if not hosted_filename.is_file() or not filecmp.cmp(
+            filename, hosted_filename, shallow=False
+        ):
+            print(f"Copying {filename.name}...")
+            temp_filename = hosted_filename.with_name(f"{hosted_filename.name}.tmp")
+            try:
+                shutil.copyfile(filename, temp_filename)
+                temp_filename.replace(hosted_filename)
+            finally:
+                temp_filename.unlink(missing_ok=True)
+        return self.get_url(hosted_filename)
+
+    def upload_all(
+        self, filenames: list[Path], *, new_link: bool = False
+    ) -> tuple[dict[Path, str], dict[Path, Exception]]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        urls = {}
+        errors = {}
+        for filename in filenames:
+            try:
+                urls[filename] = self.upload(filename)
+            except OSError as e:
+                errors[filename] = e
+        return urls, errors
+
+
+class HttpHost(LocalHost):
+    """Copy deck images into the directory of a static HTTP server, linked under its base URL."""
+
+    def __init__(self, directory: str | Path, base_url: str) -> None:
+        super().__init__(directory)
+        self.base_url = base_url.rstrip("/")
+
+    def get_url(self, filename: Path) -> str:
+        return f"{self.base_url}/{filename.name}"
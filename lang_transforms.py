@@ -0,0 +1,49 @@
+import importlib
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from types import ModuleType
+
+from constants import TRANSLATIONS_DIR_NAME
+
+Transform = Callable[..., str]
+
+
+def import_lang_module(lang_code: str, region: str) -> ModuleType | None:
+    """Import language dependent functions."""
+    lang_folder = Path(TRANSLATIONS_DIR_NAME) / lang_code
+    if str(lang_folder) not in sys.path:
+        sys.path.insert(1, str(lang_folder))
+    module_name = "transform"
+    if region:
+        module_name += f"_{region}"
+    try:
+        return importlib.import_module(module_name)
+    except ModuleNotFoundError as e:
+        # NOTE: Only a language without a transform module is skipped, a transform module missing
+        # its own dependency is an error.
+        if e.name == module_name:
+            return None
+        raise
+
+
+class LangTransforms:
+    """Registry of the 'transform_xxx' hooks of a language module, resolved once per field."""
+
+    def __init__(self, module: ModuleType | None) -> None:
+        self.module = module
+        self.transforms: dict[str, Transform | None] = {}
+
+    @classmethod
+    def load(cls, lang_code: str, region: str) -> "LangTransforms":
+        return cls(import_lang_module(lang_code, region))
+
+    def get(self, field: str) -> Transform | None:
+        """Get the transform hook of a field, or None if the language module doesn't declare one."""
+        if field not in self.transforms:
+            self.transforms[field] = getattr(self.module, f"transform_{field}", None)
+        return self.transforms[field]
+
+    def transform(self, field: str, value: str) -> str:
+        func = self.get(field)
+        return func(value) if func else value
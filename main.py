@@ -6,47 +6,81 @@
 # Return to scenarios, missing swapping encounter set icons data
 # Promos, LOL, TSK, MTT, FOF, no translation
 
-import copy
 import csv
 import glob
-import importlib
-import inspect
 import json
 import logging
 import re
 import shutil
 import subprocess
 import sys
-import urllib.request
 import uuid
-import warnings
-from contextlib import suppress
 from enum import Enum
-from functools import partial
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import click
-import dropbox
-from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
 from PIL import Image
 
 from card import Card, EnemyCard
+from card_store import (
+    CardStore,
+    PackFile,
+    card_view,
+    collect_raw_cards,
+    merge_ahdb_cards,
+    scan_pack_changes,
+)
 from constants import (
+    AHDB_FOLDER_NAME,
+    BLOB_POINT_CARDS,
+    CARDS_FOLDER_NAME,
     CHAOS_MERGE_TOKENS,
     CHAOS_TOKENS,
     LOCATION_ICON_MAP,
-    MARKUP_PATTERNS,
+    PARALLEL_CARD_CODES,
     PROCESS_STEPS,
     PROGRESS_LETTER_C_CARDS,
     PROGRESS_LETTER_E_CARDS,
     PROGRESS_LETTER_G_CARDS,
     RETURN_TO_SCENARIO_CODES,
     SCRIPT_ARGS,
+    SHELTER_POINT_CARDS,
     TRACKER_LABELS,
-    TRAITS_PATTERN,
-    TRAITS_REPLACEMENT,
+    TRANSLATIONS_DIR_NAME,
+)
+from deck_downloader import DeckDownloader, is_downloaded
+from deck_sheets import (
+    PORTRAIT_FORMATS,
+    CardCrop,
+    DeckSheetCache,
+    DeckSlot,
+    crop_decks,
+    get_slot_box,
+    get_slot_size,
+    pack_decks,
+)
+from file_hash import get_file_hash
+from image_host import IMAGE_HOSTS, DropboxHost, HttpHost, ImageHost, LocalHost
+from lang_transforms import LangTransforms, Transform
+from markup import translate_markup
+from pack_manifest import PackManifest, get_pack_inputs_hash
+from rule_text import parse_paragraphs
+from se_render import (
+    SE_PPI_ENV,
+    SE_PROJECT_DIR,
+    RenderCache,
+    get_context_hash,
+    get_render_keys,
+    get_server_context,
+    get_shard_images,
+    read_tables,
+    run_servers,
+    run_shards,
+    write_shards,
 )
+from se_schema import TemplateSchema
+from url_registry import UrlRegistry
 
 logging.basicConfig(
     filename="process.log", level=logging.INFO, format="%(asctime)s %(levelname)s:%(message)s"
@@ -74,15 +108,6 @@ SE_SUBTYPE_MAP = {
     "basicweakness": "BasicWeakness",
     None: "None",
 }
-SE_PROPERTY_COUNTS = {}
-
-
-def generate_property_count_tuple(count):
-    return lambda m, m_args: m(m_args[0], m_args[1], *m_args), "{}".format, count
-
-
-# Suppress BeautifulSoup useless warnings.
-warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
 
 
 @click.command()
@@ -130,6 +155,77 @@ warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
     help="The directory to the secondary mod repository",
 )
 @click.option("--url-file", default="cache/urls.json", help="The file to keep the url mapping")
+@click.option(
+    "--download-workers",
+    default=8,
+    type=int,
+    help="The number of concurrent deck image downloads",
+)
+@click.option(
+    "--revalidate",
+    is_flag=True,
+    help="Whether to check cached deck images for upstream changes before translating",
+)
+@click.option(
+    "--crop-workers",
+    default=1,
+    type=int,
+    help="The number of processes cropping card images",
+)
+@click.option(
+    "--portrait-format",
+    default="png",
+    type=click.Choice(list(PORTRAIT_FORMATS)),
+    help="The image format of cropped card images",
+)
+@click.option(
+    "--pack-workers",
+    default=1,
+    type=int,
+    help="The number of processes packing deck images",
+)
+@click.option(
+    "--upload-workers",
+    default=4,
+    type=int,
+    help="The number of concurrent deck image uploads",
+)
+@click.option(
+    "--image-host",
+    default="dropbox",
+    type=click.Choice(IMAGE_HOSTS),
+    help="Where to upload translated deck images",
+)
+@click.option(
+    "--image-host-dir",
+    default="hosted",
+    help="The directory to copy deck images into for the local and http image hosts",
+)
+@click.option(
+    "--image-host-url",
+    default="http://localhost:8000",
+    help="The base URL of the directory served for the http image host",
+)
+@click.option(
+    "--render-shards",
+    default=1,
+    type=int,
+    help="The number of concurrent Strange Eons processes generating card images",
+)
+@click.option(
+    "--render-ppi",
+    default=None,
+    type=int,
+    help=(
+        "The resolution to generate card images at, instead of the smallest one filling their "
+        "deck slots"
+    ),
+)
+@click.option(
+    "--render-server",
+    default=None,
+    help="Comma separated host:port addresses of running render servers to generate card images on",
+)
 @click.option(
     "--dropbox-token", default=None, help="The dropbox token for uploading translated deck images"
 )
@@ -154,14 +250,28 @@ def main(
     mod_dir_primary,
     mod_dir_secondary,
     url_file,
+    download_workers,
+    revalidate,
+    crop_workers,
+    portrait_format,
+    pack_workers,
+    upload_workers,
+    image_host,
+    image_host_dir,
+    image_host_url,
+    render_shards,
+    render_ppi,
+    render_server,
     dropbox_token,
     new_link,
     step,
 ):
     try:
         if step is None or step == "translate":
+            prefetch_deck_images()
             process_player_cards(translate_sced_object)
             process_encounter_cards(translate_sced_object)
+            crop_card_images()
             write_csv()
 
         if step is None or step == "generate":
@@ -243,6 +353,18 @@ if __name__ == "__main__":
         mod_dir_primary,
         mod_dir_secondary,
         url_file,
+        download_workers,
+        revalidate,
+        crop_workers,
+        portrait_format,
+        pack_workers,
+        upload_workers,
+        image_host,
+        image_host_dir,
+        image_host_url,
+        render_shards,
+        render_ppi,
+        render_server,
         dropbox_token,
         new_link,
         step,
@@ -261,14 +383,28 @@ def main(
     mod_dir_primary,
     mod_dir_secondary,
     url_file,
+    download_workers,
+    revalidate,
+    crop_workers,
+    portrait_format,
+    pack_workers,
+    upload_workers,
+    image_host,
+    image_host_dir,
+    image_host_url,
+    render_shards,
+    render_ppi,
+    render_server,
     dropbox_token,
     new_link,
     step,
 ):
     try:
         if step is None or step == "translate":
+            prefetch_deck_images()
             process_player_cards(translate_sced_object)
             process_encounter_cards(translate_sced_object)
+            crop_card_images()
             write_csv()
 
         if step is None or step == "generate":
@@ -346,25 +482,25 @@ def get_lang_code_region() -> Tuple[str, str]:
     return parts[0], parts[1] if len(parts) > 1 else ""
 
 
-def import_lang_module() -> Optional[importlib.ModuleType]:
-    """Import language dependent functions."""
-    lang_code, region = get_lang_code_region()
-    lang_folder = Path("translations") / lang_code
-    if str(lang_folder) not in sys.path:
-        sys.path.insert(1, str(lang_folder))
-    module_name = "transform"
-    if region:
-        module_name += f"_{region}"
-    return importlib.import_module(module_name)
+lang_transforms = None
+
+
+def get_lang_transforms() -> LangTransforms:
+    global lang_transforms
+    if lang_transforms is None:
+        lang_code, region = get_lang_code_region()
+        lang_transforms = LangTransforms.load(lang_code, region)
+    return lang_transforms
 
 
-def transform_lang(value: str) -> str:
-    # NOTE: Get the corresponding process function from stack frame. Therefore it's important to call this function from the correct 'get_se_xxx' function.
-    module = import_lang_module()
-    attr = inspect.stack()[1].function.replace("get_se_", "")
-    func_name = f"transform_{attr}"
-    func = getattr(module, func_name, None)
-    return func(value) if func else value
+def get_transform(field: str) -> Transform | None:
+    # NOTE: Language hooks are resolved once per field and cached, so looking them up for every
+    # value is cheap.
+    return get_lang_transforms().get(field)
+
+
+def transform_lang(value: str, transform: Transform | None) -> str:
+    return transform(value) if transform else value
 
 
 # NOTE: ADB data may contain explicit null fields, that should be treated the same as missing.
@@ -623,7 +759,7 @@ def get_se_unique(card) -> str:
 
 
 def get_se_name(name):
-    return transform_lang(name)
+    return transform_lang(name, get_transform("name"))
 
 
 def get_se_front_name(card):
@@ -653,49 +789,11 @@ def get_se_traits(card):
     traits = card.get("traits", "")
     traits = [f"{trait.strip()}." for trait in traits.split(".") if trait.strip()]
     traits = " ".join(traits)
-    return transform_lang(traits)
+    return transform_lang(traits, get_transform("traits"))
 
 
 def get_se_markup(rule):
-    markup = [
-        (r"\[action\]", "<act>"),
-        (r"\[action\]", "<act>"),
-        (r"\[reaction\]", "<rea>"),
-        (r"\[free\]", "<fre>"),
-        (r"\[fast\]", "<fre>"),
-        (r"\[willpower\]", "<wil>"),
-        (r"\[intellect\]", "<int>"),
-        (r"\[combat\]", "<com>"),
-        (r"\[agility\]", "<agi>"),
-        (r"\[wild\]", "<wild>"),
-        (r"\[wild\]", "<wild>"),
-        (r"\[guardian\]", "<gua>"),
-        (r"\[seeker\]", "<see>"),
-        (r"\[rogue\]", "<rog>"),
-        (r"\[mystic\]", "<mys>"),
-        (r"\[survivor\]", "<sur>"),
-        (r"\[skull\]", "<sku>"),
-        (r"\[cultist\]", "<cul>"),
-        (r"\[tablet\]", "<tab>"),
-        (r"\[tablet\]", "<tab>"),
-        (r"\[elder_thing\]", "<mon>"),
-        (r"\[elder_sign\]", "<eld>"),
-        (r"\[auto_fail\]", "<ten>"),
-        (r"\[bless\]", "<ble>"),
-        (r"\[curse\]", "<cur>"),
-        (r"\[per_investigator\]", "<per>"),
-        (r"\[frost\]", "<fro>"),
-        (r"\[frost\]", "<fro>"),
-        (r"\[seal_a\]", "<seal1>"),
-        (r"\[seal_b\]", "<seal2>"),
-        (r"\[seal_c\]", "<seal3>"),
-        (r"\[seal_d\]", "<seal4>"),
-        (r"\[seal_e\]", "<seal5>"),
-    ]
-    for a, b in markup:
-        rule = re.sub(a, b, rule, flags=re.I)
-    # NOTE: Format traits. We avoid the buggy behavior of </size> in SE instead we set font size by relative percentage, 0.9 * 0.33 * 3.37 = 1.00089.
-    return re.sub(r"\[\[([^\]]*)\]\]", r"<size 90%><t>\1</t><size 33%> <size 337%>", rule)
+    return translate_markup(rule)
 
 
 def get_se_rule(rule):
@@ -713,7 +811,7 @@ def get_se_rule(rule):
     # NOTE: We intentionally add a space at the end to hack around a problem with SE scenario card layout. If we don't add this space,
     # the text on scenario cards doesn't automatically break lines.
     rule = f"{rule} " if rule.strip() else ""
-    return transform_lang(rule)
+    return transform_lang(rule, get_transform("rule"))
 
 
 def get_se_front_rule(card):
@@ -772,7 +870,8 @@ def get_se_back_chaos_merge(card, index):
 
 
 def get_se_tracker(card):
-    return transform_lang(TRACKER_LABELS.get(card["code"], ""))
+    tracker = TRACKER_LABELS.get(card["code"], "")
+    return transform_lang(tracker, get_transform("tracker"))
 
 
 def is_return_to_scenario(card):
@@ -808,7 +907,7 @@ def get_se_deck_line(card, index):
 def get_se_header(header):
     # NOTE: Some header text at the back of agenda/act may have markup text in it.
     header = get_se_markup(header)
-    return transform_lang(header)
+    return transform_lang(header, get_transform("header"))
 
 
 def get_se_deck_header(card, index):
@@ -825,7 +924,7 @@ def get_se_deck_rule(card, index):
 def get_se_flavor(flavor):
     # NOTE: Some flavor text may contain markup.
     flavor = get_se_markup(flavor)
-    return transform_lang(flavor)
+    return transform_lang(flavor, get_transform("flavor"))
 
 
 def get_se_front_flavor(card):
@@ -847,130 +946,41 @@ def get_se_back_header(card):
 
 
 def get_se_paragraph_line(card, text, flavor, index):
-    # NOTE: Header is determined by 'b' tag ending with colon or followed by a newline (except for resolution text).
-    def is_header(elem) -> bool:
-        if elem.name == "b":
-            elem_text = elem.get_text().strip()
-            if elem_text and elem_text[-1] in (":", "："):
-                return True
-            if elem_text.startswith("(→"):
-                return False
-            next_elem = elem.next_sibling
-            if next_elem and next_elem.get_text().startswith("\n"):
-                return True
-        return False
-
-    # NOTE: Flavor is determined by 'blockquote' or 'i' tag.
-    def extract_flavor_text(elem):
-        if elem.name in ["blockquote", "i"]:
-            return "".join(elem.stripped_strings)
-        return ""
+    paragraphs = parse_paragraphs(text, flavor)
+    return paragraphs[index] if index < len(paragraphs) else ("", "", "")
 
-    # NOTE: If there's explicit flavor text, add it before the main text to handle them together. Merge it with existing flavor text if possible.
-    if flavor:
-        soup = BeautifulSoup(text, HTML_PARSER)
-        if len(soup.contents):
-            flavor_elem = soup.contents[0]
-            extracted_flavor = extract_flavor_text(flavor_elem)
-            if extracted_flavor:
-                flavor_elem.insert(0, f"{flavor}\n")
-            else:
-                flavor_elem.insert_before(f"<blockquote><i>{flavor}</i></blockquote>\n")
-            text = str(soup)
-        else:
-            text = f"<blockquote><i>{flavor}</i></blockquote>"
-
-    # NOTE: Normalize <hr> tag.
-    text = text.replace("<hr/>", "<hr>")
-
-    # NOTE: Swap <hr> and <b> tag in case ADB has <hr> at the beginning of the header text.
-    text = re.sub(r"<b>\s*<hr>", "<hr><b>", text)
-
-    # NOTE: Use <hr> to explicitly determine paragraphs.
-    paragraphs = [paragraph.strip() for paragraph in text.split("<hr>")]
-
-    # NOTE: Split paragraphs further before each header.
-    new_paragraphs = []
-    for paragraph in paragraphs:
-        soup = BeautifulSoup(paragraph, "html.parser")
-
-        splits = [0]
-        for i, elem in enumerate(soup.contents):
-            if is_header(elem):
-                splits.append(i)
-        splits.append(None)
-
-        for i in range(len(splits) - 1):
-            new_paragraph = "".join(
-                str(elem) for elem in soup.contents[splits[i] : splits[i + 1]]
-            ).strip()
-            if new_paragraph:
-                new_paragraphs.append(new_paragraph)
-    paragraphs = new_paragraphs
-
-    # NOTE: Extract out the header and flavor text from each paragraph.
-    parsed_paragraphs = []
-    for paragraph in paragraphs:
-        soup = BeautifulSoup(paragraph, "html.parser")
-
-        # NOTE: Remove leading whitespace before checking for header or flavor.
-        def strip_leading(node) -> None:
-            for child in node.contents:
-                if not str(child).strip():
-                    child.extract()
-                else:
-                    break
-
-        strip_leading(soup)
-
-        # NOTE: Extract out the header text from the beginning.
-        header = ""
-        header_elem = soup.contents[0]
-        if is_header(header_elem):
-            header = str(header_elem).replace("<b>", "").replace("</b>", "").strip()
-            header_elem.extract()
-
-        strip_leading(soup)
-
-        # NOTE: Extract out the flavor text from the beginning.
-        flavor = ""
-        flavor_elem = soup.contents[0]
-        if is_flavor(flavor_elem):
-            flavor = (
-                str(flavor_elem)
-                .replace("<blockquote>", "")
-                .replace("</blockquote>", "")
-                .replace("<i>", "")
-                .replace("</i>", "")
-                .strip()
-            )
-            flavor_elem.extract()
 
-        rule = str(soup).strip()
-        parsed_paragraphs.append((header, flavor, rule))
+def get_se_paragraphs(card, sheet):
+    text = card.get("text", "") if sheet == 0 else card.get("back_text", "")
+    flavor = card.get("flavor", "") if sheet == 0 else card.get("back_flavor", "")
+    # NOTE: Paragraphs are parsed once per card side and shared by every header, flavor and rule
+    # index. The cache is owned by the card store so that it's dropped whenever the cards change.
+    code = card.get("code")
+    if card_store is None or code is None:
+        return parse_paragraphs(text, flavor)
+    paragraph_cache = card_store.get_cache("paragraphs")
+    if (code, sheet) not in paragraph_cache:
+        paragraph_cache[(code, sheet)] = parse_paragraphs(text, flavor)
+    return paragraph_cache[(code, sheet)]
 
-    if index < len(parsed_paragraphs):
-        return parsed_paragraphs[index]
-    return "", "", ""
 
+def get_paragraph_line(card, sheet, index):
+    paragraphs = get_se_paragraphs(card, sheet)
+    return paragraphs[index] if index < len(paragraphs) else ("", "", "")
 
-def get_paragraph_line(card, index):
-    text = card.get("text", "") if index == 0 else card.get("back_text", "")
-    flavor = card.get("flavor", "") if index == 0 else card.get("back_flavor", "")
-    return get_se_paragraph_line(card, text, flavor, index)
 
+def get_location_icon(metadata, field):
+    icon = metadata.get(field, {}).get("icons", "")
+    return get_se_location_icon(icon)
 
-def get_location_icon(icon):
-    return LOCATION_ICON_MAP.get(icon, "None")
 
-
-def get_chaos(card, index):
-    rule = card.get("text", "") if index == 0 else card.get("back_text", "")
+def get_chaos(card, field, index):
+    rule = card.get(field, "")
     return get_se_chaos(rule, index)
 
 
 def get_se_front_paragraph_line(card, index):
-    return get_paragraph_line(card, "text", "flavor", index)
+    return get_paragraph_line(card, 0, index)
 
 
 def get_se_front_paragraph_header(card, index):
@@ -989,7 +999,7 @@ def get_se_front_paragraph_rule(card, index):
 
 
 def get_se_back_paragraph_line(card, index):
-    return get_paragraph_line(card, "back_text", "back_flavor", index)
+    return get_paragraph_line(card, 1, index)
 
 
 def get_se_back_paragraph_header(card, index):
@@ -1010,25 +1020,25 @@ def get_se_back_paragraph_rule(card, index):
 def get_se_vengeance(card):
     vengeance = card.get("vengeance")
     vengeance = f"Vengeance {vengeance}." if isinstance(vengeance, int) else ""
-    return transform_lang(vengeance)
+    return transform_lang(vengeance, get_transform("vengeance"))
 
 
 def get_se_victory(card):
     victory = card.get("victory")
     victory = f"Victory {victory}." if isinstance(victory, int) else ""
-    return transform_lang(victory)
+    return transform_lang(victory, get_transform("victory"))
 
 
 def get_se_shelter(card):
     shelter = card.get("shelter")
     shelter = f"Shelter {shelter}." if isinstance(shelter, int) else ""
-    return transform_lang(shelter)
+    return transform_lang(shelter, get_transform("shelter"))
 
 
 def get_se_blob(card):
     blob = card.get("blob")
     blob = f"Blob {blob}." if isinstance(blob, int) else ""
-    return transform_lang(blob)
+    return transform_lang(blob, get_transform("blob"))
 
 
 def get_se_point(card):
@@ -1049,12 +1059,12 @@ def get_se_location_icon(icon):
     return LOCATION_ICON_MAP.get(icon, "None")
 
 
-def get_se_front_location(metadata, index):
-    return get_location_icon(metadata, "locationFront", index)
+def get_se_front_location(metadata):
+    return get_location_icon(metadata, "locationFront")
 
 
-def get_se_back_location(metadata, index):
-    return get_location_icon(metadata, "locationBack", index)
+def get_se_back_location(metadata):
+    return get_location_icon(metadata, "locationBack")
 
 
 def get_se_connection(icons, index):
@@ -1074,108 +1084,188 @@ def get_se_back_connection(metadata, index):
     return get_se_connection(icons, index)
 
 
-def apply_partials_with_args(functions, *args):
-    return {partial(func, *args): keys for func, keys in functions.items()}
+class SeContext(NamedTuple):
+    card: dict
+    metadata: dict
+    sheet: int
+    result_id: str
+    image_filename: str
+    image_scale: float
+    image_move_x: int
+    image_move_y: int
+    render_size: tuple[int, int]
 
 
-def get_static_assignments(image_move_x, image_move_y, image_scale):
-    return {
-        image_move_x: ("port0X", "port1X"),
-        image_move_y: ("port0Y", "port1Y"),
-        image_scale: ("port0Scale", "port1Scale"),
-        "0": ("$PortraitShare", "port0Rot", "$port1Rot"),
-    }
+SeGetter = Callable[[SeContext], Any]
 
 
-def get_dynamic_assignments(card, metadata, image_sheet):
-    dynamic_functions = {
-        partial(func, card, image_sheet): keys
-        for func, keys in {
-            (get_se_front_name, card): ("name",),
-            (get_se_subname, card): ("$Subtitle",),
-            (get_se_back_name, card): ("$TitleBack",),
-            (get_se_subtype, card): ("$Subtype",),
-            (get_se_unique, card): ("$Unique",),
-            (get_se_cost, card): ("$ResourceCost",),
-            (get_se_xp, card): ("$Level",),
-            (get_se_willpower, card): ("$Willpower",),
-            (get_se_intellect, card): ("$Intellect",),
-            (get_se_combat, card): ("$Combat",),
-            (get_se_agility, card): ("$Agility",),
-            (get_se_health, card): ("$Stamina", "$Sanity", "$Health"),
-            (get_se_enemy_damage, card): ("$Damage",),
-            (get_se_enemy_horror, card): ("$Horror",),
-            (get_se_enemy_fight, card): ("$Attack",),
-            (get_se_enemy_evade, card): ("$Evade",),
-            (get_se_traits, card): ("$Traits",),
-            (get_se_front_rule, card): ("$Rules",),
-            (get_se_front_flavor, card): ("$Flavor",),
-            (get_se_back_flavor, card): ("$FlavorBack", "$InvStoryBack"),
-            (get_se_illustrator, card, image_sheet): ("$Artist", "$ArtistBack"),
-            (get_se_copyright, card, image_sheet): ("$Copyright",),
-            (get_se_pack, card, image_sheet): ("$Collection",),
-            (get_se_pack_number, card, image_sheet): ("$CollectionNumber",),
-            (get_se_encounter, card, image_sheet): ("$Encounter",),
-            (get_se_encounter_number, card, image_sheet): ("$EncounterNumber",),
-            (get_se_encounter_total, card, image_sheet): ("$EncounterTotal",),
-            (get_se_encounter_front_visibility, card): ("$ShowEncounterIcon",),
-            (get_se_encounter_back_visibility, card): ("$ShowEncounterIconBack",),
-            (get_se_doom, card): ("$Doom",),
-            (get_se_doom_comment, card): ("$Asterisk",),
-            (get_se_clue, card): ("$Clues",),
-            (get_se_shroud, card): ("$Shroud",),
-            (get_se_per_investigator, card): ("$PerInvestigator",),
-            (get_se_progress_number, card): ("$ProgressNumber",),
-            (get_se_progress_letter, card): ("$ProgressLetter",),
-            (is_se_progress_reversed, card): ("$ProgressReversed",),
-            (get_se_progress_direction, card): ("$ProgressDirection",),
-            (get_se_tracker, card): ("$Tracker",),
-            (get_se_front_template, card): ("$Template",),
-            (get_se_back_template, card): ("$TemplateBack",),
-            (get_se_back_header, card): ("$HeaderBack",),
-            (get_se_point, card): ("$Victory",),
-            (get_se_front_location, metadata): ("$LocationFront",),
-            (get_se_back_location, metadata): ("$LocationBack",),
-        }.items()
-    }
-    return dynamic_functions
+def card_field(func, *func_args) -> SeGetter:
+    return lambda context: func(context.card, *func_args)
 
 
-def get_final_card(assignments):
-    final_card = {
-        key: value for value, keys in assignments[AssignmentType.STATIC].items() for key in keys
-    }
-    final_card.update(
-        {key: method() for method, key in assignments[AssignmentType.DYNAMIC].items()}
-    )
-    return final_card
+def sheet_field(func) -> SeGetter:
+    return lambda context: func(context.card, context.sheet)
 
 
-def set_property_assignments(final_card, property_var_by_key) -> None:
-    for property_key, property_count in SE_PROPERTY_COUNTS.items():
-        val = generate_property_count_tuple(property_count)
-        property_method, property_name_pattern, property_count = val
-        property_args = property_var_by_key[property_key]
-        for i in range(property_count):
-            m_arg, add_args = (
-                property_args if isinstance(property_args, tuple) else (property_args, ())
-            )
-            final_card[f"${property_name_pattern(i + 1)}"] = property_method(m_arg, *add_args)
+def metadata_field(func, *func_args) -> SeGetter:
+    return lambda context: func(context.metadata, *func_args)
 
 
-def get_se_card(result_id, card, image_filename, image_scale, image_move_x, image_move_y):
-    image_sheet = decode_result_id(result_id)[-1]
-    property_var_by_key = {prop: card for prop in SEProperties}
+def static_field(value) -> SeGetter:
+    return lambda _: value
+
+
+def indexed_fields(pattern, func, labels, field=card_field) -> dict[str, SeGetter]:
+    return {pattern.format(label): field(func, index) for index, label in enumerate(labels)}
+
+
+# NOTE: Columns interpreted by make.js itself, which are written for every template.
+SE_BUILTIN_FIELDS: dict[str, SeGetter] = {
+    "file": lambda context: context.result_id,
+    "name": card_field(get_se_front_name),
+    **{
+        column: getter
+        for port in range(2)
+        for column, getter in {
+            f"port{port}Src": lambda context: context.image_filename,
+            f"port{port}X": lambda context: context.image_move_x,
+            f"port{port}Y": lambda context: context.image_move_y,
+            f"port{port}Scale": lambda context: context.image_scale,
+            f"port{port}Rot": static_field("0"),
+        }.items()
+    },
+    # NOTE: The size the card image is packed at, which make.js renders the card to meet instead of
+    # a fixed resolution.
+    "renderWidth": lambda context: context.render_size[0],
+    "renderHeight": lambda context: context.render_size[1],
+}
+
+PARAGRAPH_LETTERS = "ABC"
+CHAOS_COLUMNS = ["Skull", "Cultist", "Tablet", "ElderThing"]
+
+# NOTE: Columns mapped to the template settings, which make.js sets on the component of every card.
+SE_FIELDS: dict[str, SeGetter] = {
+    "$Unique": card_field(get_se_unique),
+    "$Subtitle": card_field(get_se_subname),
+    "$TitleBack": card_field(get_se_back_name),
+    "$Subtype": card_field(get_se_subtype),
+    "$CardClass": lambda context: get_se_faction(context.card, 0, context.sheet),
+    "$CardClass2": lambda context: get_se_faction(context.card, 1, context.sheet),
+    "$CardClass3": lambda context: get_se_faction(context.card, 2, context.sheet),
+    "$ResourceCost": card_field(get_se_cost),
+    "$Level": card_field(get_se_xp),
+    **indexed_fields("$Skill{}", get_se_skill, range(1, 7)),
+    "$Slot": card_field(get_se_slot, 0),
+    "$Slot2": card_field(get_se_slot, 1),
+    "$Willpower": card_field(get_se_willpower),
+    "$Intellect": card_field(get_se_intellect),
+    "$Combat": card_field(get_se_combat),
+    "$Agility": card_field(get_se_agility),
+    "$Stamina": card_field(get_se_health),
+    "$Sanity": card_field(get_se_sanity),
+    "$Health": card_field(get_se_health),
+    "$Damage": card_field(get_se_enemy_damage),
+    "$Horror": card_field(get_se_enemy_horror),
+    "$Attack": card_field(get_se_enemy_fight),
+    "$Evade": card_field(get_se_enemy_evade),
+    "$Traits": card_field(get_se_traits),
+    "$Rules": card_field(get_se_front_rule),
+    "$Flavor": card_field(get_se_front_flavor),
+    "$RulesBack": card_field(get_se_back_rule),
+    "$FlavorBack": card_field(get_se_back_flavor),
+    "$InvStoryBack": card_field(get_se_back_flavor),
+    "$Artist": sheet_field(get_se_illustrator),
+    "$ArtistBack": sheet_field(get_se_illustrator),
+    "$Copyright": sheet_field(get_se_copyright),
+    "$Collection": sheet_field(get_se_pack),
+    "$CollectionNumber": sheet_field(get_se_pack_number),
+    "$Encounter": sheet_field(get_se_encounter),
+    "$EncounterNumber": sheet_field(get_se_encounter_number),
+    "$EncounterTotal": sheet_field(get_se_encounter_total),
+    "$ShowEncounterIcon": card_field(get_se_encounter_front_visibility),
+    "$ShowEncounterIconBack": card_field(get_se_encounter_back_visibility),
+    "$Doom": card_field(get_se_doom),
+    "$Asterisk": card_field(get_se_doom_comment),
+    "$Clues": card_field(get_se_clue),
+    "$Shroud": card_field(get_se_shroud),
+    "$PerInvestigator": card_field(get_se_per_investigator),
+    "$ScenarioIndex": card_field(get_se_progress_number),
+    "$ScenarioDeckID": card_field(get_se_progress_letter),
+    "$Orientation": card_field(get_se_progress_direction),
+    "$TrackerBox": card_field(get_se_tracker),
+    "$Template": card_field(get_se_front_template),
+    "$TemplateBack": card_field(get_se_back_template),
+    "$HeaderBack": card_field(get_se_back_header),
+    "$Victory": card_field(get_se_point),
+    "$PortraitShare": static_field("0"),
+    "$LocationIcon": metadata_field(get_se_front_location),
+    "$LocationIconBack": metadata_field(get_se_back_location),
+    **indexed_fields("$Connection{}Icon", get_se_front_connection, range(1, 7), metadata_field),
+    **indexed_fields("$Connection{}IconBack", get_se_back_connection, range(1, 7), metadata_field),
+    **indexed_fields("$Header{}", get_se_front_paragraph_header, PARAGRAPH_LETTERS),
+    **indexed_fields("$AccentedStory{}", get_se_front_paragraph_flavor, PARAGRAPH_LETTERS),
+    **indexed_fields("$Rules{}", get_se_front_paragraph_rule, PARAGRAPH_LETTERS),
+    **indexed_fields("$Header{}Back", get_se_back_paragraph_header, PARAGRAPH_LETTERS),
+    **indexed_fields("$AccentedStory{}Back", get_se_back_paragraph_flavor, PARAGRAPH_LETTERS),
+    **indexed_fields("$Rules{}Back", get_se_back_paragraph_rule, PARAGRAPH_LETTERS),
+    **indexed_fields("$Text{}NameBack", get_se_deck_header, range(1, 9)),
+    **indexed_fields("$Text{}Back", get_se_deck_rule, range(1, 9)),
+    **indexed_fields("${}", get_se_front_chaos_rule, CHAOS_COLUMNS),
+    **indexed_fields("${}Back", get_se_back_chaos_rule, CHAOS_COLUMNS),
+    **indexed_fields("$Merge{}", get_se_front_chaos_merge, CHAOS_COLUMNS[:3]),
+    **indexed_fields("$Merge{}Back", get_se_back_chaos_merge, CHAOS_COLUMNS[:3]),
+}
+
+template_schema = None
 
-    assignments = {
-        AssignmentType.STATIC: get_static_assignments(image_move_x, image_move_y, image_scale),
-        AssignmentType.DYNAMIC: get_dynamic_assignments(card, metadata, image_sheet),
-    }
 
-    final_card = get_final_card(assignments)
-    set_property_assignments(final_card, property_var_by_key)
+def get_template_schema() -> TemplateSchema:
+    global template_schema
+    if template_schema is None:
+        template_schema = TemplateSchema(Path(args.cache_dir) / "se_schema.json")
+    return template_schema
 
-    return final_card
+
+se_plans: dict[str, tuple[list[str], list[SeGetter]]] = {}
+
+
+def get_se_plan(se_type) -> tuple[list[str], list[SeGetter]]:
+    # NOTE: Only the '$' columns the template reads are evaluated and written, e.g. location cards
+    # skip the enemy stats. The plan is compiled once per template and shared by all of its cards.
+    if se_type not in se_plans:
+        template_keys = set(get_template_schema().get_read_keys(se_type))
+        fields = {
+            **SE_BUILTIN_FIELDS,
+            **{key: getter for key, getter in SE_FIELDS.items() if key[1:] in template_keys},
+        }
+        se_plans[se_type] = (list(fields.keys()), list(fields.values()))
+    return se_plans[se_type]
+
+
+def get_se_card(
+    se_type,
+    result_id,
+    card,
+    metadata,
+    image_filename,
+    image_scale,
+    image_move_x,
+    image_move_y,
+    render_size,
+) -> tuple:
+    context = SeContext(
+        card,
+        metadata,
+        decode_result_id(result_id)[-1],
+        result_id,
+        image_filename,
+        image_scale,
+        image_move_x,
+        image_move_y,
+        render_size,
+    )
+    _, getters = get_se_plan(se_type)
+    return tuple(getter(context) for getter in getters)
 
 
 def download_repo(repo_folder: Path, repo: str) -> Path:
@@ -1199,219 +1289,198 @@ def download_repo(repo_folder: Path, repo: str) -> Path:
     return repo_folder
 
 
-ahdb = {}
+card_store = None
 
 
-def update_encounter_code(translation) -> None:
-    for card in translation.values():
-        if "linked_card" in card:
-            linked_card = card["linked_card"]
-            card_encounter = card.get("encounter_code")
-            linked_encounter = linked_card.get("encounter_code")
+def load_ahdb_file(data_filename):
+    cards = []
+    with open(data_filename, encoding="utf-8") as file:
+        file_cards = json.loads(file.read())
+        if not hasattr(file_cards, "__iter__"):
+            print(f"Error: {data_filename} contains non-iterable.")
+            return cards
+        for file_card in file_cards:
+            if not hasattr(file_card, "keys"):
+                print(f"Error: {data_filename} contains non-object.")
+                continue
+            if "code" in file_card:
+                cards.append(file_card)
+            else:
+                print(f"Warning: {data_filename} contains {file_card=} without 'code' property.")
+    return cards
 
-            if card_encounter and not linked_encounter:
-                linked_card["encounter_code"] = card_encounter
-            elif not card_encounter and linked_encounter:
-                card["encounter_code"] = linked_encounter
 
+def scan_ahdb_pack_files(lang_code) -> dict[str, PackFile]:
+    repo_folder = download_repo(args.ahdb_dir, "Kamalisk/arkhamdb-json-data")
+    pack_files = {}
+    for kind, folder in [
+        ("en", f"{repo_folder}/pack"),
+        ("tr", f"{repo_folder}/translations/{lang_code}/pack"),
+    ]:
+        for data_filename in glob.glob(f"{folder}/**/*.json"):
+            stat = Path(data_filename).stat()
+            pack_files[data_filename] = PackFile(kind, stat.st_mtime, stat.st_size, "")
+    return pack_files
 
-def download_card(ahdb_id):
-    def copy_card_properties(old_card, card, properties):
-        temp_card = copy.deepcopy(card)
-        temp_card["code"] = f'{old_card["code"]}-pb'
-        for prop in properties:
-            temp_card[prop] = old_card.get(prop, 0)
-        return temp_card
-
-    ahdb_folder = Path(args.cache_dir) / "ahdb"
-    Path(ahdb_folder).mkdir(parents=True, exist_ok=True)
-    lang_code, _ = get_lang_code_region()
-    filename = f"{ahdb_folder}/{lang_code}.json"
 
-    if not Path(filename).is_file():
-        print("Downloading ArkhamDB data...")
-        try:
+def patch_ahdb_cards(ahdb, taboo_filename) -> None:
+    # NOTE: Add taboo cards with -t suffix.
+    with open(taboo_filename, encoding="utf-8") as file:
+        for card in json.loads(file.read()):
+            ahdb[card["code"]] = card
 
-            def load_folder(folder):
-                all_cards = {}
-                for data_filename in glob.glob(f"{folder}/**/*.json"):
-                    with open(data_filename, encoding="utf-8") as file:
-                        folder_cards = json.loads(file.read())
-                        if not hasattr(folder_cards, "__iter__"):
-                            print(f"Error: {data_filename} contains non-iterable.")
-                            continue
-                        for folder_card in folder_cards:
-                            if not hasattr(folder_card, "keys"):
-                                print(f"Error: {data_filename} contains non-object.")
-                                continue
-                            if "code" in folder_card:
-                                all_cards[folder_card["code"]] = folder_card
-                            else:
-                                print(
-                                    f"Warning: {data_filename} contains {folder_card=} without 'code' property."
-                                )
-                return all_cards
-
-            repo_folder = download_repo(args.ahdb_dir, "Kamalisk/arkhamdb-json-data")
-            english = load_folder(f"{repo_folder}/pack")
-            translation = load_folder(f"{repo_folder}/translations/{lang_code}/pack")
-
-            # NOTE: Patch translation data while maintain the original properties as 'real_*' to match the API result.
-            for ecid, english_card in english.items():
-                if ecid in translation:
-                    translation_card = translation[ecid]
-                    for key, value in translation_card.items():
-                        if key in english_card and key != "code":
-                            english_card[f"real_{key}"] = english_card[key]
-                        english_card[key] = value
-            translation = english
-
-            # NOTE: Patch 'back_link' property to match the API result.
-            for cid, card in translation.items():
-                if card.get("back_link"):
-                    card["linked_card"] = copy.deepcopy(translation[card["back_link"]])
-
-            # NOTE: Patch 'duplicate_of' property to match the API result.
-            for cid, card in translation.items():
-                if card.get("duplicate_of"):
-                    new_card = copy.deepcopy(translation[card["duplicate_of"]])
-                    for key, value in card.items():
-                        new_card[key] = value
-                    translation[cid] = new_card
-
-            # NOTE: Patch linked cards missing encounter set.
-            update_encounter_code(translation)
-
-            with open(filename, "w", encoding="utf-8") as file:
-                json_str = json.dumps(list(translation.values()), indent=2, ensure_ascii=False)
-                file.write(json_str)
-        except Exception as e:
-            print(f"Failed to download ArkhamDB data: {e}", file=sys.stderr)
-            sys.exit(1)
+    # NOTE: Add parallel cards with all front back combinations.
+    for cid in PARALLEL_CARD_CODES:
+        card = ahdb[cid]
+        old_id = card["alternate_of"]
+        old_card = ahdb[old_id]
 
-    if not len(ahdb):
-        print("Processing ArkhamDB data...")
-        try:
-            cards = []
-            with open(filename, encoding="utf-8") as file:
-                cards.extend(json.loads(file.read()))
-            # NOTE: Add taboo cards with -t suffix.
-            with open(f"translations/{lang_code}/taboo.json", encoding="utf-8") as file:
-                cards.extend(json.loads(file.read()))
-            for card in cards:
-                ahdb[card["code"]] = card
-            # NOTE: Add parallel cards with all front back combinations.
-            for cid in ["90001", "90008", "90017", "90024", "90037"]:
-                card = ahdb[cid]
-                old_id = card["alternate_of"]
-                old_card = ahdb[old_id]
-
-                pid = f"{old_id}-p"
-                pp_card = copy.deepcopy(card)
-                pp_card["code"] = pid
-                ahdb[pid] = pp_card
-
-                pfid = f"{old_id}-pf"
-                pf_card = copy.deepcopy(card)
-                pf_card["code"] = pfid
-                pf_card["back_text"] = old_card.get("back_text", "")
-                pf_card["back_flavor"] = old_card.get("back_flavor", "")
-                ahdb[pfid] = pf_card
-
-                properties = [
-                    "pack_code",
-                    "illustrator",
-                    "position",
-                    "text",
-                    "flavor",
-                    "health",
-                    "sanity",
-                    "skill_willpower",
-                    "skill_intellect",
-                    "skill_combat",
-                    "skill_agility",
-                ]
-                pb_card = copy_card_properties(old_card, card, properties)
-                ahdb[pb_card["code"]] = pb_card
-
-            # NOTE: Patching special point attributes as separate fields.
-            points = {
-                "shelter": [SHELTER_POINT_CARDS],
-                "blob": ["85039", "85040", "85041", "85042"],
-            }
-            for point_key, ids in points.items():
-                for cid in ids:
-                    card = ahdb[cid]
-                    re_point = r"\s*<b>.*?(\d+)(</b>[.。]|[.。]</b>)\s*$"
-                    match = re.search(re_point, card["text"])
-                    point = int(match.group(1))
-                    card[point_key] = point
-                    card["text"] = re.sub(re_point, "", card["text"])
-        except Exception as e:
-            print(f"Failed to process ArkhamDB data: {e}", file=sys.stderr)
-            sys.exit(1)
+        pid = f"{old_id}-p"
+        ahdb[pid] = card_view(card, code=pid)
+
+        pfid = f"{old_id}-pf"
+        ahdb[pfid] = card_view(
+            card,
+            code=pfid,
+            back_text=old_card.get("back_text", ""),
+            back_flavor=old_card.get("back_flavor", ""),
+        )
+
+        properties = [
+            "pack_code",
+            "illustrator",
+            "position",
+            "text",
+            "flavor",
+            "health",
+            "sanity",
+            "skill_willpower",
+            "skill_intellect",
+            "skill_combat",
+            "skill_agility",
+        ]
+        pbid = f"{old_id}-pb"
+        ahdb[pbid] = card_view(
+            card, code=pbid, **{prop: old_card.get(prop, 0) for prop in properties}
+        )
+
+    # NOTE: Patching special point attributes as separate fields.
+    points = {
+        "shelter": SHELTER_POINT_CARDS,
+        "blob": BLOB_POINT_CARDS,
+    }
+    for point_key, ids in points.items():
+        for cid in ids:
+            card = ahdb[cid]
+            re_point = r"\s*<b>.*?(\d+)(</b>[.。]|[.。]</b>)\s*$"
+            match = re.search(re_point, card["text"])
+            point = int(match.group(1))
+            # NOTE: Replace the card instead of modifying it, since other cards may be views on it.
+            ahdb[cid] = {**card, point_key: point, "text": re.sub(re_point, "", card["text"])}
+
+
+def get_card_store() -> CardStore:
+    global card_store
+    if card_store is not None:
+        return card_store
+
+    lang_code, _ = get_lang_code_region()
+    store = CardStore(Path(args.cache_dir) / AHDB_FOLDER_NAME / f"{lang_code}.sqlite3")
+    taboo_filename = Path(TRANSLATIONS_DIR_NAME) / lang_code / "taboo.json"
+    taboo_hash = get_file_hash(taboo_filename)
+    is_valid = store.is_valid()
 
     try:
-        return ahdb[ahdb_id]
-    except KeyError:
-        print(f"Error: Card with ID {ahdb_id} not found in ArkhamDB data", file=sys.stderr)
-        return None
+        pack_files = scan_ahdb_pack_files(lang_code)
+    except Exception as e:
+        print(f"Failed to download ArkhamDB data: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    packs, removed_packs, changed_codes = scan_pack_changes(
+        store, pack_files, load_ahdb_file, is_valid=is_valid
+    )
 
+    taboo_changed = store.get_meta("taboo") != taboo_hash if is_valid else True
+    if not changed_codes and not taboo_changed:
+        if packs or removed_packs:
+            store.update([], packs=packs, removed_packs=removed_packs)
+        card_store = store
+        return card_store
+
+    # NOTE: Changed cards need the cards they link to and the cards linking to them merged together,
+    # as well as the cards used for patching.
+    codes, raw_cards = collect_raw_cards(
+        store,
+        changed_codes | {*PARALLEL_CARD_CODES, *SHELTER_POINT_CARDS, *BLOB_POINT_CARDS},
+        packs,
+        removed_packs,
+        is_valid=is_valid,
+    )
+
+    print(f"Merging {len(codes)} ArkhamDB cards...")
+    try:
+        english = {card["code"]: card for _, kind, card in raw_cards if kind == "en"}
+        translation = {card["code"]: card for _, kind, card in raw_cards if kind == "tr"}
+        ahdb = merge_ahdb_cards(english, translation)
+    except Exception as e:
+        print(f"Failed to merge ArkhamDB data: {e}", file=sys.stderr)
+        sys.exit(1)
 
-url_map = None
+    print("Processing ArkhamDB data...")
+    try:
+        removed_codes = codes - set(ahdb)
+        if taboo_changed and is_valid:
+            removed_codes.update(code for code in store if code.endswith("-t"))
+        patch_ahdb_cards(ahdb, taboo_filename)
+        if is_valid:
+            store.update(
+                ahdb.values(),
+                removed_codes=removed_codes,
+                packs=packs,
+                removed_packs=removed_packs,
+                taboo=taboo_hash,
+            )
+        else:
+            store.build(ahdb.values(), packs=packs, taboo=taboo_hash)
+    except Exception as e:
+        print(f"Failed to process ArkhamDB data: {e}", file=sys.stderr)
+        sys.exit(1)
 
+    card_store = store
+    return card_store
 
-def read_url_map():
-    global url_map
-    if not (url_file_path := args.url_file):
-        print("Error: URL file not specified.")
-        return {}, {}
-    if not (url_file := Path(url_file_path)).is_file():
-        with url_file.open("w", encoding="utf-8") as fh:
-            json_str = json.dumps({}, indent=2, ensure_ascii=False)
-            fh.write(json_str)
-    if url_map is None:
-        with Path.open(encoding="utf-8") as fh:
-            url_map = json.loads(fh.read())
 
-    if not (url_map and hasattr(url_map, "keys")):
-        print("Error: URL file is empty or not an object.")
-        return {}, {}
+def download_card(ahdb_id):
+    card = get_card_store().get(ahdb_id)
+    if card is None:
+        print(f"Error: Card with ID {ahdb_id} not found in ArkhamDB data", file=sys.stderr)
+    return card
 
-    url_id_map = {
-        url: url_id for lang, url_set in url_map.items() for url_id, url in url_set.items()
-    }
 
-    return url_map, url_id_map
+url_registry = None
 
 
-def write_url_map() -> None:
-    Path(args.cache_dir).mkdir(parents=True, exist_ok=True)
-    if url_map is not None:
-        with open(args.url_file, "w", encoding="utf-8") as file:
-            json_str = json.dumps(url_map, indent=2, sort_keys=True)
-            file.write(json_str)
+def get_url_registry() -> UrlRegistry:
+    global url_registry
+    if url_registry is None:
+        url_registry = UrlRegistry(args.url_file)
+    return url_registry
 
 
 def get_en_url_id(url: str) -> str | None:
     if not url:
         print("Error: URL not specified.")
         return None
-    en_url_map, url_id_map = read_url_map()
-    if url in url_id_map:
-        return url_id_map[url]
-    url_uuid = str(uuid.uuid4()).replace("-", "")
-    en_url_map.setdefault("en", {})[url_uuid] = url
-    write_url_map()
-    return url_uuid
+    registry = get_url_registry()
+    url_id = registry.get_url_id(url)
+    if url_id is None:
+        url_id = str(uuid.uuid4()).replace("-", "")
+        registry.set_url("en", url_id, url)
+    return url_id
 
 
 def set_url_id(url_id, url) -> None:
-    url_map, _ = read_url_map()
-    if args.lang not in url_map:
-        url_map[args.lang] = {}
-    url_map[args.lang][url_id] = url
-    write_url_map()
+    get_url_registry().set_url(args.lang, url_id, url)
 
 
 def encode_result_id(url_id, deck_w, deck_h, deck_x, deck_y, rotate, sheet) -> str:
@@ -1431,36 +1500,134 @@ def decode_result_id(result_id):
     )
 
 
+deck_downloader = None
+
+
+def get_deck_downloader() -> DeckDownloader:
+    global deck_downloader
+    if deck_downloader is None:
+        deck_downloader = DeckDownloader(args.download_workers)
+    return deck_downloader
+
+
+def get_deck_image_filename(url_id) -> Path:
+    return Path(args.cache_dir) / "decks" / f"{url_id}.jpg"
+
+
 def download_deck_image(url) -> Path:
-    decks_folder = f"{args.cache_dir}/decks"
-    Path(decks_folder).mkdir(parents=True, exist_ok=True)
     url_id = get_en_url_id(url)
     if url_id is None:
         raise ValueError("URL not specified.")
-    filename = f"{decks_folder}/{url_id}.jpg"
-    if not os.path.isfile(filename):
+    filename = get_deck_image_filename(url_id)
+    if not filename.is_file():
         print(f"Downloading {url_id}.jpg...")
-        urllib.request.urlretrieve(url, filename)
+        get_deck_downloader().download(url, filename)
     return filename
 
 
-def crop_card_image(result_id, deck_image_filename):
-    cards_folder = Path(args.cache_dir) / CARDS_FOLDER_NAME
-    Path(cards_folder).mkdir(parents=True, exist_ok=True)
-    filename = f"{cards_folder}/{result_id}.png"
-    if not os.path.isfile(filename):
-        print(f"Cropping {result_id}.png...")
-        _, deck_w, deck_h, deck_x, deck_y, rotate, _ = decode_result_id(result_id)
-        deck_image = Image.open(deck_image_filename)
-        width = deck_image.width / deck_w
-        height = deck_image.height / deck_h
-        left = deck_x * width
-        top = deck_y * height
-        card_image = deck_image.crop((left, top, left + width, top + height))
-        if rotate:
-            card_image = card_image.transpose(method=Image.Transpose.ROTATE_90)
-        card_image.save(filename)
-    return filename
+def is_generic_back_url(url) -> bool:
+    # NOTE: Test whether it's generic player or encounter card back urls.
+    return "EcbhVuh" in url or "sRsWiSG" in url
+
+
+def get_sced_object_urls(sced_obj) -> list[str]:
+    if sced_obj["Name"] == "Custom_Token":
+        return [sced_obj["CustomImage"]["ImageURL"]]
+    urls = []
+    if sced_obj["Name"] in ["Card", "CardCustom"]:
+        for _, deck in get_decks(sced_obj):
+            urls.append(deck["FaceURL"])
+            if not is_generic_back_url(deck["BackURL"]):
+                urls.append(deck["BackURL"])
+    return urls
+
+
+def invalidate_deck_image(url_id) -> None:
+    # NOTE: Remove everything derived from an English deck image that changed upstream, so that it's
+    # cropped and packed again.
+    for filename in (Path(args.cache_dir) / CARDS_FOLDER_NAME).glob(f"{url_id}-*"):
+        print(f"Removing {filename}...")
+        filename.unlink()
+    for filename in Path(args.decks_dir).glob(f"*/{url_id}.jpg"):
+        print(f"Removing {filename}...")
+        filename.unlink()
+
+
+def prefetch_deck_images() -> None:
+    # NOTE: Collect the deck image URLs of every object to translate first, so that they can be
+    # downloaded concurrently instead of one by one when the first card of each deck is translated.
+    deck_urls = {}
+
+    def collect_deck_urls(sced_obj, metadata, card, _1, _2) -> None:
+        for url in get_sced_object_urls(sced_obj):
+            if url and url not in deck_urls:
+                deck_urls[url] = get_deck_image_filename(get_en_url_id(url))
+
+    process_player_cards(collect_deck_urls)
+    process_encounter_cards(collect_deck_urls)
+    downloader = get_deck_downloader()
+    # NOTE: Deck images without a matching sidecar may have been left truncated by an older
+    # downloader, so they're always revalidated.
+    cached = {
+        url: filename
+        for url, filename in deck_urls.items()
+        if filename.is_file() and (args.revalidate or not is_downloaded(filename))
+    }
+    if cached:
+        print(f"Revalidating {len(cached)} deck images...")
+        changed, errors = downloader.revalidate_all(cached)
+        for url, error in errors.items():
+            print(f"Error: Failed to revalidate {url}: {error}")
+        for url in changed:
+            print(f"Deck image {url} changed upstream.")
+            invalidate_deck_image(get_en_url_id(url))
+    downloads = {url: filename for url, filename in deck_urls.items() if not filename.is_file()}
+    print(f"Downloading {len(downloads)} deck images...")
+    errors = downloader.download_all(downloads)
+    for url, error in errors.items():
+        print(f"Error: Failed to download {url}: {error}")
+
+
+deck_sheet_cache = None
+
+
+def get_deck_sheet_cache() -> DeckSheetCache:
+    global deck_sheet_cache
+    if deck_sheet_cache is None:
+        deck_sheet_cache = DeckSheetCache()
+    return deck_sheet_cache
+
+
+def get_card_image_filename(result_id) -> Path:
+    extension = PORTRAIT_FORMATS[args.portrait_format].extension
+    return Path(args.cache_dir) / CARDS_FOLDER_NAME / f"{result_id}.{extension}"
+
+
+# NOTE: Result ids of the card images to crop, grouped by their deck image.
+card_crops: dict[Path, list[str]] = {}
+
+
+def crop_card_images() -> None:
+    # NOTE: Crop all card images of a deck in the same task, so that each deck image is only decoded
+    # once.
+    crops = {}
+    for deck_image_filename, result_ids in card_crops.items():
+        for result_id in result_ids:
+            filename = get_card_image_filename(result_id)
+            if filename.is_file():
+                continue
+            _, deck_w, deck_h, deck_x, deck_y, rotate, _ = decode_result_id(result_id)
+            crops.setdefault(deck_image_filename, []).append(
+                CardCrop(filename, deck_w, deck_h, deck_x, deck_y, rotate)
+            )
+    card_crops.clear()
+    if not crops:
+        return
+    (Path(args.cache_dir) / CARDS_FOLDER_NAME).mkdir(parents=True, exist_ok=True)
+    print(f"Cropping card images from {len(crops)} deck images...")
+    errors = crop_decks(crops, args.crop_workers, get_deck_sheet_cache(), args.portrait_format)
+    for deck_image_filename, error in errors.items():
+        print(f"Error: Failed to crop card images from {deck_image_filename}: {error}")
 
 
 se_types = [
@@ -1564,10 +1731,15 @@ def translate_sced_card(url, deck_w, deck_h, deck_x, deck_y, is_front, card, met
     except ValueError as e:
         print(f"Error: {e}")
         return
-    image_filename = crop_card_image(result_id, deck_image_filename)
-    image = Image.open(image_filename)
+    card_crops.setdefault(deck_image_filename, []).append(result_id)
+    image_filename = get_card_image_filename(result_id)
+    # NOTE: The card image is cropped later, so scale it from its slot in the deck image. A rotated
+    # card is as high as its slot is wide.
+    deck_image_size = get_deck_sheet_cache().get_size(deck_image_filename)
+    left, _, right, _ = get_slot_box(deck_image_size, deck_w, deck_h, deck_x, deck_y)
     template_width = 375
-    image_scale = template_width / (image.height if rotate else image.width)
+    image_scale = template_width / (right - left)
+    render_size = get_slot_size(deck_image_size, deck_w, deck_h, rotate=rotate)
     move_map = {
         "asset": (0, 93),
         "asset_encounter": (0, 93),
@@ -1603,6 +1775,7 @@ def translate_sced_card(url, deck_w, deck_h, deck_x, deck_y, is_front, card, met
     image_filename = os.path.abspath(image_filename)
     se_cards[se_type].append(
         get_se_card(
+            se_type,
             result_id,
             card,
             metadata,
@@ -1610,6 +1783,7 @@ def translate_sced_card(url, deck_w, deck_h, deck_x, deck_y, is_front, card, met
             image_scale,
             image_move_x,
             image_move_y,
+            render_size,
         )
     )
     result_set.add(result_id)
@@ -1618,9 +1792,9 @@ def translate_sced_card(url, deck_w, deck_h, deck_x, deck_y, is_front, card, met
 def translate_sced_card_object(card_obj, metadata, card) -> None:
     # Create a Card or EnemyCard object
     if card["type"] == "Enemy":
-        card_instance = EnemyCard(card)
+        card_instance = EnemyCard(card, get_lang_transforms())
     else:
-        card_instance = Card(card)
+        card_instance = Card(card, get_lang_transforms())
 
     deck_id, deck = get_decks(card_obj)[0]
     deck_w = deck["NumWidth"]
@@ -1656,8 +1830,9 @@ def translate_sced_card_object(card_obj, metadata, card) -> None:
             "53039": "04168",
         }
         if card["code"] in location_map:
-            front_card = copy.deepcopy(card)
-            front_card["pack_code"] = download_card(location_map[card["code"]])["pack_code"]
+            front_card = card_view(
+                card, pack_code=download_card(location_map[card["code"]])["pack_code"]
+            )
 
     front_url = deck["FaceURL"]
     translate_front = True
@@ -1679,8 +1854,7 @@ def translate_sced_card_object(card_obj, metadata, card) -> None:
 
     back_url = deck["BackURL"]
     translate_back = True
-    # NOTE: Test whether it's generic player or encounter card back urls.
-    if "EcbhVuh" in back_url or "sRsWiSG" in back_url:
+    if is_generic_back_url(back_url):
         translate_back = False
     # NOTE: Special cases to skip generic player or encounter card back in deck images.
     if (deck_id, deck_x, deck_y) in [
@@ -1881,13 +2055,32 @@ def write_csv() -> None:
         print(f"Writing {se_type}.csv...")
         filename = f"{data_dir}/{se_type}.csv"
         with open(filename, mode="w", newline="", encoding="utf-8") as file:
-            components = se_cards[se_type]
-            if len(components):
-                fields = list(components[0].keys())
-                writer = csv.DictWriter(file, fieldnames=fields)
-                writer.writeheader()
-                for component in components:
-                    writer.writerow(component)
+            rows = se_cards[se_type]
+            if len(rows):
+                columns, _ = get_se_plan(se_type)
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                writer.writerows(rows)
+    report_se_column_drift()
+    get_template_schema().save()
+
+
+def report_se_column_drift() -> None:
+    # NOTE: Refresh the keys of every template first, which records the keys added or removed by
+    # changed templates.
+    schema = get_template_schema()
+    for se_type in se_types:
+        schema.get_keys(se_type)
+    for se_type, (added, removed) in schema.changes.items():
+        unmapped = [key for key in added if f"${key}" not in SE_FIELDS]
+        print(
+            f"Warning: {se_type} template keys changed, added {added}, removed {removed}, "
+            f"not produced by any SE column {unmapped}."
+        )
+    read_keys = {key for se_type in se_types for key in schema.get_read_keys(se_type)}
+    unread_columns = [column for column in SE_FIELDS if column[1:] not in read_keys]
+    if unread_columns:
+        print(f"Warning: SE columns not read by any template {unread_columns}.")
 
 
 def generate_images() -> None:
@@ -1915,89 +2108,137 @@ def generate_images() -> None:
             else:
                 file.write(line)
 
-    se_script = "SE_Generator/make.js"
-    print(f"Running {se_script}...")
-    subprocess.run([args.se_executable, "--glang", args.lang, "--run", se_script])
+    # NOTE: Only render the cards whose data, template, portraits or rendering context changed since
+    # they were last rendered.
+    tables = read_tables(SE_PROJECT_DIR / "data")
+    se_script = SE_PROJECT_DIR / "make.js"
+    render_env = {SE_PPI_ENV: str(args.render_ppi)} if args.render_ppi else {}
+    context_hash = get_context_hash([lang_preferences, se_script], args.lang, str(args.render_ppi))
+    keys = get_render_keys(tables, SE_PROJECT_DIR / "template", context_hash)
+    cache = RenderCache(Path(args.cache_dir) / "renders")
+    pending = cache.get_pending(tables, keys)
+    pending_count = sum(len(rows) for _, rows in pending.values())
+    print(f"Reusing {len(keys) - pending_count} rendered images...")
+
+    if pending:
+        # NOTE: Split the cards into shards rendered by concurrent SE processes, each with its own
+        # data and images folders.
+        shard_dirs = write_shards(pending, SE_PROJECT_DIR / "shards", args.render_shards)
+        if args.render_server:
+            # NOTE: Running render servers skip the Strange Eons startup, but keep the language and
+            # preferences they started with, so they reject jobs for any other.
+            addresses = args.render_server.split(",")
+            print(f"Rendering {pending_count} cards in {len(shard_dirs)} shards on {addresses}...")
+            context = get_server_context(args.lang, lang_preferences, se_script)
+            results = run_servers(addresses, shard_dirs, args.render_ppi, context)
+        else:
+            print(f"Running {se_script} for {pending_count} cards in {len(shard_dirs)} shards...")
+            results = run_shards(
+                [args.se_executable, "--glang", args.lang, "--run", se_script.as_posix()],
+                shard_dirs,
+                env=render_env,
+            )
+        for shard_dir, (returncode, _) in results.items():
+            if returncode != 0:
+                print(f"Error: Shard {shard_dir.name} failed with exit code {returncode}.")
+        for filename in get_shard_images(results):
+            if filename.stem in keys:
+                cache.put(keys[filename.stem], filename)
+        elapsed = max(elapsed for _, elapsed in results.values())
+        print(f"Rendered {pending_count} cards in {elapsed:.1f}s.")
+
+    images_dir = SE_PROJECT_DIR / "images"
+    shutil.rmtree(images_dir, ignore_errors=True)
+    images_dir.mkdir(parents=True)
+    for result_id, key in keys.items():
+        if cache.get_filename(key).is_file():
+            cache.link(key, images_dir / f"{result_id}.png")
+        else:
+            print(f"Error: Failed to render {result_id}.")
 
 
 def pack_images() -> None:
-    deck_images = {}
-    url_map, _ = read_url_map()
-    for image_dir in Path("SE_Generator/data").glob("*"):
-        if not image_dir.is_dir():
-            print(f"Error: {image_dir} is not a directory.")
+    # NOTE: Group the generated card images by deck first, so that the deck images can be packed one
+    # at a time.
+    deck_slots = {}
+    for filename in sorted(Path("SE_Generator/images").glob("*.png")):
+        result_id = filename.stem
+        deck_url_id, deck_w, deck_h, deck_x, deck_y, rotate, _ = decode_result_id(result_id)
+        deck_slots.setdefault(deck_url_id, []).append(
+            DeckSlot(filename, deck_w, deck_h, deck_x, deck_y, rotate)
+        )
+
+    decks_dir = Path(args.decks_dir) / args.lang
+    decks_dir.mkdir(parents=True, exist_ok=True)
+    manifest = PackManifest(Path(args.cache_dir) / f"pack_{args.lang}.json")
+    # NOTE: Remove deck images that no longer have any translated card image.
+    for filename in decks_dir.glob("*.jpg"):
+        if filename.stem not in deck_slots:
+            print(f"Removing {filename}...")
+            filename.unlink()
+            manifest.remove(filename.stem)
+    url_registry = get_url_registry()
+    decks = {}
+    inputs_hashes = {}
+    for deck_url_id, slots in deck_slots.items():
+        # NOTE: We use the English version of the url as the base image to pack to avoid repeated
+        # saving that reduces quality.
+        deck_url = url_registry.get_url("en", deck_url_id)
+        try:
+            deck_image_filename = download_deck_image(deck_url)
+            if not deck_image_filename:
+                raise ValueError("Deck image not found.")
+        except ValueError as e:
+            print(f"Error: {e}")
             continue
-        for filename in image_dir.glob("*"):
-            print(f"Packing {filename=}...")
-            result_id = filename.stem
-            deck_url_id, deck_w, deck_h, deck_x, deck_y, rotate, _ = decode_result_id(result_id)
-            # NOTE: We use the English version of the url as the base image to pack to avoid repeated saving that reduces quality.
-            deck_url = url_map["en"][deck_url_id]
-            try:
-                deck_image_filename = download_deck_image(deck_url)
-                if not deck_image_filename:
-                    raise ValueError("Deck image not found.")
-            except ValueError as e:
-                print(f"Error: {e}")
-                continue
-            if deck_url_id not in deck_images:
-                deck_images[deck_url_id] = Image.open(deck_image_filename)
-            deck_image = deck_images[deck_url_id]
-            card_image_filename = f"{image_dir}/{filename}"
-            card_image = Image.open(card_image_filename)
-            if rotate:
-                card_image = card_image.transpose(method=Image.Transpose.ROTATE_270)
-            width = deck_image.width // deck_w
-            height = deck_image.height // deck_h
-            left = deck_x * width
-            top = deck_y * height
-            card_image = card_image.resize((width, height))
-            deck_image.paste(card_image, box=(left, top))
-
-    decks_dir = f"{args.decks_dir}/{args.lang}"
-    recreate_dir(decks_dir)
-    for deck_url_id, deck_image in deck_images.items():
-        print(f"Writing {deck_url_id}.jpg...")
-        deck_image = deck_image.convert("RGB")
-        deck_image.save(f"{decks_dir}/{deck_url_id}.jpg", progressive=True, optimize=True)
+        filename = decks_dir / f"{deck_url_id}.jpg"
+        inputs_hash = get_pack_inputs_hash(deck_image_filename, [slot.filename for slot in slots])
+        if manifest.is_current(deck_url_id, inputs_hash, filename):
+            continue
+        decks[deck_url_id] = (deck_image_filename, slots, filename)
+        inputs_hashes[deck_url_id] = inputs_hash
+
+    print(f"Packing {len(decks)} of {len(deck_slots)} deck images...")
+    errors = pack_decks(decks, args.pack_workers)
+    for deck_url_id, error in errors.items():
+        print(f"Error: Failed to pack {deck_url_id}.jpg: {error}")
+    for deck_url_id, (_, _, filename) in decks.items():
+        if deck_url_id not in errors:
+            manifest.set(deck_url_id, inputs_hashes[deck_url_id], filename)
+    manifest.save()
+
+
+def get_image_host() -> ImageHost:
+    if args.image_host == "local":
+        return LocalHost(Path(args.image_host_dir) / args.lang)
+    if args.image_host == "http":
+        return HttpHost(
+            Path(args.image_host_dir) / args.lang, f"{args.image_host_url.rstrip('/')}/{args.lang}"
+        )
+    return DropboxHost(
+        args.dropbox_token,
+        f"/SCED_Localization_Deck_Images_{args.lang}",
+        Path(args.cache_dir) / f"upload_{args.lang}.json",
+        args.upload_workers,
+    )
 
 
 def upload_images() -> None:
-    dbx = dropbox.Dropbox(args.dropbox_token)
-    folder = f"/SCED_Localization_Deck_Images_{args.lang}"
-    # NOTE: Create a folder if not already exists.
-    with suppress(Exception):
-        dbx.files_create_folder(folder)
-
-    decks_dir = Path(args.decks_dir) / str({args.lang})
-    for filename in os.listdir(decks_dir):
-        print(f"Uploading {filename}...")
-        with open(f"{decks_dir}/{filename}", "rb") as file:
-            deck_image_data = file.read()
-            deck_filename = f"{folder}/{filename}"
-            # NOTE: Setting overwrite to true so that the old deck image is replaced, and the sharing link still maintains.
-            image = dbx.files_upload(
-                deck_image_data, deck_filename, mode=dropbox.files.WriteMode.overwrite
-            )
-            # NOTE: Remove all existing shared links if we try to force creating new links.
-            if args.new_link:
-                for link in dbx.sharing_list_shared_links(
-                    image.path_display, direct_only=True
-                ).links:
-                    dbx.sharing_revoke_shared_link(link.url)
-            # NOTE: Dropbox will reuse the old sharing link if there's already one exist.
-            url = dbx.sharing_create_shared_link(image.path_display, short_url=True).url
-            # NOTE: Get direct download link from the dropbox sharing link.
-            url = url.replace("?dl=0", "").replace("www.dropbox.com", "dl.dropboxusercontent.com")
-            url_id = filename.split(".")[0]
-            set_url_id(url_id, url)
+    decks_dir = Path(args.decks_dir) / args.lang
+    urls, errors = get_image_host().upload_all(
+        sorted(decks_dir.glob("*.jpg")), new_link=args.new_link
+    )
+    for filename, url in urls.items():
+        set_url_id(filename.stem, url)
+    for filename, error in errors.items():
+        print(f"Error: Failed to upload {filename.name}: {error}")
 
 
 updated_files = {}
 
 
 def update_sced_card_object(card_obj, metadata, card, filename, root) -> None:
-    url_map, url_id_map = read_url_map()
+    url_registry = get_url_registry()
     updated_files[filename] = root
     if card:
         name = get_se_front_name(card)
@@ -2005,8 +2246,7 @@ def update_sced_card_object(card_obj, metadata, card, filename, root) -> None:
         if xp not in ["0", "None"]:
             name += f" ({xp})"
         if card["code"].endswith("-t"):
-            module = import_lang_module()
-            taboo_func = getattr(module, "transform_taboo", None)
+            taboo_func = get_transform("taboo")
             name += f' ({taboo_func() if taboo_func else "Taboo"})'
         # NOTE: The scenario card names are saved in the 'Description' field in SCED used for the scenario splash screen.
         if card_obj["Nickname"] == "Scenario":
@@ -2027,11 +2267,12 @@ def update_sced_card_object(card_obj, metadata, card, filename, root) -> None:
 
     for url_object, url_key in url_objects:
         # NOTE: Only update if we have seen this URL and assigned an id to it before.
-        if url_object[url_key] in url_id_map:
-            deck_url_id = url_id_map[url_object[url_key]]
+        deck_url_id = url_registry.get_url_id(url_object[url_key])
+        if deck_url_id is not None:
             # NOTE: Only update if we have uploaded the deck image and has a sharing URL for the language before.
-            if args.lang in url_map and deck_url_id in url_map[args.lang]:
-                url_object[url_key] = url_map[args.lang][deck_url_id]
+            translated_url = url_registry.get_url(args.lang, deck_url_id)
+            if translated_url is not None:
+                url_object[url_key] = translated_url
 
 
 def update_sced_files() -> None:
@@ -2044,25 +2285,32 @@ def update_sced_files() -> None:
             file.write(json_str)
 
 
-if args.step in [None, PROCESS_STEPS[0]]:
-    process_player_cards(translate_sced_object)
-    process_encounter_cards(translate_sced_object)
-    write_csv()
-
-if args.step in [None, PROCESS_STEPS[1]]:
-    generate_images()
-
-if args.step in [None, PROCESS_STEPS[2]]:
-    try:
-        pack_images()
-    except Exception as e:
-        print(f"Failed to pack images: {e}")
-        raise e
+# NOTE: Process pools started with spawn import this module again in every worker, which must not
+# run the steps.
+if __name__ == "__main__":
+    if args.step in [None, PROCESS_STEPS[0]]:
+        prefetch_deck_images()
+        process_player_cards(translate_sced_object)
+        process_encounter_cards(translate_sced_object)
+        crop_card_images()
+        write_csv()
+        get_url_registry().checkpoint()
+
+    if args.step in [None, PROCESS_STEPS[1]]:
+        generate_images()
+
+    if args.step in [None, PROCESS_STEPS[2]]:
+        try:
+            pack_images()
+        except Exception as e:
+            print(f"Failed to pack images: {e}")
+            raise e
 
-if args.step in [None, PROCESS_STEPS[3]]:
-    upload_images()
+    if args.step in [None, PROCESS_STEPS[3]]:
+        upload_images()
+        get_url_registry().checkpoint()
 
-if args.step in [None, PROCESS_STEPS[4]]:
-    process_player_cards(update_sced_card_object)
-    process_encounter_cards(update_sced_card_object, include_decks=True)
-    update_sced_files()
+    if args.step in [None, PROCESS_STEPS[4]]:
+        process_player_cards(update_sced_card_object)
+        process_encounter_cards(update_sced_card_object, include_decks=True)
+        update_sced_files()
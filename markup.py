@@ -0,0 +1,26 @@
+import re
+
+from constants import MARKUP_PATTERNS, TRAITS_PATTERN, TRAITS_REPLACEMENT
+
+# NOTE: Markup patterns are all bracketed icon names, so a single scan for bracketed words with a
+# lookup table replaces all of them in one pass. Unknown bracketed words are left as they are.
+MARKUP_TABLE = {
+    re.fullmatch(r"\\\[(\w+)\\\]", pattern).group(1).lower(): replacement
+    for pattern, replacement in MARKUP_PATTERNS
+}
+MARKUP_REGEX = re.compile(r"\[(\w+)\]")
+TRAITS_REGEX = re.compile(TRAITS_PATTERN)
+
+
+def replace_markup(match: re.Match) -> str:
+    return MARKUP_TABLE.get(match.group(1).lower(), match.group(0))
+
+
+def translate_markup(rule: str) -> str:
+    """Translate ADB markup into SE markup."""
+    if "[" not in rule:
+        return rule
+    rule = MARKUP_REGEX.sub(replace_markup, rule)
+    # NOTE: Format traits. We avoid the buggy behavior of </size> in SE instead we set font size by
+    # relative percentage, 0.9 * 0.33 * 3.37 = 1.00089.
+    return TRAITS_REGEX.sub(TRAITS_REPLACEMENT, rule)
@@ -0,0 +1,70 @@
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from constants import MARKUP_PATTERNS, TRAITS_PATTERN, TRAITS_REPLACEMENT
+from markup import translate_markup
+
+TEXT_FIELDS = ["text", "back_text", "flavor", "back_flavor", "traits"]
+
+
+def translate_markup_sequential(rule: str) -> str:
+    # NOTE: The previous implementation, running one uncompiled substitution per pattern.
+    for a, b in MARKUP_PATTERNS:
+        rule = re.sub(a, b, rule, flags=re.I)
+    return re.sub(TRAITS_PATTERN, TRAITS_REPLACEMENT, rule)
+
+
+def load_strings(ahdb_dir: Path) -> list[str]:
+    strings = []
+    for pattern in ["pack/**/*.json", "translations/**/*.json"]:
+        for filename in ahdb_dir.glob(pattern):
+            with filename.open(encoding="utf-8") as file:
+                cards = json.loads(file.read())
+            if not isinstance(cards, list):
+                continue
+            for card in cards:
+                if isinstance(card, dict):
+                    strings.extend(
+                        card[field] for field in TEXT_FIELDS if isinstance(card.get(field), str)
+                    )
+    return strings
+
+
+@click.command()
+@click.option(
+    "--ahdb-dir",
+    default="repos/arkhamdb-json-data",
+    help="The directory to the ArkhamDB json data repository",
+)
+@click.option("--repeat", default=5, help="The number of timing runs to take the best of")
+def main(ahdb_dir: str, repeat: int) -> None:
+    strings = load_strings(Path(ahdb_dir))
+    if not strings:
+        print(f"Error: No card text found in {ahdb_dir}.")
+        sys.exit(1)
+
+    mismatches = [s for s in strings if translate_markup(s) != translate_markup_sequential(s)]
+    print(f"Strings: {len(strings)}, mismatches: {len(mismatches)}")
+
+    for name, func in [
+        ("sequential", translate_markup_sequential),
+        ("single-pass", translate_markup),
+    ]:
+        seconds = min(
+            timeit.repeat(lambda func=func: [func(s) for s in strings], number=1, repeat=repeat)
+        )
+        print(f"{name}: {seconds * 1e6 / len(strings):.2f} us per string")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deck_sheets import PORTRAIT_FORMATS, crop_slot
+from se_render import read_tables
+
+
+def read_deck_grids(data_dir: Path) -> dict[str, tuple[int, int]]:
+    """Read the card columns and rows of every deck image from the SE data files."""
+    grids = {}
+    for header, rows in read_tables(data_dir).values():
+        file_index = header.index("file")
+        for row in rows:
+            # NOTE: A result id starts with the url id of its deck image, followed by the grid.
+            url_id, deck_w, deck_h, *_ = row[file_index].split("-")
+            grids[url_id] = (int(deck_w), int(deck_h))
+    return grids
+
+
+def crop_cards(deck_image_filename: Path, deck_w: int, deck_h: int) -> list[Image.Image]:
+    with Image.open(deck_image_filename) as sheet:
+        sheet.load()
+        return [
+            crop_slot(sheet, deck_w, deck_h, deck_x, deck_y, rotate=False)
+            for deck_y in range(deck_h)
+            for deck_x in range(deck_w)
+        ]
+
+
+@click.command()
+@click.option(
+    "--decks-dir", default="cache/decks", help="The directory of the cached English deck images"
+)
+@click.option(
+    "--data-dir",
+    default="SE_Generator/data",
+    help="The directory of the SE data files, which give the card grid of each deck",
+)
+@click.option("--limit", default=None, type=int, help="The maximum number of deck images to use")
+def main(decks_dir: str, data_dir: str, limit: int | None) -> None:
+    grids = read_deck_grids(Path(data_dir))
+    deck_image_filenames = [
+        filename for filename in sorted(Path(decks_dir).glob("*.jpg")) if filename.stem in grids
+    ][:limit]
+    if not deck_image_filenames:
+        print(f"Error: No deck images of the cards in {data_dir} found in {decks_dir}.")
+        sys.exit(1)
+
+    # NOTE: One deck is cropped at a time, and each portrait is compared as soon as it's decoded,
+    # so only the portraits of a single deck are kept in memory.
+    encode_seconds = dict.fromkeys(PORTRAIT_FORMATS, 0.0)
+    decode_seconds = dict.fromkeys(PORTRAIT_FORMATS, 0.0)
+    sizes = dict.fromkeys(PORTRAIT_FORMATS, 0)
+    card_count = 0
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for deck_image_filename in deck_image_filenames:
+            cards = crop_cards(deck_image_filename, *grids[deck_image_filename.stem])
+            card_count += len(cards)
+            for name, portrait_format in PORTRAIT_FORMATS.items():
+                filename = Path(temp_dir) / f"portrait.{portrait_format.extension}"
+                for card_image in cards:
+                    start = time.perf_counter()
+                    card_image.save(filename, **portrait_format.params)
+                    encode_seconds[name] += time.perf_counter() - start
+                    sizes[name] += filename.stat().st_size
+                    # NOTE: Decoding is timed with Pillow, as a proxy for Strange Eons reading the
+                    # portraits with Java ImageIO.
+                    start = time.perf_counter()
+                    with Image.open(filename) as image:
+                        image.load()
+                        decode_seconds[name] += time.perf_counter() - start
+                        mismatches += card_image.tobytes() != image.tobytes()
+    print(f"Decks: {len(deck_image_filenames)}, cards: {card_count}")
+
+    print(f"{'format':<10} {'encode ms':>10} {'decode ms':>10} {'total MB':>10}")
+    for name in PORTRAIT_FORMATS:
+        print(
+            f"{name:<10} {encode_seconds[name] * 1e3 / card_count:>10.2f} "
+            f"{decode_seconds[name] * 1e3 / card_count:>10.2f} {sizes[name] / 1e6:>10.1f}"
+        )
+
+    if mismatches:
+        print(f"Error: {mismatches} portraits did not round trip losslessly.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
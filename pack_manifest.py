@@ -0,0 +1,65 @@
+import hashlib
+import json
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from file_hash import get_file_hash
+
+# NOTE: Bump the version whenever the way deck images are packed changes, to pack all of them again.
+PACK_MANIFEST_VERSION = 1
+
+
+def get_pack_inputs_hash(deck_image_filename: Path, card_image_filenames: Iterable[Path]) -> str:
+    """Hash the content of the base deck image and of the card images packed into it."""
+    inputs = [get_file_hash(Path(deck_image_filename))]
+    for filename in sorted(card_image_filenames, key=lambda filename: filename.name):
+        inputs.append([filename.name, get_file_hash(filename)])
+    return hashlib.sha256(json.dumps(inputs).encode("utf-8")).hexdigest()
+
+
+class PackManifest:
+    """Input hashes of the packed deck images, so only decks whose inputs changed are packed again.
+
+    Unchanged deck images are kept byte for byte, which keeps their uploads and any downstream
+    caches stable.
+    """
+
+    def __init__(self, filename: str | Path) -> None:
+        self.filename = Path(filename)
+        self.decks: dict[str, dict[str, Any]] = {}
+        self.dirty = False
+        if self.filename.is_file():
+            with self.filename.open(encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == PACK_MANIFEST_VERSION:
+                self.decks = data["decks"]
+
+    def is_current(self, deck: str, inputs_hash: str, filename: Path) -> bool:
+        entry = self.decks.get(deck)
+        if entry is None or entry["inputs"] != inputs_hash:
+            return False
+        return filename.is_file() and filename.stat().st_size == entry["size"]
+
+    def set(self, deck: str, inputs_hash: str, filename: Path) -> None:
+        self.decks[deck] = {"inputs": inputs_hash, "size": filename.stat().st_size}
+        self.dirty = True
+
+    def remove(self, deck: str) -> None:
+        if self.decks.pop(deck, None) is not None:
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        temp_filename = self.filename.with_suffix(f"{self.filename.suffix}.tmp")
+        with temp_filename.open("w", encoding="utf-8") as file:
+            json.dump(
+                {"version": PACK_MANIFEST_VERSION, "decks": self.decks},
+                file,
+                indent=2,
+                sort_keys=True,
+            )
+        temp_filename.replace(self.filename)
+        self.dirty = False
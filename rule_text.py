@@ -0,0 +1,202 @@
+import html
+import re
+
+# NOTE: ADB rule text only uses a small HTML subset, e.g. <b>, <i>, <p>, <hr>, <blockquote> and
+# <cite>. This module tokenizes and serializes it the same way as BeautifulSoup with 'html.parser'
+# does, which the paragraph rules below were written against.
+TAG_REGEX = re.compile(r"<(/?)([a-zA-Z][^\t\n\r\f />\x00]*)([^>]*?)(/?)>")
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "area", "base", "col", "embed", "wbr"}
+PREFORMATTED_TAGS = {"pre", "textarea"}
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+class Text(str):
+    """A text node, which converts to its unescaped text like a BeautifulSoup string."""
+
+    __slots__ = ()
+
+    name = None
+
+    def get_text(self) -> str:
+        return str(self)
+
+    def strings(self) -> list[str]:
+        return [str(self)]
+
+
+class Tag:
+    """An element node, which converts to its escaped markup like a BeautifulSoup tag."""
+
+    __slots__ = ("attrs", "contents", "name")
+
+    def __init__(self, name: str, attrs: str = "") -> None:
+        self.name = name
+        self.attrs = attrs
+        self.contents: list[Tag | Text] = []
+
+    def get_text(self) -> str:
+        return "".join(self.strings())
+
+    def strings(self) -> list[str]:
+        return [string for child in self.contents for string in child.strings()]
+
+    def __str__(self) -> str:
+        if self.name in VOID_TAGS:
+            return f"<{self.name}{self.attrs}/>"
+        return f"<{self.name}{self.attrs}>{render(self.contents)}</{self.name}>"
+
+
+def escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render(nodes: list[Tag | Text]) -> str:
+    """Render nodes with text escaped, like converting a whole BeautifulSoup document."""
+    return "".join(escape(node) if isinstance(node, Text) else str(node) for node in nodes)
+
+
+def make_text(data: str, stack: list[Tag]) -> Text:
+    text = html.unescape(data)
+    # NOTE: Collapse whitespace-only text outside of preformatted tags.
+    if not text.strip(ASCII_SPACES) and not any(tag.name in PREFORMATTED_TAGS for tag in stack):
+        text = "\n" if "\n" in text else " "
+    return Text(text)
+
+
+def parse(markup: str) -> list[Tag | Text]:
+    """Parse markup into a list of top level nodes."""
+    root = Tag("")
+    stack = [root]
+    position = 0
+    for match in TAG_REGEX.finditer(markup):
+        if match.start() > position:
+            stack[-1].contents.append(make_text(markup[position : match.start()], stack))
+        position = match.end()
+        is_end, name, attrs, is_self_closing = match.groups()
+        name = name.lower()
+        attrs = attrs.rstrip()
+        if is_end:
+            # NOTE: Close the most recent matching tag together with any unclosed tags inside it,
+            # ignore stray end tags.
+            for i in range(len(stack) - 1, 0, -1):
+                if stack[i].name == name:
+                    del stack[i:]
+                    break
+            continue
+        tag = Tag(name, attrs)
+        stack[-1].contents.append(tag)
+        if not is_self_closing and name not in VOID_TAGS:
+            stack.append(tag)
+    if position < len(markup):
+        stack[-1].contents.append(make_text(markup[position:], stack))
+    return root.contents
+
+
+# NOTE: Header is determined by 'b' tag ending with colon or followed by a newline (except for
+# resolution text).
+def is_header(nodes: list[Tag | Text], index: int) -> bool:
+    elem = nodes[index]
+    if elem.name == "b":
+        elem_text = elem.get_text().strip()
+        if elem_text and elem_text[-1] in (":", "\N{FULLWIDTH COLON}"):
+            return True
+        if elem_text.startswith("(→"):
+            return False
+        next_elem = nodes[index + 1] if index + 1 < len(nodes) else None
+        if next_elem and next_elem.get_text().startswith("\n"):
+            return True
+    return False
+
+
+# NOTE: Flavor is determined by 'blockquote' or 'i' tag.
+def is_flavor(elem: Tag | Text) -> bool:
+    return elem.name in ["blockquote", "i"]
+
+
+def extract_flavor_text(elem: Tag | Text) -> str:
+    if is_flavor(elem):
+        return "".join(string.strip() for string in elem.strings() if string.strip())
+    return ""
+
+
+def strip_leading(nodes: list[Tag | Text]) -> None:
+    # NOTE: Remove leading whitespace before checking for header or flavor. This intentionally steps
+    # over the node after each removed one, to keep the exact behavior of removing nodes while
+    # iterating them.
+    index = 0
+    while index < len(nodes) and not str(nodes[index]).strip():
+        del nodes[index]
+        index += 1
+
+
+def parse_paragraphs(text: str, flavor: str) -> list[tuple[str, str, str]]:
+    """Split ADB text into paragraphs of (header, flavor, rule)."""
+    # NOTE: If there's explicit flavor text, add it before the main text to handle them together.
+    # Merge it with existing flavor text if possible.
+    if flavor:
+        nodes = parse(text)
+        if len(nodes):
+            flavor_elem = nodes[0]
+            if extract_flavor_text(flavor_elem):
+                flavor_elem.contents.insert(0, Text(f"{flavor}\n"))
+            else:
+                nodes.insert(0, Text(f"<blockquote><i>{flavor}</i></blockquote>\n"))
+            text = render(nodes)
+        else:
+            text = f"<blockquote><i>{flavor}</i></blockquote>"
+
+    # NOTE: Normalize <hr> tag.
+    text = text.replace("<hr/>", "<hr>")
+
+    # NOTE: Swap <hr> and <b> tag in case ADB has <hr> at the beginning of the header text.
+    text = re.sub(r"<b>\s*<hr>", "<hr><b>", text)
+
+    # NOTE: Use <hr> to explicitly determine paragraphs.
+    paragraphs = [paragraph.strip() for paragraph in text.split("<hr>")]
+
+    # NOTE: Split paragraphs further before each header.
+    new_paragraphs = []
+    for paragraph in paragraphs:
+        nodes = parse(paragraph)
+
+        splits = [0]
+        for i in range(len(nodes)):
+            if is_header(nodes, i):
+                splits.append(i)
+        splits.append(None)
+
+        for i in range(len(splits) - 1):
+            new_paragraph = "".join(str(elem) for elem in nodes[splits[i] : splits[i + 1]]).strip()
+            if new_paragraph:
+                new_paragraphs.append(new_paragraph)
+    paragraphs = new_paragraphs
+
+    # NOTE: Extract out the header and flavor text from each paragraph.
+    parsed_paragraphs = []
+    for paragraph in paragraphs:
+        nodes = parse(paragraph)
+        strip_leading(nodes)
+
+        # NOTE: Extract out the header text from the beginning.
+        header = ""
+        if nodes and is_header(nodes, 0):
+            header = str(nodes.pop(0)).replace("<b>", "").replace("</b>", "").strip()
+
+        strip_leading(nodes)
+
+        # NOTE: Extract out the flavor text from the beginning.
+        flavor = ""
+        if nodes and is_flavor(nodes[0]):
+            flavor = (
+                str(nodes.pop(0))
+                .replace("<blockquote>", "")
+                .replace("</blockquote>", "")
+                .replace("<i>", "")
+                .replace("</i>", "")
+                .strip()
+            )
+
+        rule = render(nodes).strip()
+        parsed_paragraphs.append((header, flavor, rule))
+
+    return parsed_paragraphs
@@ -0,0 +1,277 @@
+import csv
+import hashlib
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess  # noqa: S404
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from file_hash import get_file_hash
+
+SE_PROJECT_DIR = Path("SE_Generator")
+
+# NOTE: make.js reads its data from and writes its images into this project folder when it's set.
+SE_SHARD_ENV = "SE_GENERATOR_SHARD"
+
+# NOTE: make.js renders every card at this resolution when it's set, instead of the smallest one
+# that fills its deck slot.
+SE_PPI_ENV = "SE_GENERATOR_PPI"
+
+# NOTE: Bump to invalidate all rendered card images when the render cache key changes meaning.
+RENDER_CACHE_VERSION = 1
+
+
+def read_tables(data_dir: Path) -> dict[str, tuple[list[str], list[list[str]]]]:
+    """Read the header and rows of every SE data file by SE type."""
+    tables = {}
+    for filename in sorted(data_dir.glob("*.csv")):
+        with filename.open(newline="", encoding="utf-8") as file:
+            rows = list(csv.reader(file))
+        if rows:
+            tables[filename.stem] = (rows[0], rows[1:])
+    return tables
+
+
+def write_shards(
+    tables: dict[str, tuple[list[str], list[list[str]]]], shards_dir: Path, shard_count: int
+) -> list[Path]:
+    """Split the rows of all SE types into contiguous shards of about the same size.
+
+    Every shard gets its own data folder, holding a data file for each SE type it has rows of.
+    """
+    shutil.rmtree(shards_dir, ignore_errors=True)
+    rows = [(se_type, row) for se_type, (_, se_rows) in tables.items() for row in se_rows]
+    shard_size = max(1, math.ceil(len(rows) / max(1, shard_count)))
+    shard_dirs = []
+    for start in range(0, len(rows), shard_size):
+        shard_dir = shards_dir / str(len(shard_dirs))
+        data_dir = shard_dir / "data"
+        data_dir.mkdir(parents=True)
+        shard_rows = {}
+        for se_type, row in rows[start : start + shard_size]:
+            shard_rows.setdefault(se_type, []).append(row)
+        for se_type, se_rows in shard_rows.items():
+            with (data_dir / f"{se_type}.csv").open("w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(tables[se_type][0])
+                writer.writerows(se_rows)
+        shard_dirs.append(shard_dir)
+    return shard_dirs
+
+
+def run_shards(
+    command: list[str],
+    shard_dirs: list[Path],
+    project_dir: Path = SE_PROJECT_DIR,
+    env: dict[str, str] | None = None,
+) -> dict[Path, tuple[int, float]]:
+    """Run one SE process per shard concurrently, returning the exit code and seconds of each."""
+    processes = {}
+    for shard_dir in shard_dirs:
+        shard_env = {
+            **os.environ,
+            **(env or {}),
+            SE_SHARD_ENV: shard_dir.relative_to(project_dir).as_posix(),
+        }
+        # NOTE: The command is the configured Strange Eons executable, never built from card data.
+        process = subprocess.Popen(command, env=shard_env)  # noqa: S603
+        processes[shard_dir] = (time.perf_counter(), process)
+    results = {}
+    while len(results) < len(processes):
+        for shard_dir, (start, process) in processes.items():
+            if shard_dir in results or process.poll() is None:
+                continue
+            results[shard_dir] = (process.returncode, time.perf_counter() - start)
+            print(f"Rendered shard {shard_dir.name} in {results[shard_dir][1]:.1f}s...")
+        time.sleep(0.1)
+    return results
+
+
+class RenderClient:
+    """A client of make.js serving render jobs, which keeps Strange Eons loaded between jobs."""
+
+    def __init__(self, address: str) -> None:
+        host, _, port = address.rpartition(":")
+        self.address = (host or "localhost", int(port))
+
+    def request(self, job: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """Send a job and yield every message the server answers with."""
+        with (
+            socket.create_connection(self.address) as connection,
+            connection.makefile("rw", encoding="utf-8", newline="\n") as file,
+        ):
+            file.write(json.dumps(job) + "\n")
+            file.flush()
+            for line in file:
+                yield json.loads(line)
+
+    def render(
+        self,
+        data_dir: Path,
+        images_dir: Path,
+        ppi: int | None = None,
+        context: dict[str, str] | None = None,
+    ) -> Iterator[Path]:
+        """Render the data files of a folder, yielding every image as soon as it's written.
+
+        A server with another language, preferences or script than the context rejects the job.
+        """
+        job = {
+            **(context or {}),
+            "data": str(data_dir.resolve()),
+            "images": str(images_dir.resolve()),
+            "ppi": ppi,
+        }
+        for message in self.request(job):
+            if "image" in message:
+                yield Path(message["image"])
+            elif "error" in message:
+                raise RuntimeError(message["error"])
+            else:
+                return
+        raise ConnectionError("Render server closed the connection before finishing the job.")
+
+    def stop(self) -> None:
+        """Shut the server down once it acknowledges the stop job."""
+        for _ in self.request({"stop": True}):
+            return
+
+
+def get_server_context(lang: str, preferences: Path, script: Path) -> dict[str, str]:
+    """Get what a render server must have started with to render a job, sent along with the job."""
+    return {
+        "lang": lang,
+        "preferences": preferences.read_text(encoding="utf-8"),
+        "script": get_file_hash(script),
+    }
+
+
+def run_servers(
+    addresses: list[str],
+    shard_dirs: list[Path],
+    ppi: int | None = None,
+    context: dict[str, str] | None = None,
+) -> dict[Path, tuple[int, float]]:
+    """Render shards on running render servers concurrently, one shard at a time on each server.
+
+    Like run_shards, return the exit code and seconds taken by each shard, where a shard that failed
+    to render has exit code 1.
+    """
+
+    def render_shards(address: str, shard_dirs: list[Path]) -> dict[Path, tuple[int, float]]:
+        client = RenderClient(address)
+        results = {}
+        for shard_dir in shard_dirs:
+            start = time.perf_counter()
+            returncode = 0
+            try:
+                for _ in client.render(shard_dir / "data", shard_dir / "images", ppi, context):
+                    pass
+            except (OSError, RuntimeError) as e:
+                print(f"Error: Failed to render shard {shard_dir.name} on {address}: {e}")
+                returncode = 1
+            results[shard_dir] = (returncode, time.perf_counter() - start)
+            print(f"Rendered shard {shard_dir.name} in {results[shard_dir][1]:.1f}s...")
+        return results
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(addresses)) as executor:
+        futures = [
+            executor.submit(render_shards, address, shard_dirs[i :: len(addresses)])
+            for i, address in enumerate(addresses)
+        ]
+        for future in futures:
+            results.update(future.result())
+    return results
+
+
+def get_shard_images(results: dict[Path, tuple[int, float]]) -> list[Path]:
+    """List the images rendered by every shard that succeeded.
+
+    A shard that failed may have left a partially written image behind, so none of its images are
+    trusted.
+    """
+    return [
+        filename
+        for shard_dir, (returncode, _) in results.items()
+        if returncode == 0
+        for filename in (shard_dir / "images").glob("*.png")
+    ]
+
+
+def get_context_hash(filenames: list[Path], *values: str) -> str:
+    """Hash the files and values that affect the rendering of every card, like the SE script."""
+    context = [RENDER_CACHE_VERSION, *values]
+    context.extend(
+        get_file_hash(filename) if filename.is_file() else None for filename in filenames
+    )
+    return hashlib.sha256(json.dumps(context).encode()).hexdigest()
+
+
+def get_render_keys(
+    tables: dict[str, tuple[list[str], list[list[str]]]], template_dir: Path, context_hash: str
+) -> dict[str, str]:
+    """Get the render cache key of every card by its file name.
+
+    The key hashes the SE type, the template file, the whole data row, the content of the portraits
+    it reads and the rendering context, so a card is only rendered again when anything that goes
+    into its image changed.
+    """
+    keys = {}
+    portrait_hashes = {}
+    for se_type, (header, rows) in tables.items():
+        template_filename = template_dir / f"{se_type}.eon"
+        template_hash = get_file_hash(template_filename) if template_filename.is_file() else None
+        for row in rows:
+            fields = dict(zip(header, row, strict=True))
+            portraits = []
+            for column, value in fields.items():
+                if column.startswith("port") and column.endswith("Src") and value:
+                    if value not in portrait_hashes:
+                        filename = Path(value)
+                        portrait_hashes[value] = (
+                            get_file_hash(filename) if filename.is_file() else None
+                        )
+                    portraits.append(portrait_hashes[value])
+            key = [se_type, template_hash, fields, portraits, context_hash]
+            keys[fields["file"]] = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+    return keys
+
+
+class RenderCache:
+    """Rendered card images stored by their render cache key, shared by all languages and runs."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def get_filename(self, key: str) -> Path:
+        return self.directory / f"{key}.png"
+
+    def get_pending(
+        self, tables: dict[str, tuple[list[str], list[list[str]]]], keys: dict[str, str]
+    ) -> dict[str, tuple[list[str], list[list[str]]]]:
+        """Keep the rows of the cards without a cached image."""
+        pending = {}
+        for se_type, (header, rows) in tables.items():
+            file_index = header.index("file")
+            rows = [row for row in rows if not self.get_filename(keys[row[file_index]]).is_file()]
+            if rows:
+                pending[se_type] = (header, rows)
+        return pending
+
+    def put(self, key: str, filename: Path) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename.replace(self.get_filename(key))
+
+    def link(self, key: str, filename: Path) -> None:
+        """Place a cached image at the file name, hard linked when the file system allows it."""
+        try:
+            filename.hardlink_to(self.get_filename(key))
+        except OSError:
+            shutil.copyfile(self.get_filename(key), filename)
@@ -0,0 +1,114 @@
+import json
+import struct
+from pathlib import Path
+from typing import Any
+
+SE_TEMPLATE_DIR = Path("SE_Generator/template")
+
+SE_SCHEMA_VERSION = 1
+
+# NOTE: Keys templates read from the plugin defaults, which aren't stored in the template files.
+# Only keys that some card of the template sets to a non-default value are listed, e.g.
+# ShowEncounterIcon hides the encounter icon of The Dream-Gate locations.
+SE_TEMPLATE_DEFAULT_KEYS = {
+    "location_front": ["ShowEncounterIcon"],
+    "location_back": ["ShowEncounterIcon"],
+}
+
+# NOTE: Java serialization markers used by the settings map of SE component files.
+JAVA_HASH_MAP = b"java.util.HashMap\x05"
+JAVA_NULL = 0x70
+JAVA_REFERENCE = 0x71
+JAVA_STRING = 0x74
+JAVA_BLOCK_DATA = 0x77
+
+
+def read_java_value(data: bytes, offset: int) -> tuple[str | None, int]:
+    tag = data[offset]
+    if tag == JAVA_STRING:
+        (length,) = struct.unpack_from(">H", data, offset + 1)
+        return data[offset + 3 : offset + 3 + length].decode("utf-8"), offset + 3 + length
+    if tag == JAVA_NULL:
+        return None, offset + 1
+    if tag == JAVA_REFERENCE:
+        return None, offset + 5
+    raise ValueError(f"Unexpected serialization tag {tag:#x} at {offset}")
+
+
+def read_template_keys(filename: str | Path) -> list[str]:
+    """Read the setting keys stored in an SE component file."""
+    data = Path(filename).read_bytes()
+    # NOTE: The first hash map is the private settings of the component. It's written as the class
+    # descriptor, 'xp', the load factor and threshold fields, then a block with the capacity and
+    # size, followed by the key value pairs.
+    offset = data.index(JAVA_HASH_MAP)
+    offset = data.index(b"xp", offset) + 2 + 8
+    if data[offset] != JAVA_BLOCK_DATA:
+        raise ValueError(f"Unexpected settings layout in {filename}")
+    _, size = struct.unpack_from(">ii", data, offset + 2)
+    offset += 10
+    keys = []
+    for _ in range(size):
+        key, offset = read_java_value(data, offset)
+        _, offset = read_java_value(data, offset)
+        if key is not None:
+            keys.append(key)
+    return keys
+
+
+def get_template_filename(se_type: str) -> Path:
+    return SE_TEMPLATE_DIR / f"{se_type}.eon"
+
+
+class TemplateSchema:
+    """Setting keys of the SE templates, extracted once and cached until a template file changes.
+
+    Key changes found while refreshing a template are kept in 'changes' as (added, removed) keys, so
+    that column drift between the templates and the generated CSV files can be reported.
+    """
+
+    def __init__(self, filename: str | Path, template_dir: str | Path = SE_TEMPLATE_DIR) -> None:
+        self.filename = Path(filename)
+        self.template_dir = Path(template_dir)
+        self.templates: dict[str, dict[str, Any]] = {}
+        self.changes: dict[str, tuple[list[str], list[str]]] = {}
+        self.dirty = False
+        if self.filename.is_file():
+            with self.filename.open(encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == SE_SCHEMA_VERSION:
+                self.templates = data["templates"]
+
+    def get_keys(self, se_type: str) -> list[str]:
+        """Get the keys stored in a template.
+
+        Templates may also read keys from the plugin defaults, which aren't stored.
+        """
+        template_filename = self.template_dir / f"{se_type}.eon"
+        stat = template_filename.stat()
+        entry = self.templates.get(se_type)
+        if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+            keys = read_template_keys(template_filename)
+            if entry is not None and set(keys) != set(entry["keys"]):
+                self.changes[se_type] = (
+                    sorted(set(keys) - set(entry["keys"])),
+                    sorted(set(entry["keys"]) - set(keys)),
+                )
+            entry = {"mtime": stat.st_mtime, "size": stat.st_size, "keys": keys}
+            self.templates[se_type] = entry
+            self.dirty = True
+        return entry["keys"]
+
+    def get_read_keys(self, se_type: str) -> list[str]:
+        """Get the keys a template reads, which are its stored keys and its plugin default keys."""
+        return self.get_keys(se_type) + SE_TEMPLATE_DEFAULT_KEYS.get(se_type, [])
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        temp_filename = self.filename.with_suffix(f"{self.filename.suffix}.tmp")
+        with temp_filename.open("w", encoding="utf-8") as file:
+            json.dump({"version": SE_SCHEMA_VERSION, "templates": self.templates}, file, indent=2)
+        temp_filename.replace(self.filename)
+        self.dirty = False
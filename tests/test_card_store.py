@@ -0,0 +1,263 @@
+import json
+import os
+from collections.abc import Mapping
+from pathlib import Path
+
+import pytest
+
+from card_store import (
+    CardStore,
+    PackFile,
+    card_view,
+    collect_raw_cards,
+    merge_ahdb_cards,
+    scan_pack_changes,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CardStore(tmp_path / "en.sqlite3")
+    store.build(
+        [{"code": "01001", "name": "Roland Banks"}, {"code": "01001-t", "name": "Roland Banks"}],
+        taboo="abc",
+    )
+    yield store
+    store.close()
+
+
+def test_card_store_get(store) -> None:
+    assert store.get("01001") == {"code": "01001", "name": "Roland Banks"}
+    assert store.get("00000") is None
+    assert store["01001-t"]["name"] == "Roland Banks"
+    with pytest.raises(KeyError):
+        store["00000"]
+
+
+def test_card_store_contains(store) -> None:
+    assert "01001" in store
+    assert "00000" not in store
+    assert sorted(store) == ["01001", "01001-t"]
+    assert len(store) == 2
+
+
+def test_card_store_is_valid(store, tmp_path) -> None:
+    assert store.is_valid(taboo="abc")
+    assert not store.is_valid(taboo="def")
+    assert not CardStore(tmp_path / "missing.sqlite3").is_valid()
+
+
+def test_card_store_rebuild(store) -> None:
+    store.get("01001")
+    store.build([{"code": "01002", "name": "Daisy Walker"}], taboo="def")
+    assert store.get("01001") is None
+    assert store.get("01002")["name"] == "Daisy Walker"
+    assert store.is_valid(taboo="def")
+
+
+def test_card_store_pack_files(tmp_path) -> None:
+    store = CardStore(tmp_path / "en.sqlite3")
+    pack_file = PackFile("en", 1.0, 10, "abc")
+    store.build(
+        [],
+        packs={
+            "core.json": (
+                pack_file,
+                [{"code": "01104", "back_link": "01105"}, {"code": "01105"}],
+            ),
+        },
+    )
+    assert store.get_pack_files() == {"core.json": pack_file}
+    assert store.get_pack_codes(["core.json"]) == {"01104", "01105"}
+    assert store.get_dependent_codes(["01105"]) == {"01104"}
+    assert store.get_pack_cards(["01105"]) == [("core.json", "en", {"code": "01105"})]
+
+    store.update([], removed_packs=["core.json"])
+    assert store.get_pack_files() == {}
+    assert store.get_pack_codes(["core.json"]) == set()
+    store.close()
+
+
+def test_card_store_views(tmp_path) -> None:
+    store = CardStore(tmp_path / "en.sqlite3")
+    front = {"code": "01104", "name": "Front", "back_link": "01105", "encounter_code": "gathering"}
+    back = {"code": "01105", "name": "Back"}
+    front["linked_card"] = card_view(back, encounter_code="gathering")
+    duplicate = card_view(front, code="01504", pack_code="rcore")
+    store.build([front, back, duplicate])
+
+    card = store["01504"]
+    assert card["code"] == "01504"
+    assert card["name"] == "Front"
+    assert card["pack_code"] == "rcore"
+    assert card["linked_card"]["name"] == "Back"
+    assert card["linked_card"]["encounter_code"] == "gathering"
+    assert "encounter_code" not in store["01105"]
+
+    # NOTE: Writing to a view must not leak into the card it is based on.
+    card["name"] = "Duplicate"
+    assert store["01104"]["name"] == "Front"
+    store.close()
+
+
+def test_card_store_view_own_fields(tmp_path) -> None:
+    store = CardStore(tmp_path / "en.sqlite3")
+    base = {"code": "01", "name": "Front"}
+    store.build([base, card_view(base, code="10", name="Front")])
+    # NOTE: A field the view sets itself is kept, even if it was equal to the base card.
+    store.update([{"code": "01", "name": "Front2"}])
+    assert store["10"]["name"] == "Front"
+    store.close()
+
+
+def test_card_store_caches(store) -> None:
+    cache = store.get_cache("paragraphs")
+    cache[("01001", 0)] = [("", "", "Rule")]
+    assert store.get_cache("paragraphs") is cache
+    store.update([{"code": "01001", "name": "Roland Banks"}])
+    assert cache == {}
+
+
+def write_pack(path, cards) -> PackFile:
+    path.write_text(json.dumps(cards))
+    stat = path.stat()
+    return PackFile("en", stat.st_mtime, stat.st_size, "")
+
+
+def test_scan_pack_changes(tmp_path) -> None:
+    core = tmp_path / "core.json"
+    dwl = tmp_path / "dwl.json"
+    pack_files = {
+        str(core): write_pack(core, [{"code": "01104", "back_link": "01105"}, {"code": "01105"}]),
+        str(dwl): write_pack(dwl, [{"code": "02001"}]),
+    }
+
+    def load_pack(path):
+        loaded.append(path)
+        return json.loads(Path(path).read_text())
+
+    loaded = []
+    store = CardStore(tmp_path / "en.sqlite3")
+    packs, removed_packs, changed_codes = scan_pack_changes(
+        store, pack_files, load_pack, is_valid=False
+    )
+    assert changed_codes == {"01104", "01105", "02001"}
+    store.build([], packs=packs)
+
+    # NOTE: Pack files with the recorded modification time and size aren't read again.
+    loaded.clear()
+    assert scan_pack_changes(store, pack_files, load_pack) == ({}, [], set())
+    assert loaded == []
+
+    # NOTE: A touched pack file with the same content is read and recorded again, but its cards didn't change.
+    os.utime(core, (0, 0))
+    pack_files[str(core)] = pack_files[str(core)]._replace(mtime=0.0)
+    packs, removed_packs, changed_codes = scan_pack_changes(store, pack_files, load_pack)
+    assert list(packs) == [str(core)]
+    assert (removed_packs, changed_codes) == ([], set())
+    store.update([], packs=packs)
+
+    # NOTE: A changed pack file changes both its old and new cards, and a removed one changes the cards it had.
+    pack_files[str(core)] = write_pack(core, [{"code": "01104"}, {"code": "01106"}])
+    del pack_files[str(dwl)]
+    packs, removed_packs, changed_codes = scan_pack_changes(store, pack_files, load_pack)
+    assert list(packs) == [str(core)]
+    assert removed_packs == [str(dwl)]
+    assert changed_codes == {"01104", "01105", "01106", "02001"}
+    store.close()
+
+
+def test_collect_raw_cards(tmp_path) -> None:
+    store = CardStore(tmp_path / "en.sqlite3")
+    store.build(
+        [],
+        packs={
+            "a.json": (
+                PackFile("en", 1.0, 10, "abc"),
+                [{"code": "01104", "back_link": "01105"}, {"code": "01105"}, {"code": "01106"}],
+            ),
+            "b.json": (PackFile("tr", 1.0, 10, "abc"), [{"code": "01105", "name": "Back"}]),
+        },
+    )
+    # NOTE: Collecting a card also collects the cards linking to it, and the re-read pack files replace the recorded ones.
+    packs = {"b.json": (PackFile("tr", 2.0, 10, "def"), [{"code": "01105", "name": "New"}])}
+    codes, raw_cards = collect_raw_cards(store, ["01105"], packs)
+    assert codes == {"01104", "01105"}
+    assert raw_cards == [
+        ("a.json", "en", {"code": "01105"}),
+        ("a.json", "en", {"code": "01104", "back_link": "01105"}),
+        ("b.json", "tr", {"code": "01105", "name": "New"}),
+    ]
+    store.close()
+
+
+def test_merge_duplicate_linked_card() -> None:
+    english = {
+        "01001": {"code": "01001", "back_link": "01001b", "encounter_code": None},
+        "01001b": {"code": "01001b"},
+        "02001": {"code": "02001", "duplicate_of": "01001", "encounter_code": "dunwich"},
+    }
+    ahdb = merge_ahdb_cards(english, {})
+    # NOTE: The encounter code patched into the linked card of a duplicate stays on the duplicate.
+    assert ahdb["02001"]["linked_card"]["encounter_code"] == "dunwich"
+    assert ahdb["01001"]["linked_card"].get("encounter_code") is None
+    assert "encounter_code" not in ahdb["01001b"]
+
+
+def sync_store(store, pack_files) -> None:
+    """Update a store from pack files the same way main.get_card_store does."""
+    is_valid = store.is_valid()
+    packs, removed_packs, changed_codes = scan_pack_changes(
+        store, pack_files, lambda path: json.loads(Path(path).read_text()), is_valid=is_valid
+    )
+    codes, raw_cards = collect_raw_cards(
+        store, changed_codes, packs, removed_packs, is_valid=is_valid
+    )
+    english = {card["code"]: card for _, kind, card in raw_cards if kind == "en"}
+    ahdb = merge_ahdb_cards(english, {})
+    if is_valid:
+        store.update(
+            ahdb.values(), removed_codes=codes - set(ahdb), packs=packs, removed_packs=removed_packs
+        )
+    else:
+        store.build(ahdb.values(), packs=packs)
+
+
+def to_dict(card):
+    if isinstance(card, Mapping):
+        return {key: to_dict(value) for key, value in card.items()}
+    return card
+
+
+def test_incremental_update_matches_rebuild(tmp_path) -> None:
+    back = tmp_path / "back.json"
+    base = tmp_path / "base.json"
+    duplicate = tmp_path / "duplicate.json"
+    write_pack(back, [{"code": "01", "name": "Back"}])
+    write_pack(base, [{"code": "02", "name": "Front"}])
+    write_pack(
+        duplicate, [{"code": "10", "name": "Front", "back_link": "01", "duplicate_of": "02"}]
+    )
+
+    def get_pack_files():
+        return {
+            str(path): PackFile("en", path.stat().st_mtime, path.stat().st_size, "")
+            for path in [back, base, duplicate]
+        }
+
+    store = CardStore(tmp_path / "incremental.sqlite3")
+    sync_store(store, get_pack_files())
+    assert store["10"]["name"] == "Front"
+
+    # NOTE: The duplicate also links to a back, but is still merged again when its base changes.
+    write_pack(base, [{"code": "02", "name": "Front2"}])
+    pack_files = get_pack_files()
+    sync_store(store, pack_files)
+    rebuilt = CardStore(tmp_path / "rebuilt.sqlite3")
+    sync_store(rebuilt, pack_files)
+    assert store["10"]["name"] == "Front"
+    assert {code: to_dict(store[code]) for code in store} == {
+        code: to_dict(rebuilt[code]) for code in rebuilt
+    }
+    store.close()
+    rebuilt.close()
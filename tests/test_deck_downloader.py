@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from deck_downloader import DeckDownloader, get_sidecar_filename, is_downloaded, read_sidecar
+
+
+class DeckHandler(BaseHTTPRequestHandler):
+    # NOTE: Paths map to a list of responses, served in order and repeating the last one.
+    responses: dict[str, list[tuple[int, bytes]]] = {}
+    requests: list[str] = []
+    # NOTE: Paths served without an ETag, like servers that don't support conditional requests.
+    no_etag: set[str] = set()
+
+    def do_GET(self) -> None:
+        self.requests.append(self.path)
+        responses = self.responses.get(self.path, [(404, b"")])
+        status, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        length = len(body)
+        # NOTE: A negative status simulates a connection dropped half way through the body.
+        if status < 0:
+            status, length = 200, length * 2
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        if status == 200 and self.path not in self.no_etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    DeckHandler.responses = {}
+    DeckHandler.requests = []
+    DeckHandler.no_etag = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DeckHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_all(server, tmp_path) -> None:
+    DeckHandler.responses = {f"/{i}.jpg": [(200, bytes([i]) * 1000)] for i in range(10)}
+    downloader = DeckDownloader(max_workers=4, sleep=lambda _: None)
+    downloads = {f"{server}/{i}.jpg": tmp_path / f"{i}.jpg" for i in range(10)}
+    assert downloader.download_all(downloads) == {}
+    for i in range(10):
+        assert (tmp_path / f"{i}.jpg").read_bytes() == bytes([i]) * 1000
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_download_retry(server, tmp_path) -> None:
+    DeckHandler.responses = {"/deck.jpg": [(503, b""), (500, b""), (200, b"deck")]}
+    delays = []
+    downloader = DeckDownloader(retries=3, backoff=0.5, sleep=delays.append)
+    filename = downloader.download(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    assert filename.read_bytes() == b"deck"
+    assert delays == [0.5, 1.0]
+
+
+def test_download_truncated(server, tmp_path) -> None:
+    DeckHandler.responses = {"/deck.jpg": [(-1, b"part"), (200, b"deck")]}
+    downloader = DeckDownloader(sleep=lambda _: None)
+    filename = downloader.download(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    assert filename.read_bytes() == b"deck"
+    assert DeckHandler.requests.count("/deck.jpg") == 2
+
+
+def test_download_failure(server, tmp_path) -> None:
+    DeckHandler.responses = {"/busy.jpg": [(503, b"")]}
+    downloader = DeckDownloader(retries=2, sleep=lambda _: None)
+    errors = downloader.download_all(
+        {
+            f"{server}/missing.jpg": tmp_path / "missing.jpg",
+            f"{server}/busy.jpg": tmp_path / "busy.jpg",
+        }
+    )
+    assert set(errors) == {f"{server}/missing.jpg", f"{server}/busy.jpg"}
+    assert all(isinstance(error, requests.HTTPError) for error in errors.values())
+    # NOTE: Client errors are not retried, server errors are retried until giving up.
+    assert DeckHandler.requests.count("/missing.jpg") == 1
+    assert DeckHandler.requests.count("/busy.jpg") == 3
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_sidecar(server, tmp_path) -> None:
+    DeckHandler.responses = {"/deck.jpg": [(200, b"deck")]}
+    downloader = DeckDownloader(sleep=lambda _: None)
+    filename = downloader.download(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    sidecar = read_sidecar(filename)
+    assert sidecar["url"] == f"{server}/deck.jpg"
+    assert sidecar["etag"] == f'"{hashlib.md5(b"deck").hexdigest()}"'
+    assert sidecar["size"] == 4
+    assert sidecar["hash"] == hashlib.sha256(b"deck").hexdigest()
+
+
+def test_revalidate_all(server, tmp_path) -> None:
+    DeckHandler.responses = {
+        "/same.jpg": [(200, b"same")],
+        "/changed.jpg": [(200, b"old"), (200, b"new")],
+        "/plain.jpg": [(200, b"plain")],
+        "/legacy.jpg": [(200, b"legacy")],
+    }
+    DeckHandler.no_etag = {"/plain.jpg"}
+    downloader = DeckDownloader(max_workers=4, sleep=lambda _: None)
+    downloads = {
+        f"{server}/{name}.jpg": tmp_path / f"{name}.jpg" for name in ["same", "changed", "plain"]
+    }
+    assert downloader.download_all(downloads) == {}
+    # NOTE: A file downloaded before sidecars existed only has its content to compare against.
+    (tmp_path / "legacy.jpg").write_bytes(b"legacy")
+    downloads[f"{server}/legacy.jpg"] = tmp_path / "legacy.jpg"
+    stat = (tmp_path / "same.jpg").stat()
+
+    changed, errors = downloader.revalidate_all(downloads)
+    assert errors == {}
+    assert changed == {f"{server}/changed.jpg"}
+    assert (tmp_path / "changed.jpg").read_bytes() == b"new"
+    assert read_sidecar(tmp_path / "changed.jpg")["hash"] == hashlib.sha256(b"new").hexdigest()
+    assert (tmp_path / "same.jpg").stat().st_mtime_ns == stat.st_mtime_ns
+    assert get_sidecar_filename(tmp_path / "legacy.jpg").is_file()
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_revalidate_unchanged(server, tmp_path) -> None:
+    DeckHandler.responses = {"/deck.jpg": [(200, b"deck")]}
+    downloader = DeckDownloader(sleep=lambda _: None)
+    downloader.download(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    assert not downloader.revalidate(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    assert not downloader.revalidate(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    assert (tmp_path / "deck.jpg").read_bytes() == b"deck"
+
+
+def test_revalidate_truncated(server, tmp_path) -> None:
+    DeckHandler.responses = {"/deck.jpg": [(200, b"deck")]}
+    downloader = DeckDownloader(sleep=lambda _: None)
+    filename = downloader.download(f"{server}/deck.jpg", tmp_path / "deck.jpg")
+    assert is_downloaded(filename)
+    # NOTE: The ETag in the sidecar no longer describes a file that doesn't match its size.
+    filename.write_bytes(b"de")
+    assert not is_downloaded(filename)
+    assert downloader.revalidate(f"{server}/deck.jpg", filename)
+    assert filename.read_bytes() == b"deck"
+    assert is_downloaded(filename)
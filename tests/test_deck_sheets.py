@@ -0,0 +1,182 @@
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from PIL import Image
+
+from deck_sheets import (
+    PORTRAIT_FORMATS,
+    CardCrop,
+    DeckSheetCache,
+    DeckSlot,
+    crop_deck,
+    crop_decks,
+    crop_slot,
+    get_image_bytes,
+    get_slot_box,
+    get_slot_size,
+    pack_decks,
+)
+
+
+def make_sheet(filename, size, color) -> None:
+    Image.new("RGB", size, color).save(filename)
+
+
+def test_cache_decodes_once(tmp_path, monkeypatch) -> None:
+    make_sheet(tmp_path / "deck.png", (100, 70), "red")
+    opened = []
+    open_image = Image.open
+    monkeypatch.setattr(
+        Image, "open", lambda filename: opened.append(filename) or open_image(filename)
+    )
+    cache = DeckSheetCache()
+    assert cache.get_size(tmp_path / "deck.png") == (100, 70)
+    sheet = cache.get(tmp_path / "deck.png")
+    assert cache.get(str(tmp_path / "deck.png")) is sheet
+    assert cache.get_size(tmp_path / "deck.png") == (100, 70)
+    assert len(opened) == 2
+
+
+def test_cache_budget(tmp_path) -> None:
+    for name in ["a", "b", "c"]:
+        make_sheet(tmp_path / f"{name}.png", (100, 100), "red")
+    cache = DeckSheetCache(budget=2 * 100 * 100 * 3)
+    a = cache.get(tmp_path / "a.png")
+    cache.get(tmp_path / "b.png")
+    assert cache.get(tmp_path / "a.png") is a
+    cache.get(tmp_path / "c.png")
+    # NOTE: The least recently used sheet is evicted, which is 'b' since 'a' was used again.
+    assert list(cache.sheets) == [tmp_path / "a.png", tmp_path / "c.png"]
+    assert cache.total == sum(get_image_bytes(sheet) for sheet in cache.sheets.values())
+
+
+def test_cache_oversized(tmp_path) -> None:
+    make_sheet(tmp_path / "a.png", (100, 100), "red")
+    make_sheet(tmp_path / "b.png", (100, 100), "red")
+    cache = DeckSheetCache(budget=1)
+    cache.get(tmp_path / "a.png")
+    cache.get(tmp_path / "b.png")
+    assert list(cache.sheets) == [tmp_path / "b.png"]
+
+
+@settings(max_examples=50, deadline=None)
+@given(
+    width=st.integers(50, 600),
+    height=st.integers(50, 600),
+    deck_w=st.integers(1, 10),
+    deck_h=st.integers(1, 7),
+    data=st.data(),
+)
+def test_crop_slot(width, height, deck_w, deck_h, data) -> None:
+    deck_x = data.draw(st.integers(0, deck_w - 1))
+    deck_y = data.draw(st.integers(0, deck_h - 1))
+    rotate = data.draw(st.booleans())
+    sheet = Image.new("RGB", (width, height))
+    sheet.putdata([(x % 256, y % 256, (x * y) % 256) for y in range(height) for x in range(width)])
+    # NOTE: Reference cropping with a float box, as done before slot boxes were computed explicitly.
+    slot_width = width / deck_w
+    slot_height = height / deck_h
+    left = deck_x * slot_width
+    top = deck_y * slot_height
+    expected = sheet.crop((left, top, left + slot_width, top + slot_height))
+    if rotate:
+        expected = expected.transpose(method=Image.Transpose.ROTATE_90)
+    card_image = crop_slot(sheet, deck_w, deck_h, deck_x, deck_y, rotate=rotate)
+    assert card_image.tobytes() == expected.tobytes()
+    box = get_slot_box(sheet.size, deck_w, deck_h, deck_x, deck_y)
+    assert box[2] - box[0] == (expected.height if rotate else expected.width)
+
+
+def make_crops(tmp_path, deck_image_filename, deck_w, deck_h) -> list[CardCrop]:
+    return [
+        CardCrop(tmp_path / f"{deck_image_filename.stem}-{x}-{y}.png", deck_w, deck_h, x, y, x == 0)
+        for x in range(deck_w)
+        for y in range(deck_h)
+    ]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_crop_decks(tmp_path, max_workers) -> None:
+    crops = {}
+    for i, (deck_w, deck_h) in enumerate([(3, 2), (2, 2), (1, 1)]):
+        deck_image_filename = tmp_path / f"deck{i}.png"
+        sheet = Image.new("RGB", (90, 60))
+        sheet.putdata([(x, y, i) for y in range(60) for x in range(90)])
+        sheet.save(deck_image_filename)
+        crops[deck_image_filename] = make_crops(tmp_path, deck_image_filename, deck_w, deck_h)
+    crops[tmp_path / "missing.png"] = make_crops(tmp_path, tmp_path / "missing.png", 1, 1)
+
+    errors = crop_decks(crops, max_workers, DeckSheetCache())
+    assert list(errors) == [tmp_path / "missing.png"]
+    for deck_image_filename, deck_crops in crops.items():
+        if deck_image_filename in errors:
+            assert not any(crop.filename.exists() for crop in deck_crops)
+            continue
+        sheet = Image.open(deck_image_filename)
+        for crop in deck_crops:
+            expected = crop_slot(
+                sheet, crop.deck_w, crop.deck_h, crop.deck_x, crop.deck_y, rotate=crop.rotate
+            )
+            assert Image.open(crop.filename).tobytes() == expected.tobytes()
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+@pytest.mark.parametrize("portrait_format", list(PORTRAIT_FORMATS))
+def test_crop_deck_format(tmp_path, portrait_format) -> None:
+    sheet = Image.new("RGB", (40, 30))
+    sheet.putdata([(x, y, 7) for y in range(30) for x in range(40)])
+    sheet.save(tmp_path / "deck.png")
+    extension = PORTRAIT_FORMATS[portrait_format].extension
+    crop = CardCrop(tmp_path / f"card.{extension}", 2, 1, 1, 0, True)
+    assert crop_deck(tmp_path / "deck.png", [crop], portrait_format=portrait_format) == 1
+    with Image.open(crop.filename) as image:
+        assert image.format == PORTRAIT_FORMATS[portrait_format].params["format"]
+        assert image.tobytes() == crop_slot(sheet, 2, 1, 1, 0, rotate=True).tobytes()
+
+
+def pack_deck_reference(deck_image_filename, slots) -> Image.Image:
+    # NOTE: The previous implementation, pasting into a deck image kept open until all decks were done.
+    deck_image = Image.open(deck_image_filename)
+    for slot in slots:
+        card_image = Image.open(slot.filename)
+        if slot.rotate:
+            card_image = card_image.transpose(method=Image.Transpose.ROTATE_270)
+        width = deck_image.width // slot.deck_w
+        height = deck_image.height // slot.deck_h
+        card_image = card_image.resize((width, height))
+        deck_image.paste(card_image, box=(slot.deck_x * width, slot.deck_y * height))
+    return deck_image.convert("RGB")
+
+
+def test_slot_size() -> None:
+    assert get_slot_size((95, 64), 3, 2) == (31, 32)
+    # NOTE: A rotated card is rendered upright, so it's as wide as its slot is high.
+    assert get_slot_size((95, 64), 3, 2, rotate=True) == (32, 31)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_pack_decks(tmp_path, max_workers) -> None:
+    decks = {}
+    for i in range(3):
+        deck_image_filename = tmp_path / f"deck{i}.jpg"
+        Image.new("RGB", (95, 64), (i * 50, 0, 0)).save(deck_image_filename)
+        slots = []
+        for x in range(i + 1):
+            filename = tmp_path / f"card{i}-{x}.png"
+            Image.new("RGBA", (40, 60), (0, x * 60, 200, 255)).save(filename)
+            slots.append(DeckSlot(filename, 3, 2, x, 1, x == 1))
+        decks[f"deck{i}"] = (deck_image_filename, slots, tmp_path / f"packed{i}.jpg")
+    decks["missing"] = (tmp_path / "missing.jpg", [], tmp_path / "packed-missing.jpg")
+
+    errors = pack_decks(decks, max_workers)
+    assert list(errors) == ["missing"]
+    for deck, (deck_image_filename, slots, filename) in decks.items():
+        if deck in errors:
+            assert not filename.exists()
+            continue
+        expected = tmp_path / "expected.jpg"
+        pack_deck_reference(deck_image_filename, slots).save(
+            expected, progressive=True, optimize=True
+        )
+        assert filename.read_bytes() == expected.read_bytes()
+    assert list(tmp_path.glob("*.tmp")) == []
@@ -0,0 +1,211 @@
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from dropbox.exceptions import ApiError
+
+from dropbox_uploader import DropboxUploader, get_content_hash
+
+
+class FakeDropbox:
+    """A minimal in-memory stand-in for the Dropbox API calls used by the uploader."""
+
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+        self.links: dict[str, str] = {}
+        self.calls: list[str] = []
+        self.lock = threading.Lock()
+        self.page_size = 2
+        self.sessions: dict[str, bytes] = {}
+        # NOTE: The number of session appends to accept before simulating a dropped connection.
+        self.appends_left: int | None = None
+
+    def record(self, name: str) -> None:
+        with self.lock:
+            self.calls.append(name)
+
+    def files_create_folder(self, path: str) -> None:
+        self.record("files_create_folder")
+
+    def files_get_metadata(self, path: str) -> SimpleNamespace:
+        self.record("files_get_metadata")
+        if path.lower() not in self.files:
+            raise ApiError("request", "not_found", None, None)
+        data = self.files[path.lower()]
+        block_hash = hashlib.sha256(hashlib.sha256(data).digest()).hexdigest()
+        return SimpleNamespace(path_display=path, content_hash=block_hash)
+
+    def files_upload(self, data: bytes, path: str, mode=None) -> SimpleNamespace:
+        self.record("files_upload")
+        self.files[path.lower()] = data
+        return SimpleNamespace(path_display=path)
+
+    def files_upload_session_start(self, data: bytes) -> SimpleNamespace:
+        self.record("files_upload_session_start")
+        session_id = f"session{len(self.sessions)}"
+        self.sessions[session_id] = data
+        return SimpleNamespace(session_id=session_id)
+
+    def check_cursor(self, cursor) -> None:
+        if len(self.sessions.get(cursor.session_id, b"")) != cursor.offset:
+            raise ApiError("request", "incorrect_offset", None, None)
+
+    def files_upload_session_append_v2(self, data: bytes, cursor) -> None:
+        if self.appends_left is not None:
+            if self.appends_left == 0:
+                raise ConnectionError("Connection dropped")
+            self.appends_left -= 1
+        self.record("files_upload_session_append_v2")
+        self.check_cursor(cursor)
+        self.sessions[cursor.session_id] += data
+
+    def files_upload_session_finish(self, data: bytes, cursor, commit) -> SimpleNamespace:
+        self.record("files_upload_session_finish")
+        self.check_cursor(cursor)
+        self.files[commit.path.lower()] = self.sessions.pop(cursor.session_id) + data
+        return SimpleNamespace(path_display=commit.path)
+
+    def sharing_list_shared_links(
+        self, path=None, cursor=None, direct_only=None
+    ) -> SimpleNamespace:
+        self.record("sharing_list_shared_links")
+        links = [
+            SimpleNamespace(path_lower=link_path, url=url)
+            for link_path, url in sorted(self.links.items())
+            if path is None or link_path == path.lower()
+        ]
+        start = int(cursor or 0)
+        end = start + self.page_size
+        return SimpleNamespace(links=links[start:end], has_more=end < len(links), cursor=str(end))
+
+    def sharing_revoke_shared_link(self, url: str) -> None:
+        self.record("sharing_revoke_shared_link")
+        self.links = {path: link for path, link in self.links.items() if link != url}
+
+    def sharing_create_shared_link(self, path: str, short_url=False) -> SimpleNamespace:
+        self.record("sharing_create_shared_link")
+        with self.lock:
+            if path.lower() not in self.links:
+                self.links[path.lower()] = (
+                    f"https://www.dropbox.com/s/{len(self.calls)}/{path.rsplit('/', 1)[-1]}?dl=0"
+                )
+            return SimpleNamespace(url=self.links[path.lower()])
+
+
+def make_decks(tmp_path, count: int) -> list:
+    decks_dir = tmp_path / "decks"
+    decks_dir.mkdir(exist_ok=True)
+    filenames = []
+    for i in range(count):
+        filename = decks_dir / f"deck{i}.jpg"
+        filename.write_bytes(bytes([i]) * 100)
+        filenames.append(filename)
+    return filenames
+
+
+def test_content_hash(tmp_path) -> None:
+    filename = tmp_path / "deck.jpg"
+    filename.write_bytes(b"a" * (4 * 1024 * 1024 + 1))
+    blocks = [b"a" * (4 * 1024 * 1024), b"a"]
+    expected = hashlib.sha256(b"".join(hashlib.sha256(block).digest() for block in blocks))
+    assert get_content_hash(filename) == expected.hexdigest()
+
+
+def test_upload_all(tmp_path) -> None:
+    dbx = FakeDropbox()
+    filenames = make_decks(tmp_path, 5)
+    uploader = DropboxUploader(dbx, "/Decks", tmp_path / "upload.json", max_workers=3)
+    urls, errors = uploader.upload_all(filenames)
+    assert errors == {}
+    assert set(urls) == set(filenames)
+    assert all(url.startswith("https://dl.dropboxusercontent.com/") for url in urls.values())
+    assert dbx.calls.count("files_upload") == 5
+    assert dbx.files["/decks/deck3.jpg"] == bytes([3]) * 100
+
+    # NOTE: A second run with the manifest neither uploads nor asks for links again.
+    dbx.calls.clear()
+    uploader = DropboxUploader(dbx, "/Decks", tmp_path / "upload.json", max_workers=3)
+    assert uploader.upload_all(filenames) == (urls, {})
+    assert dbx.calls == ["files_create_folder"]
+
+    # NOTE: A changed file is uploaded again and keeps its link.
+    dbx.calls.clear()
+    filenames[1].write_bytes(b"changed")
+    assert uploader.upload_all(filenames) == (urls, {})
+    assert dbx.files["/decks/deck1.jpg"] == b"changed"
+    assert dbx.calls.count("files_upload") == 1
+    assert "sharing_create_shared_link" not in dbx.calls
+
+
+def test_upload_without_manifest(tmp_path) -> None:
+    dbx = FakeDropbox()
+    filenames = make_decks(tmp_path, 5)
+    urls, _ = DropboxUploader(dbx, "/Decks", tmp_path / "upload.json").upload_all(filenames)
+
+    # NOTE: Without a manifest, unchanged files are detected from the remote content hash, and all links are listed in pages once.
+    dbx.calls.clear()
+    uploader = DropboxUploader(dbx, "/Decks", tmp_path / "other.json")
+    assert uploader.upload_all(filenames) == (urls, {})
+    assert "files_upload" not in dbx.calls
+    assert "sharing_create_shared_link" not in dbx.calls
+    assert dbx.calls.count("sharing_list_shared_links") == 3
+
+
+def test_upload_new_link(tmp_path) -> None:
+    dbx = FakeDropbox()
+    filenames = make_decks(tmp_path, 2)
+    uploader = DropboxUploader(dbx, "/Decks", tmp_path / "upload.json")
+    urls, _ = uploader.upload_all(filenames)
+    new_urls, errors = uploader.upload_all(filenames, new_link=True)
+    assert errors == {}
+    assert all(new_urls[filename] != urls[filename] for filename in filenames)
+    assert dbx.calls.count("sharing_revoke_shared_link") == 2
+    assert "files_upload" not in dbx.calls[dbx.calls.index("sharing_revoke_shared_link") :]
+
+
+def test_upload_session(tmp_path) -> None:
+    dbx = FakeDropbox()
+    filename = tmp_path / "deck.jpg"
+    filename.write_bytes(bytes(range(256)) * 10)
+    dbx.appends_left = 3
+    uploader = DropboxUploader(
+        dbx, "/Decks", tmp_path / "upload.json", session_threshold=1000, chunk_size=256
+    )
+    _, errors = uploader.upload_all([filename])
+    assert list(errors) == [filename]
+    assert uploader.journal_filename.is_file()
+
+    # NOTE: A new run continues the session from the journal, after the first chunk and the 3 appended ones.
+    dbx.calls.clear()
+    dbx.appends_left = None
+    uploader = DropboxUploader(
+        dbx, "/Decks", tmp_path / "upload.json", session_threshold=1000, chunk_size=256
+    )
+    assert uploader.sessions["deck.jpg"]["offset"] == 4 * 256
+    urls, errors = uploader.upload_all([filename])
+    assert errors == {}
+    assert dbx.files["/decks/deck.jpg"] == filename.read_bytes()
+    assert "files_upload_session_start" not in dbx.calls
+    assert dbx.calls.count("files_upload_session_append_v2") == 5
+    assert not uploader.journal_filename.exists()
+
+
+def test_upload_session_restart(tmp_path) -> None:
+    dbx = FakeDropbox()
+    filename = tmp_path / "deck.jpg"
+    filename.write_bytes(bytes(range(256)) * 10)
+    dbx.appends_left = 1
+    uploader = DropboxUploader(
+        dbx, "/Decks", tmp_path / "upload.json", session_threshold=1000, chunk_size=256
+    )
+    uploader.upload_all([filename])
+
+    # NOTE: A session that's gone on the server is started over.
+    dbx.sessions.clear()
+    dbx.appends_left = None
+    uploader = DropboxUploader(
+        dbx, "/Decks", tmp_path / "upload.json", session_threshold=1000, chunk_size=256
+    )
+    assert uploader.upload_all([filename])[1] == {}
+    assert dbx.files["/decks/deck.jpg"] == filename.read_bytes()
+    assert dbx.calls.count("files_upload_session_start") == 2
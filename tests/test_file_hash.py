@@ -0,0 +1,14 @@
+import hashlib
+
+from file_hash import HASH_CHUNK_SIZE, get_file_hash
+
+
+def test_file_hash(tmp_path) -> None:
+    # NOTE: Span a few chunks with a partial last one.
+    data = bytes(range(256)) * (HASH_CHUNK_SIZE // 256 * 3 + 1)
+    filename = tmp_path / "data.bin"
+    filename.write_bytes(data)
+    assert get_file_hash(filename) == hashlib.sha256(data).hexdigest()
+    assert get_file_hash(str(filename)) == get_file_hash(filename)
+    (tmp_path / "empty.bin").write_bytes(b"")
+    assert get_file_hash(tmp_path / "empty.bin") == hashlib.sha256(b"").hexdigest()
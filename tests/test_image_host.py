@@ -0,0 +1,70 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from image_host import HttpHost, ImageHost, LocalHost
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *_) -> None:
+        pass
+
+
+def make_decks(tmp_path) -> list:
+    decks_dir = tmp_path / "decks"
+    decks_dir.mkdir()
+    filenames = [decks_dir / f"deck{i}.jpg" for i in range(3)]
+    for i, filename in enumerate(filenames):
+        filename.write_bytes(bytes([i]) * 100)
+    return filenames
+
+
+def test_local_host(tmp_path) -> None:
+    filenames = make_decks(tmp_path)
+    host = LocalHost(tmp_path / "hosted")
+    urls, errors = host.upload_all(filenames + [tmp_path / "missing.jpg"])
+    assert list(errors) == [tmp_path / "missing.jpg"]
+    for filename in filenames:
+        hosted_filename = tmp_path / "hosted" / filename.name
+        assert urls[filename] == hosted_filename.resolve().as_uri()
+        assert hosted_filename.read_bytes() == filename.read_bytes()
+
+    # NOTE: Identical files are left untouched, changed ones are replaced.
+    stat = (tmp_path / "hosted" / "deck0.jpg").stat()
+    filenames[1].write_bytes(b"changed")
+    assert host.upload_all(filenames) == (urls, {})
+    assert (tmp_path / "hosted" / "deck0.jpg").stat().st_mtime_ns == stat.st_mtime_ns
+    assert (tmp_path / "hosted" / "deck1.jpg").read_bytes() == b"changed"
+
+
+def test_http_host(tmp_path) -> None:
+    filenames = make_decks(tmp_path)
+    (tmp_path / "hosted").mkdir()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietHandler, directory=str(tmp_path / "hosted"))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host = HttpHost(
+            tmp_path / "hosted" / "zh_CN", f"http://127.0.0.1:{server.server_port}/zh_CN/"
+        )
+        urls, errors = host.upload_all(filenames)
+        assert errors == {}
+        for filename in filenames:
+            assert urls[filename] == f"http://127.0.0.1:{server.server_port}/zh_CN/{filename.name}"
+            assert requests.get(urls[filename], timeout=10).content == filename.read_bytes()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_image_host_abstract() -> None:
+    class IncompleteHost(ImageHost):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteHost()
@@ -0,0 +1,36 @@
+import sys
+
+import pytest
+
+from lang_transforms import LangTransforms
+
+
+def test_lang_transforms_hook() -> None:
+    transforms = LangTransforms.load("de", "")
+    assert transforms.get("victory")("Victory 1.") == "Sieg 1."
+    assert transforms.transform("tracker", "Current Depth") == "Aktuelle Tiefe"
+    assert transforms.get("victory") is transforms.get("victory")
+
+
+def test_lang_transforms_bypass() -> None:
+    transforms = LangTransforms.load("de", "")
+    assert transforms.get("rule") is None
+    assert transforms.transform("rule", "Rule text") == "Rule text"
+
+
+def test_lang_transforms_missing_module() -> None:
+    transforms = LangTransforms(None)
+    assert transforms.get("name") is None
+    assert transforms.transform("name", "Roland Banks") == "Roland Banks"
+
+
+def test_lang_transforms_missing_dependency(tmp_path, monkeypatch) -> None:
+    lang_folder = tmp_path / "translations" / "xx"
+    lang_folder.mkdir(parents=True)
+    (lang_folder / "transform_MISSINGDEP.py").write_text("import missing_transform_dependency\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.path", list(sys.path))
+    # NOTE: A language without a transform module passes text through, but a broken one must not.
+    assert LangTransforms.load("xx", "NOMODULE").module is None
+    with pytest.raises(ModuleNotFoundError):
+        LangTransforms.load("xx", "MISSINGDEP")
@@ -0,0 +1,94 @@
+import csv
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from se_render import SE_PROJECT_DIR
+from se_schema import SE_TEMPLATE_DIR, read_template_keys
+
+# NOTE: Run the data handling functions of make.js outside of Strange Eons, with a fake component
+# that records what's set.
+HARNESS = r"""
+const fs = require('fs');
+const source = fs.readFileSync(process.argv[1], 'utf-8');
+for (const name of ['parseCsv', 'toRecord', 'applyRow']) {
+    const match = new RegExp('^function ' + name + '\\(.*?^}', 'ms').exec(source);
+    eval('global.' + name + ' = ' + match[0]);
+}
+const rows = parseCsv(fs.readFileSync(process.argv[2], 'utf-8'));
+const knownKeys = JSON.parse(process.argv[3]);
+const cards = rows.slice(1).map(row => {
+    const card = {name: null, settings: {}, portraits: [[], []]};
+    const component = {
+        getSettings: () => ({
+            get: key => knownKeys.includes(key) ? '' : null,
+            set: (key, value) => { card.settings[key] = value; },
+        }),
+        setName: name => { card.name = name; },
+        getPortraitCount: () => 2,
+        getPortrait: port => ({
+            setSource: value => card.portraits[port].push(['Src', value]),
+            setPanX: value => card.portraits[port].push(['X', value]),
+            setPanY: value => card.portraits[port].push(['Y', value]),
+            setScale: value => card.portraits[port].push(['Scale', value]),
+            setRotation: value => card.portraits[port].push(['Rot', value]),
+        }),
+    };
+    applyRow(component, toRecord(rows[0], row));
+    return card;
+});
+console.log(JSON.stringify({rows, cards}));
+"""
+
+PORTRAIT_FIELDS = ["Src", "X", "Y", "Scale", "Rot"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="Node.js is not installed")
+@pytest.mark.parametrize(
+    "se_type", sorted(filename.stem for filename in SE_TEMPLATE_DIR.glob("*.eon"))
+)
+def test_make_js_row(tmp_path, se_type) -> None:
+    # NOTE: The columns are those written by write_csv, with the settings stored in the real
+    # template in a shuffled order, and a column for a key the template doesn't know.
+    keys = read_template_keys(SE_TEMPLATE_DIR / f"{se_type}.eon")
+    header = [
+        "file",
+        "name",
+        *[f"port{port}{field}" for port in range(2) for field in PORTRAIT_FIELDS],
+        "renderWidth",
+        "renderHeight",
+        *[f"${key}" for key in reversed(keys)],
+        "$UnknownKey",
+    ]
+    values = ['a, "quoted"\nvalue', "<b>粗体</b>", "", "-1.5", "\r\n"]
+    rows = [
+        [
+            f"{se_type}-{i}" if column == "file" else values[(i + j) % len(values)]
+            for j, column in enumerate(header)
+        ]
+        for i in range(3)
+    ]
+    filename = tmp_path / f"{se_type}.csv"
+    with open(filename, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+    result = subprocess.run(
+        ["node", "-e", HARNESS, str(SE_PROJECT_DIR / "make.js"), str(filename), json.dumps(keys)],
+        capture_output=True,
+        check=True,
+        encoding="utf-8",
+    )
+    output = json.loads(result.stdout)
+    assert output["rows"] == [header, *rows]
+    for row, card in zip(rows, output["cards"], strict=True):
+        fields = dict(zip(header, row, strict=True))
+        assert card["settings"] == {key: fields[f"${key}"] for key in keys}
+        assert card["name"] == fields["name"]
+        # NOTE: The portrait source comes first, since setting it resets the other adjustments.
+        for port in range(2):
+            assert [field for field, _ in card["portraits"][port]] == PORTRAIT_FIELDS
+            assert card["portraits"][port][0] == ["Src", fields[f"port{port}Src"]]
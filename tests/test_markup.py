@@ -0,0 +1,38 @@
+import re
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from constants import MARKUP_PATTERNS, TRAITS_PATTERN, TRAITS_REPLACEMENT
+from markup import translate_markup
+
+MARKUP_TOKENS = [pattern.replace("\\", "") for pattern, _ in MARKUP_PATTERNS]
+
+
+def translate_markup_sequential(rule: str) -> str:
+    for a, b in MARKUP_PATTERNS:
+        rule = re.sub(a, b, rule, flags=re.I)
+    return re.sub(TRAITS_PATTERN, TRAITS_REPLACEMENT, rule)
+
+
+def test_translate_markup() -> None:
+    assert translate_markup("[action] Exhaust: [Willpower]") == "<act> Exhaust: <wil>"
+    assert translate_markup("[[Item]]. [[Weapon]].") == (
+        "<size 90%><t>Item</t><size 33%> <size 337%>. <size 90%><t>Weapon</t><size 33%> <size 337%>."
+    )
+    assert translate_markup("[unknown] [elder_sign]") == "[unknown] <eld>"
+    assert translate_markup("No markup.") == "No markup."
+
+
+@given(
+    st.lists(
+        st.one_of(
+            st.sampled_from(MARKUP_TOKENS),
+            st.sampled_from(MARKUP_TOKENS).map(str.upper),
+            st.sampled_from(["[", "]", "[[", "]]", " ", "Curse", "[[Curse]]", "é"]),
+            st.text(max_size=5),
+        )
+    ).map("".join)
+)
+def test_translate_markup_properties(rule) -> None:
+    assert translate_markup(rule) == translate_markup_sequential(rule)
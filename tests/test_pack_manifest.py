@@ -0,0 +1,41 @@
+from pack_manifest import PackManifest, get_pack_inputs_hash
+
+
+def test_inputs_hash(tmp_path) -> None:
+    (tmp_path / "deck.jpg").write_bytes(b"deck")
+    (tmp_path / "a.png").write_bytes(b"a")
+    (tmp_path / "b.png").write_bytes(b"b")
+    inputs_hash = get_pack_inputs_hash(
+        tmp_path / "deck.jpg", [tmp_path / "a.png", tmp_path / "b.png"]
+    )
+    assert inputs_hash == get_pack_inputs_hash(
+        tmp_path / "deck.jpg", [tmp_path / "b.png", tmp_path / "a.png"]
+    )
+    assert inputs_hash != get_pack_inputs_hash(tmp_path / "deck.jpg", [tmp_path / "a.png"])
+    (tmp_path / "b.png").write_bytes(b"c")
+    assert inputs_hash != get_pack_inputs_hash(
+        tmp_path / "deck.jpg", [tmp_path / "a.png", tmp_path / "b.png"]
+    )
+
+
+def test_manifest(tmp_path) -> None:
+    filename = tmp_path / "decks" / "deck.jpg"
+    filename.parent.mkdir()
+    manifest = PackManifest(tmp_path / "pack.json")
+    assert not manifest.is_current("deck", "abc", filename)
+    filename.write_bytes(b"packed")
+    manifest.set("deck", "abc", filename)
+    manifest.save()
+
+    manifest = PackManifest(tmp_path / "pack.json")
+    assert manifest.is_current("deck", "abc", filename)
+    assert not manifest.is_current("deck", "def", filename)
+    # NOTE: A deck image replaced or removed outside of packing is packed again.
+    filename.write_bytes(b"other")
+    assert not manifest.is_current("deck", "abc", filename)
+    filename.unlink()
+    assert not manifest.is_current("deck", "abc", filename)
+
+    manifest.remove("deck")
+    manifest.save()
+    assert PackManifest(tmp_path / "pack.json").decks == {}
@@ -0,0 +1,166 @@
+import json
+import re
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from rule_text import parse, parse_paragraphs, render
+
+TOKENS = [
+    "<b>", "</b>", "<i>", "</i>", "<p>", "</p>", "<hr>", "<hr/>", "<blockquote>", "</blockquote>", "<cite>", "</cite>",
+    "<br>", "<pre>", "</pre>", "\t", "\r\n", "Forced", " - ", ":", "：", "(→", "R1", "\n", " ", "&", "&amp;", " < ", " > ", "[action]", "é", "文",
+]
+
+
+# NOTE: Reference implementation the tokenizer must stay compatible with.
+def parse_paragraphs_bs4(text, flavor):
+    # NOTE: Header is determined by 'b' tag ending with colon or followed by a newline (except for resolution text).
+    def is_header(elem) -> bool:
+        if elem.name == "b":
+            elem_text = elem.get_text().strip()
+            if elem_text and elem_text[-1] in (":", "："):
+                return True
+            if elem_text.startswith("(→"):
+                return False
+            next_elem = elem.next_sibling
+            if next_elem and next_elem.get_text().startswith("\n"):
+                return True
+        return False
+
+    # NOTE: Flavor is determined by 'blockquote' or 'i' tag.
+    def is_flavor(elem) -> bool:
+        return elem.name in ["blockquote", "i"]
+
+    def extract_flavor_text(elem):
+        if elem.name in ["blockquote", "i"]:
+            return "".join(elem.stripped_strings)
+        return ""
+
+    # NOTE: If there's explicit flavor text, add it before the main text to handle them together. Merge it with existing flavor text if possible.
+    if flavor:
+        soup = BeautifulSoup(text, "html.parser")
+        if len(soup.contents):
+            flavor_elem = soup.contents[0]
+            extracted_flavor = extract_flavor_text(flavor_elem)
+            if extracted_flavor:
+                flavor_elem.insert(0, f"{flavor}\n")
+            else:
+                flavor_elem.insert_before(f"<blockquote><i>{flavor}</i></blockquote>\n")
+            text = str(soup)
+        else:
+            text = f"<blockquote><i>{flavor}</i></blockquote>"
+
+    # NOTE: Normalize <hr> tag.
+    text = text.replace("<hr/>", "<hr>")
+
+    # NOTE: Swap <hr> and <b> tag in case ADB has <hr> at the beginning of the header text.
+    text = re.sub(r"<b>\s*<hr>", "<hr><b>", text)
+
+    # NOTE: Use <hr> to explicitly determine paragraphs.
+    paragraphs = [paragraph.strip() for paragraph in text.split("<hr>")]
+
+    # NOTE: Split paragraphs further before each header.
+    new_paragraphs = []
+    for paragraph in paragraphs:
+        soup = BeautifulSoup(paragraph, "html.parser")
+
+        splits = [0]
+        for i, elem in enumerate(soup.contents):
+            if is_header(elem):
+                splits.append(i)
+        splits.append(None)
+
+        for i in range(len(splits) - 1):
+            new_paragraph = "".join(
+                str(elem) for elem in soup.contents[splits[i] : splits[i + 1]]
+            ).strip()
+            if new_paragraph:
+                new_paragraphs.append(new_paragraph)
+    paragraphs = new_paragraphs
+
+    # NOTE: Extract out the header and flavor text from each paragraph.
+    parsed_paragraphs = []
+    for paragraph in paragraphs:
+        soup = BeautifulSoup(paragraph, "html.parser")
+
+        # NOTE: Remove leading whitespace before checking for header or flavor.
+        def strip_leading(node) -> None:
+            for child in node.contents:
+                if not str(child).strip():
+                    child.extract()
+                else:
+                    break
+
+        strip_leading(soup)
+
+        # NOTE: Extract out the header text from the beginning.
+        header = ""
+        header_elem = soup.contents[0] if soup.contents else None
+        if header_elem and is_header(header_elem):
+            header = str(header_elem).replace("<b>", "").replace("</b>", "").strip()
+            header_elem.extract()
+
+        strip_leading(soup)
+
+        # NOTE: Extract out the flavor text from the beginning.
+        flavor = ""
+        flavor_elem = soup.contents[0] if soup.contents else None
+        if flavor_elem and is_flavor(flavor_elem):
+            flavor = (
+                str(flavor_elem)
+                .replace("<blockquote>", "")
+                .replace("</blockquote>", "")
+                .replace("<i>", "")
+                .replace("</i>", "")
+                .strip()
+            )
+            flavor_elem.extract()
+
+        rule = str(soup).strip()
+        parsed_paragraphs.append((header, flavor, rule))
+
+    return parsed_paragraphs
+
+
+def get_corpus() -> list[tuple[str, str]]:
+    corpus = []
+    for filename in sorted(Path("translations").glob("*/taboo.json")):
+        for card in json.loads(filename.read_text(encoding="utf-8")):
+            corpus.append((card.get("text", ""), card.get("flavor", "")))
+            corpus.append((card.get("back_text", ""), card.get("back_flavor", "")))
+    return corpus
+
+
+def test_parse() -> None:
+    assert render(parse("a<hr>b<br>c<hr/>d &amp; e < f")) == "a<hr/>b<br/>c<hr/>d &amp; e &lt; f"
+    assert render(parse("<b>x<i>y</b>z</i>")) == "<b>x<i>y</i></b>z"
+    assert str(parse("<B>x</b>")[0]) == "<b>x</b>"
+
+
+def test_parse_paragraphs() -> None:
+    assert parse_paragraphs("<b>Forced</b> - When x: y.\n<b>Revelation</b> - z.", "") == [
+        ("", "", "<b>Forced</b> - When x: y.\n<b>Revelation</b> - z."),
+    ]
+    assert parse_paragraphs("<b>Intro 1:</b> x &amp; y", "Extra flavor") == [
+        ("", "Extra flavor", ""),
+        ("Intro 1:", "", "x &amp; y"),
+    ]
+    assert parse_paragraphs("", "Flavor") == [("", "Flavor", "")]
+
+
+def test_parse_paragraphs_corpus() -> None:
+    corpus = get_corpus() + [
+        ("<blockquote><i>Old flavor</i></blockquote> Rule.", "New flavor"),
+        ("<b>Intro 1:</b> x &amp; y", "Extra flavor"),
+        ("<b> <hr>Header:</b> Text.<hr/><i>Flavor</i>\n<b>Setup</b>\nMore.", ""),
+    ]
+    for text, flavor in corpus:
+        assert parse_paragraphs(text, flavor) == parse_paragraphs_bs4(text, flavor)
+
+
+@settings(max_examples=3000)
+@given(st.lists(st.sampled_from(TOKENS)).map("".join), st.sampled_from(["", "Flavor", "<i>Flavor</i>", "A & B"]))
+def test_parse_paragraphs_properties(text, flavor) -> None:
+    assert parse_paragraphs(text, flavor) == parse_paragraphs_bs4(text, flavor)
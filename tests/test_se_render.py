@@ -0,0 +1,213 @@
+import csv
+import json
+import socketserver
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from se_render import (
+    RenderCache,
+    RenderClient,
+    get_context_hash,
+    get_render_keys,
+    get_server_context,
+    get_shard_images,
+    read_tables,
+    run_servers,
+    run_shards,
+    write_shards,
+)
+
+
+def write_table(filename, header, rows) -> None:
+    with open(filename, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def make_tables(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_table(data_dir / "asset.csv", ["file", "$Name"], [[f"a{i}", "x,\ny"] for i in range(5)])
+    write_table(data_dir / "event.csv", ["file", "$Name"], [["e0", '"quoted"']])
+    (data_dir / "empty.csv").write_text("")
+    return read_tables(data_dir)
+
+
+def test_write_shards(tmp_path) -> None:
+    tables = make_tables(tmp_path)
+    assert list(tables) == ["asset", "event"]
+    shard_dirs = write_shards(tables, tmp_path / "shards", 4)
+    assert [shard_dir.name for shard_dir in shard_dirs] == ["0", "1", "2"]
+    # NOTE: Every row lands in exactly one shard, with the header of its type and its cells intact.
+    rows = {}
+    for shard_dir in shard_dirs:
+        for se_type, (header, se_rows) in read_tables(shard_dir / "data").items():
+            assert header == tables[se_type][0]
+            rows.setdefault(se_type, []).extend(se_rows)
+    assert rows == {se_type: se_rows for se_type, (_, se_rows) in tables.items()}
+    assert list(read_tables(shard_dirs[2] / "data")) == ["asset", "event"]
+
+    # NOTE: Previous shards are removed, and there are never more shards than rows.
+    shard_dirs = write_shards(tables, tmp_path / "shards", 10)
+    assert len(shard_dirs) == 6
+    assert len(write_shards(tables, tmp_path / "shards", 1)) == 1
+    assert not (tmp_path / "shards" / "1").exists()
+
+
+def test_run_shards(tmp_path) -> None:
+    shard_dirs = write_shards(make_tables(tmp_path), tmp_path / "shards", 2)
+    script = (
+        "import os, pathlib, sys; "
+        f"shard_dir = pathlib.Path({str(tmp_path)!r}) / os.environ['SE_GENERATOR_SHARD']; "
+        "(shard_dir / 'images').mkdir(exist_ok=True); "
+        "(shard_dir / 'images' / f'{shard_dir.name}.png').write_bytes(b'png'); "
+        "sys.exit(int(shard_dir.name) + int(os.environ['SE_GENERATOR_PPI']))"
+    )
+    results = run_shards(
+        [sys.executable, "-c", script], shard_dirs, tmp_path, env={"SE_GENERATOR_PPI": "2"}
+    )
+    assert {shard_dir.name: returncode for shard_dir, (returncode, _) in results.items()} == {
+        "0": 2,
+        "1": 3,
+    }
+    results = run_shards(
+        [sys.executable, "-c", script], shard_dirs, tmp_path, env={"SE_GENERATOR_PPI": "0"}
+    )
+    # NOTE: Only the images of the shard that succeeded are trusted.
+    assert [filename.name for filename in get_shard_images(results)] == ["0.png"]
+
+
+def test_render_cache(tmp_path) -> None:
+    tables = make_tables(tmp_path)
+    template_dir = tmp_path / "template"
+    template_dir.mkdir()
+    (template_dir / "asset.eon").write_bytes(b"asset")
+    preferences = tmp_path / "preferences"
+    preferences.write_text("font=a")
+    keys = get_render_keys(tables, template_dir, get_context_hash([preferences], "zh"))
+    assert len(set(keys.values())) == 6
+
+    cache = RenderCache(tmp_path / "renders")
+    assert cache.get_pending(tables, keys) == tables
+    for result_id in ["a0", "a1", "a2", "a3", "e0"]:
+        image = tmp_path / f"{result_id}.png"
+        image.write_bytes(result_id.encode())
+        cache.put(keys[result_id], image)
+    assert cache.get_pending(tables, keys) == {"asset": (tables["asset"][0], [["a4", "x,\ny"]])}
+    cache.link(keys["a1"], tmp_path / "a1.png")
+    assert (tmp_path / "a1.png").read_bytes() == b"a1"
+
+    # NOTE: Changing a row, a template or the rendering context only invalidates the affected cards.
+    tables["asset"][1][0][1] = "fixed"
+    (template_dir / "event.eon").write_bytes(b"event")
+    changed = get_render_keys(tables, template_dir, get_context_hash([preferences], "zh"))
+    assert {result_id for result_id in keys if keys[result_id] != changed[result_id]} == {
+        "a0",
+        "e0",
+    }
+    preferences.write_text("font=b")
+    changed = get_render_keys(tables, template_dir, get_context_hash([preferences], "zh"))
+    assert not set(keys.values()) & set(changed.values())
+
+
+def test_render_keys_portraits(tmp_path) -> None:
+    portrait = tmp_path / "portrait.png"
+    portrait.write_bytes(b"old")
+    tables = {"asset": (["file", "port0Src"], [["a0", str(portrait)], ["a1", ""]])}
+    keys = get_render_keys(tables, tmp_path, "context")
+    portrait.write_bytes(b"new")
+    changed = get_render_keys(tables, tmp_path, "context")
+    assert keys["a0"] != changed["a0"]
+    assert keys["a1"] == changed["a1"]
+
+
+class FakeRenderHandler(socketserver.StreamRequestHandler):
+    """Answer render jobs like make.js does, writing one empty image per data row."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            job = json.loads(line)
+            if job.get("stop"):
+                self.server.stopped = True
+                self.send({"stopped": True})
+                return
+            if job.get("lang", self.server.lang) != self.server.lang:
+                self.send({"error": "Wrong language"})
+                continue
+            if not Path(job["data"]).is_dir():
+                self.send({"error": "Missing data folder"})
+                continue
+            images_dir = Path(job["images"])
+            images_dir.mkdir(exist_ok=True)
+            count = 0
+            for _, (header, rows) in read_tables(Path(job["data"])).items():
+                for row in rows:
+                    filename = images_dir / f"{row[header.index('file')]}.png"
+                    filename.write_bytes(str(job["ppi"]).encode())
+                    self.send({"image": str(filename)})
+                    count += 1
+            self.send({"done": count})
+
+    def send(self, message: dict) -> None:
+        self.wfile.write((json.dumps(message) + "\n").encode())
+
+
+@pytest.fixture
+def render_servers():
+    servers = []
+    for _ in range(2):
+        server = socketserver.ThreadingTCPServer(("localhost", 0), FakeRenderHandler)
+        server.stopped = False
+        server.lang = "zh_CN"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_render_client(tmp_path, render_servers) -> None:
+    shard_dirs = write_shards(make_tables(tmp_path), tmp_path / "shards", 1)
+    client = RenderClient(f"localhost:{render_servers[0].server_address[1]}")
+    images = list(client.render(shard_dirs[0] / "data", shard_dirs[0] / "images", 150))
+    assert [image.name for image in images] == [f"a{i}.png" for i in range(5)] + ["e0.png"]
+    assert images[0].read_bytes() == b"150"
+    with pytest.raises(RuntimeError):
+        list(client.render(tmp_path / "missing", tmp_path / "images"))
+    client.stop()
+    assert render_servers[0].stopped
+
+
+def test_run_servers(tmp_path, render_servers) -> None:
+    shard_dirs = write_shards(make_tables(tmp_path), tmp_path / "shards", 3)
+    addresses = [f"localhost:{server.server_address[1]}" for server in render_servers]
+    # NOTE: A server that can't be reached fails its shards without stopping the others.
+    results = run_servers([*addresses, "localhost:1"], shard_dirs)
+    assert {shard_dir.name: returncode for shard_dir, (returncode, _) in results.items()} == {
+        "0": 0,
+        "1": 0,
+        "2": 1,
+    }
+    assert len(get_shard_images(results)) == 4
+
+
+def test_run_servers_context(tmp_path, render_servers) -> None:
+    shard_dirs = write_shards(make_tables(tmp_path), tmp_path / "shards", 2)
+    addresses = [f"localhost:{server.server_address[1]}" for server in render_servers]
+    preferences = tmp_path / "preferences"
+    preferences.write_text("font=a")
+    script = tmp_path / "make.js"
+    script.write_text("render();")
+    context = get_server_context("zh_CN", preferences, script)
+    assert context["preferences"] == "font=a"
+    results = run_servers(addresses, shard_dirs, context=context)
+    assert {returncode for returncode, _ in results.values()} == {0}
+    # NOTE: Servers started for another language render nothing, so no image gets cached.
+    results = run_servers(addresses, shard_dirs, context={**context, "lang": "de"})
+    assert {returncode for returncode, _ in results.values()} == {1}
+    assert get_shard_images(results) == []
@@ -0,0 +1,116 @@
+import pytest
+
+import se_schema
+from se_schema import (
+    SE_TEMPLATE_DEFAULT_KEYS,
+    SE_TEMPLATE_DIR,
+    TemplateSchema,
+    get_template_filename,
+    read_template_keys,
+)
+
+SE_TYPES = [
+    "asset",
+    "event",
+    "skill",
+    "enemy_encounter",
+    "location_front",
+    "scenario_front",
+    "story",
+]
+
+
+@pytest.mark.parametrize("se_type", SE_TYPES)
+def test_read_template_keys(se_type) -> None:
+    keys = read_template_keys(get_template_filename(se_type))
+    assert len(keys) == len(set(keys))
+    assert "Collection" in keys
+
+
+def test_read_template_keys_by_type() -> None:
+    asset_keys = read_template_keys(get_template_filename("asset"))
+    expected_keys = {"ResourceCost", "Skill1", "Skill5", "Slot", "Slot2", "Stamina", "Sanity"}
+    assert expected_keys <= set(asset_keys)
+    assert "Attack" not in asset_keys
+    location_keys = read_template_keys(get_template_filename("location_front"))
+    assert {"Shroud", "Clues", "LocationIcon", "Connection6IconBack"} <= set(location_keys)
+    assert "Attack" not in location_keys and "Skill1" not in location_keys
+
+
+def test_read_template_keys_invalid(tmp_path) -> None:
+    filename = tmp_path / "invalid.eon"
+    filename.write_bytes(b"not a component")
+    with pytest.raises(ValueError):
+        read_template_keys(filename)
+
+
+def test_template_schema_cache(tmp_path, monkeypatch) -> None:
+    template_dir = tmp_path / "template"
+    template_dir.mkdir()
+    for se_type in ["asset", "location_front"]:
+        (template_dir / f"{se_type}.eon").write_bytes(get_template_filename(se_type).read_bytes())
+    schema_filename = tmp_path / "se_schema.json"
+
+    schema = TemplateSchema(schema_filename, template_dir)
+    asset_keys = schema.get_keys("asset")
+    assert asset_keys == read_template_keys(get_template_filename("asset"))
+    # NOTE: Keys read from the plugin defaults aren't stored in the template.
+    assert "ShowEncounterIcon" not in schema.get_keys("location_front")
+    schema.save()
+
+    # NOTE: A cached schema doesn't parse unchanged templates again.
+    def fail(_):
+        raise AssertionError("template parsed again")
+
+    monkeypatch.setattr(se_schema, "read_template_keys", fail)
+    schema = TemplateSchema(schema_filename, template_dir)
+    assert schema.get_keys("asset") == asset_keys
+    assert not schema.dirty and not schema.changes
+
+
+def test_template_schema_changes(tmp_path) -> None:
+    template_dir = tmp_path / "template"
+    template_dir.mkdir()
+    template_filename = template_dir / "asset.eon"
+    template_filename.write_bytes(get_template_filename("asset").read_bytes())
+    schema_filename = tmp_path / "se_schema.json"
+    schema = TemplateSchema(schema_filename, template_dir)
+    schema.get_keys("asset")
+    schema.save()
+
+    # NOTE: Replace the template with another one, like an updated template would.
+    template_filename.write_bytes(get_template_filename("skill").read_bytes())
+    schema = TemplateSchema(schema_filename, template_dir)
+    assert schema.get_keys("asset") == read_template_keys(get_template_filename("skill"))
+    added, removed = schema.changes["asset"]
+    assert "Skill6" in added
+    assert "ResourceCost" in removed
+
+
+@pytest.mark.parametrize("se_type", sorted(SE_TEMPLATE_DEFAULT_KEYS))
+def test_template_default_keys(se_type) -> None:
+    # NOTE: A listed key that the template stores itself is stale, and no longer needs listing.
+    default_keys = SE_TEMPLATE_DEFAULT_KEYS[se_type]
+    assert get_template_filename(se_type).is_file()
+    assert len(default_keys) == len(set(default_keys))
+    assert not set(default_keys) & set(read_template_keys(get_template_filename(se_type)))
+
+
+def test_template_schema_read_keys(tmp_path) -> None:
+    schema = TemplateSchema(tmp_path / "se_schema.json")
+    location_keys = schema.get_read_keys("location_front")
+    assert "ShowEncounterIcon" in location_keys
+    assert set(schema.get_keys("location_front")) < set(location_keys)
+    assert "Attack" not in location_keys
+    assert schema.get_read_keys("asset") == schema.get_keys("asset")
+
+
+def test_template_default_keys_not_stored() -> None:
+    # NOTE: ShowEncounterIcon is the only key the SE columns write that no template stores, which is
+    # why it's read from the plugin defaults.
+    stored_keys = {
+        key for filename in SE_TEMPLATE_DIR.glob("*.eon") for key in read_template_keys(filename)
+    }
+    default_keys = {key for keys in SE_TEMPLATE_DEFAULT_KEYS.values() for key in keys}
+    assert default_keys == {"ShowEncounterIcon"}
+    assert not default_keys & stored_keys
@@ -0,0 +1,77 @@
+import json
+
+from url_registry import UrlRegistry
+
+
+def test_url_registry(tmp_path) -> None:
+    url_file = tmp_path / "urls.json"
+    url_file.write_text(json.dumps({"en": {"a": "https://en/a"}, "fr": {"a": "https://fr/a"}}))
+    registry = UrlRegistry(url_file)
+    assert registry.get_url("en", "a") == "https://en/a"
+    assert registry.get_url("de", "a") is None
+    assert registry.get_url_id("https://en/a") == "a"
+    assert registry.get_url_id("https://fr/a") == "a"
+    assert registry.get_url_id("https://en/b") is None
+
+    registry.set_url("en", "b", "https://en/b")
+    assert registry.get_url_id("https://en/b") == "b"
+    # NOTE: New entries only go to the journal until checkpoint.
+    assert json.loads(url_file.read_text()) == {
+        "en": {"a": "https://en/a"},
+        "fr": {"a": "https://fr/a"},
+    }
+    assert registry.journal_filename.is_file()
+
+    registry.checkpoint()
+    assert json.loads(url_file.read_text()) == {
+        "en": {"a": "https://en/a", "b": "https://en/b"},
+        "fr": {"a": "https://fr/a"},
+    }
+    assert not registry.journal_filename.exists()
+
+
+def test_url_registry_replay_journal(tmp_path) -> None:
+    url_file = tmp_path / "urls.json"
+    registry = UrlRegistry(url_file)
+    registry.set_url("en", "a", "https://en/a")
+    registry.set_url("de", "a", "https://de/a")
+    registry.journal.close()
+    # NOTE: Simulate an interrupted run with a partially written entry at the end.
+    with open(registry.journal_filename, "a", encoding="utf-8") as file:
+        file.write('["en", "b", "https://en')
+
+    registry = UrlRegistry(url_file)
+    assert registry.get_url("de", "a") == "https://de/a"
+    assert registry.get_url_id("https://en/a") == "a"
+    assert registry.get_url("en", "b") is None
+    registry.checkpoint()
+    assert json.loads(url_file.read_text()) == {
+        "de": {"a": "https://de/a"},
+        "en": {"a": "https://en/a"},
+    }
+
+
+def test_url_registry_checkpoint_unchanged(tmp_path) -> None:
+    url_file = tmp_path / "urls.json"
+    url_file.write_text('{"en": {"a": "https://en/a"}}')
+    registry = UrlRegistry(url_file)
+    registry.set_url("en", "a", "https://en/a")
+    registry.checkpoint()
+    assert url_file.read_text() == '{"en": {"a": "https://en/a"}}'
+
+
+def test_url_registry_replace(tmp_path) -> None:
+    registry = UrlRegistry(tmp_path / "urls.json")
+    registry.set_url("en", "a", "https://en/old")
+    registry.set_url("fr", "b", "https://shared/old")
+    registry.set_url("de", "b", "https://shared/old")
+    registry.set_url("en", "a", "https://en/new")
+    registry.set_url("fr", "b", "https://fr/new")
+    assert registry.get_url_id("https://en/new") == "a"
+    assert registry.get_url_id("https://en/old") is None
+    # NOTE: An old URL still registered for another language keeps its url id.
+    assert registry.get_url_id("https://shared/old") == "b"
+
+    # NOTE: Replaying the journal ends up with the same inverse index.
+    registry.journal.close()
+    assert UrlRegistry(tmp_path / "urls.json").url_ids == registry.url_ids
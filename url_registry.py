@@ -0,0 +1,85 @@
+import json
+from pathlib import Path
+from typing import IO
+
+
+class UrlRegistry:
+    """Deck image URLs of every language keyed by url id, with an inverse index from URL to url id.
+
+    New entries are appended to a journal next to the URL file as they are registered, and only
+    compacted into the URL file on checkpoint. Entries left in the journal by an interrupted run
+    are replayed on load.
+    """
+
+    def __init__(self, filename: str | Path) -> None:
+        self.filename = Path(filename)
+        self.journal_filename = self.filename.with_suffix(f"{self.filename.suffix}.journal")
+        self.urls: dict[str, dict[str, str]] = {}
+        self.url_ids: dict[str, str] = {}
+        self.journal: IO[str] | None = None
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        if self.filename.is_file():
+            with self.filename.open(encoding="utf-8") as file:
+                urls = json.load(file)
+            if not isinstance(urls, dict):
+                raise ValueError(f"{self.filename} is not an object.")
+            self.urls = urls
+        for url_set in self.urls.values():
+            for url_id, url in url_set.items():
+                self.url_ids[url] = url_id
+        if self.journal_filename.is_file():
+            with self.journal_filename.open(encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        lang, url_id, url = json.loads(line)
+                    except ValueError:
+                        # NOTE: The last entry may be partially written if the previous run was
+                        # interrupted.
+                        continue
+                    self.add(lang, url_id, url)
+
+    def add(self, lang: str, url_id: str, url: str) -> bool:
+        old_url = self.urls.get(lang, {}).get(url_id)
+        if old_url == url:
+            return False
+        self.urls.setdefault(lang, {})[url_id] = url
+        self.url_ids[url] = url_id
+        # NOTE: A replaced URL no longer maps to the url id, unless it's still registered elsewhere.
+        if old_url is not None and not any(
+            old_url in url_set.values() for url_set in self.urls.values()
+        ):
+            self.url_ids.pop(old_url, None)
+        self.dirty = True
+        return True
+
+    def get_url(self, lang: str, url_id: str) -> str | None:
+        return self.urls.get(lang, {}).get(url_id)
+
+    def get_url_id(self, url: str) -> str | None:
+        return self.url_ids.get(url)
+
+    def set_url(self, lang: str, url_id: str, url: str) -> None:
+        if not self.add(lang, url_id, url):
+            return
+        if self.journal is None:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            self.journal = self.journal_filename.open("a", encoding="utf-8")
+        self.journal.write(json.dumps([lang, url_id, url], ensure_ascii=False) + "\n")
+        self.journal.flush()
+
+    def checkpoint(self) -> None:
+        """Compact all entries into the URL file atomically and clear the journal."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.dirty:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            temp_filename = self.filename.with_suffix(f"{self.filename.suffix}.tmp")
+            with temp_filename.open("w", encoding="utf-8") as file:
+                file.write(json.dumps(self.urls, indent=2, sort_keys=True))
+            temp_filename.replace(self.filename)
+            self.dirty = False
+        self.journal_filename.unlink(missing_ok=True)